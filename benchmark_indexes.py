@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos índices compostos das listagens
+Cria um banco SQLite temporário com dados sintéticos, executa as consultas
+das páginas principais e mostra o plano de execução (EXPLAIN) de cada uma.
+
+Uso:
+    python benchmark_indexes.py [--orders 20000] [--url postgresql://...]
+
+Com --url o benchmark roda no banco informado (use um banco descartável:
+as tabelas são criadas e preenchidas pelo script).
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert, select, text
+from src.models.user import db, User, Order, Notification, StatusHistory, OrderObservation, DeliveryOption
+
+STATUSES = ['pendente', 'aprovado', 'em_producao', 'pronto', 'entregue']
+
+
+def seed(conn, total_orders):
+    """Popula o banco com usuários, pedidos, notificações e históricos"""
+    now = datetime(2025, 1, 1)
+    conn.execute(insert(User), [
+        {'id': i, 'username': f'user{i}', 'password_hash': 'x',
+         'user_type': 'cliente' if i > 20 else 'funcionario', 'is_active': True}
+        for i in range(1, 121)
+    ])
+
+    orders = []
+    for i in range(1, total_orders + 1):
+        status = random.choice(STATUSES)
+        created_at = now + timedelta(minutes=i * 30)
+        orders.append({
+            'id': i,
+            'company_name': f'Empresa {i}',
+            'order_date': created_at.date(),
+            'delivery_date': created_at.date() + timedelta(days=random.randint(1, 30)),
+            'created_by_id': 1,
+            'client_id': random.randint(21, 120),
+            'created_at': created_at,
+            'status': status,
+            'approved': status != 'pendente',
+            'is_urgent': random.random() < 0.1,
+            'delivered_at': created_at + timedelta(days=random.randint(1, 40)) if status == 'entregue' else None,
+        })
+    conn.execute(insert(Order), orders)
+
+    conn.execute(insert(Notification), [
+        {'user_id': random.randint(1, 20), 'title': 'Aviso', 'message': 'Mensagem',
+         'read': random.random() < 0.8, 'created_at': now + timedelta(minutes=i)}
+        for i in range(total_orders * 2)
+    ])
+    conn.execute(insert(StatusHistory), [
+        {'order_id': random.randint(1, total_orders), 'user_id': 1, 'old_status': 'aprovado',
+         'new_status': 'em_producao', 'created_at': now + timedelta(minutes=i)}
+        for i in range(total_orders * 3)
+    ])
+    conn.execute(insert(OrderObservation), [
+        {'order_id': random.randint(1, total_orders), 'author_id': 1, 'content': 'Obs',
+         'created_at': now + timedelta(minutes=i)}
+        for i in range(total_orders * 3)
+    ])
+    conn.execute(insert(DeliveryOption), [
+        {'order_id': random.randint(1, total_orders), 'created_by_id': 1, 'fonte': True,
+         'created_at': now + timedelta(minutes=i)}
+        for i in range(total_orders // 5)
+    ])
+
+
+def benchmark_queries():
+    """Consultas representativas das listagens e detalhes"""
+    return {
+        'admin.status_orders': select(Order).where(
+            Order.status == 'em_producao', Order.approved == True
+        ).order_by(Order.created_at.desc()).limit(10),
+        'client.orders': select(Order).where(
+            Order.client_id == 42
+        ).order_by(Order.created_at.desc()).limit(10),
+        'employee.calendar_api': select(Order).where(
+            Order.delivery_date.between(date(2025, 3, 1), date(2025, 4, 1))
+        ),
+        'admin.delivered': select(Order).where(
+            Order.status == 'entregue', Order.delivered_at.isnot(None)
+        ).order_by(Order.delivered_at.desc()).limit(10),
+        'employee.notifications': select(Notification).where(
+            Notification.user_id == 5, Notification.read == False
+        ).order_by(Notification.created_at.desc()).limit(15),
+        'order_details.status_history': select(StatusHistory).where(
+            StatusHistory.order_id == 100
+        ).order_by(StatusHistory.created_at.desc()),
+        'order_details.observations': select(OrderObservation).where(
+            OrderObservation.order_id == 100
+        ).order_by(OrderObservation.created_at.desc()),
+        'order_details.delivery_options': select(DeliveryOption).where(
+            DeliveryOption.order_id == 100
+        ).order_by(DeliveryOption.created_at.desc()),
+    }
+
+
+def explain(conn, stmt):
+    """Retorna as linhas do plano de execução da consulta"""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text(f'EXPLAIN {compiled}')).fetchall()
+    return [row[0] for row in rows]
+
+
+def uses_index(plan):
+    """Verifica se o plano usa índice em vez de varredura completa"""
+    plan_text = ' '.join(plan).lower()
+    if 'index' not in plan_text:
+        return False
+    # SQLite: 'SCAN order' sem índice; PostgreSQL: 'Seq Scan'
+    return 'seq scan' not in plan_text and not any(
+        line.lower().startswith('scan ') and 'index' not in line.lower() for line in plan
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos índices das listagens')
+    parser.add_argument('--orders', type=int, default=20000, help='Quantidade de pedidos sintéticos')
+    parser.add_argument('--url', help='URL de banco descartável (padrão: SQLite temporário)')
+    args = parser.parse_args()
+
+    random.seed(42)
+    temp_dir = None
+    url = args.url
+    if not url:
+        temp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(temp_dir.name, 'benchmark.db')}"
+
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        print(f"Populando banco com {args.orders} pedidos...")
+        seed(conn, args.orders)
+        conn.execute(text('ANALYZE'))
+
+    failures = 0
+    with engine.connect() as conn:
+        for name, stmt in benchmark_queries().items():
+            start = time.perf_counter()
+            conn.execute(stmt).fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+
+            plan = explain(conn, stmt)
+            ok = uses_index(plan)
+            failures += 0 if ok else 1
+
+            print(f"\n{'✅' if ok else '❌'} {name} ({elapsed:.2f} ms)")
+            for line in plan:
+                print(f"    {line}")
+
+    engine.dispose()
+    if temp_dir:
+        temp_dir.cleanup()
+
+    if failures:
+        print(f"\n❌ {failures} consulta(s) sem uso de índice.")
+        sys.exit(1)
+    print("\n✅ Todas as consultas usam índices.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para gerar um backup do sistema em uma pasta (ex.: agendado no cron toda noite)
+Uso: python create_backup.py <pasta> [--incremental]
+O modo incremental grava apenas os uploads novos ou alterados desde o último backup;
+mantenha todos os backups da cadeia na mesma pasta para poder restaurá-los
+"""
+
+import sys
+import os
+import uuid
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.backup import backup_filename, build_backup, record_backup, resolve_backup_mode, stream_zip
+
+def create_backup(destination, mode):
+    with app.app_context():
+        try:
+            os.makedirs(destination, exist_ok=True)
+            backup_id = uuid.uuid4().hex
+            mode = resolve_backup_mode(mode)
+            filename = backup_filename(backup_id, mode)
+
+            entries, manifest = build_backup('sistema', backup_id, filename, mode)
+            path = os.path.join(destination, filename)
+            with open(path + '.part', 'wb') as output:
+                for data in stream_zip(entries):
+                    output.write(data)
+            os.replace(path + '.part', path)
+            record_backup(manifest)
+
+            included = sum(1 for info in manifest['files'].values() if info['backup'] == backup_id)
+            print(f"✅ Backup {manifest['mode']} gravado em {path}")
+            print(f"✅ {included} de {len(manifest['files'])} arquivos de upload incluídos neste arquivo.")
+        except Exception as e:
+            print(f"❌ Erro ao criar backup: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 1:
+        print("Uso: python create_backup.py <pasta> [--incremental]")
+        sys.exit(1)
+    mode = 'incremental' if '--incremental' in sys.argv else 'full'
+    print("🔄 Gerando backup do sistema...")
+    create_backup(args[0], mode)
+    print("✅ Backup concluído!")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script para converter as notificações copiadas por usuário em notificações em massa
+Execute este script uma vez após atualizar o sistema para reduzir a tabela notification
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.notifications import migrate_legacy_notifications
+
+def migrate_notifications():
+    with app.app_context():
+        try:
+            created, removed = migrate_legacy_notifications()
+            print(f"✅ {removed} notificações por usuário convertidas em {created} notificações em massa.")
+        except Exception as e:
+            print(f"❌ Erro ao migrar notificações: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migração das notificações...")
+    migrate_notifications()
+    print("✅ Migração concluída!")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Script para mover os uploads antigos (logos, fotos de perfil e arquivos de ordens de serviço)
+para o armazenamento endereçado por conteúdo e recalcular as referências de arquivos
+Execute este script uma vez após atualizar o sistema
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.file_store import migrate_legacy_uploads, rebuild_file_references
+
+def migrate_uploads():
+    with app.app_context():
+        try:
+            migrated = migrate_legacy_uploads()
+            print(f"✅ {migrated} arquivos movidos para o armazenamento por conteúdo.")
+
+            referenced, removed = rebuild_file_references()
+            print(f"✅ {referenced} arquivos referenciados, {removed} arquivos sem referência removidos.")
+        except Exception as e:
+            print(f"❌ Erro ao migrar uploads: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Migrando uploads para o armazenamento por conteúdo...")
+    migrate_uploads()
+    print("✅ Migração concluída!")
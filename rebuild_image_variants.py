@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script para gerar miniaturas e variantes WebP das imagens já enviadas
+Execute este script uma vez para logos e fotos de perfil gravadas antes do processamento de imagens
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.services.images import IMAGE_KINDS, rebuild_image_variants
+
+def rebuild_variants():
+    with app.app_context():
+        try:
+            for kind in IMAGE_KINDS:
+                total = rebuild_image_variants(kind)
+                print(f"✅ {total} imagens processadas ({kind}).")
+        except Exception as e:
+            print(f"❌ Erro ao gerar variantes de imagens: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Gerando miniaturas e variantes WebP...")
+    rebuild_variants()
+    print("✅ Geração concluída!")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir a tabela de contadores de status de pedidos
+Execute este script se os contadores do dashboard ficarem divergentes da tabela order
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.order_stats import rebuild_order_status_counters
+
+def rebuild_counters():
+    with app.app_context():
+        try:
+            total = rebuild_order_status_counters()
+            print(f"✅ {total} contadores reconstruídos a partir da tabela order.")
+        except Exception as e:
+            print(f"❌ Erro ao reconstruir contadores: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Reconstruindo contadores de status de pedidos...")
+    rebuild_counters()
+    print("✅ Reconstrução concluída!")
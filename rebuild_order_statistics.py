@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir a tabela de totais diários de estatísticas de pedidos
+Execute este script após alterações em massa na tabela order (importações, exclusões diretas no banco)
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.statistics import rebuild_daily_stats
+
+def rebuild_stats():
+    with app.app_context():
+        try:
+            total = rebuild_daily_stats()
+            print(f"✅ {total} linhas diárias reconstruídas a partir da tabela order.")
+        except Exception as e:
+            print(f"❌ Erro ao reconstruir estatísticas: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Reconstruindo totais diários de estatísticas de pedidos...")
+    rebuild_stats()
+    print("✅ Reconstrução concluída!")
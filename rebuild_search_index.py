@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir o índice de busca de pedidos
+Execute este script após alterações em massa em pedidos ou observações (importações, alterações diretas no banco)
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.main import app
+from src.models.user import db
+from src.services.search import rebuild_search_index
+
+def rebuild_index():
+    with app.app_context():
+        try:
+            total = rebuild_search_index()
+            print(f"✅ {total} pedidos indexados para busca.")
+        except Exception as e:
+            print(f"❌ Erro ao reconstruir índice de busca: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    print("🔄 Reconstruindo índice de busca de pedidos...")
+    rebuild_index()
+    print("✅ Reconstrução concluída!")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script para restaurar um backup (completo ou incremental)
+Uso: python restore_backup.py <backup.zip> [pasta de uploads de destino] [--banco]
+Com --banco, o conteúdo do banco configurado (DATABASE_URL ou SQLite local) é SUBSTITUÍDO pelo do backup
+Backups incrementais precisam dos backups anteriores da cadeia na mesma pasta do ZIP informado
+Reinicie a aplicação após restaurar o banco
+"""
+
+import sys
+import os
+
+# Adicionar o diretório src ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.services.backup import read_manifest, restore_backup_database, restore_uploads
+
+def restore(archive_path, target_folder, restore_db):
+    try:
+        manifest = read_manifest(archive_path)
+        print(f"📦 Backup {manifest['mode']} de {manifest['created_at']} ({len(manifest['files'])} arquivos)")
+
+        if restore_db:
+            from src.main import app
+
+            with app.app_context():
+                restored = restore_backup_database(archive_path)
+            print(f"✅ {sum(restored.values())} registros restaurados em {len(restored)} tabelas.")
+
+        if target_folder:
+            restored = restore_uploads(archive_path, target_folder)
+            print(f"✅ {restored} arquivos restaurados em {target_folder}")
+    except Exception as e:
+        print(f"❌ Erro ao restaurar backup: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    restore_db = '--banco' in sys.argv
+    if not 1 <= len(args) <= 2 or (len(args) == 1 and not restore_db):
+        print("Uso: python restore_backup.py <backup.zip> [pasta de uploads de destino] [--banco]")
+        sys.exit(1)
+    print("🔄 Restaurando backup...")
+    restore(args[0], args[1] if len(args) == 2 else None, restore_db)
+    print("✅ Restauração concluída!")
@@ -4,14 +4,15 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, redirect, url_for
+from flask import Flask, send_from_directory, redirect, request, url_for
 from flask_login import LoginManager
-from src.models.user import db, User, AuditLog, FileReference
+from src.models.user import db, User, Order, AuditLog, FileReference, OrderStatusCounter, OrderDailyStats
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
 from src.routes.admin import admin_bp
 from src.routes.employee import employee_bp
 from src.routes.client import client_bp
+from src.routes.files import files_bp
 from src.database.config import get_database_config, is_production
 from datetime import date
 from pytz import timezone
@@ -77,6 +78,16 @@ def format_datetime_filter(value, format=None):
         return str(value)
 
 
+# Helpers de imagem: miniaturas e srcset das logos e fotos de perfil
+from src.services.images import image_url, image_srcset
+app.add_template_global(image_url)
+app.add_template_global(image_srcset)
+
+# Nome original dos arquivos gravados no store por conteúdo
+from src.services.file_store import display_name
+app.jinja_env.filters['file_display_name'] = display_name
+
+
 # Criamos um "apelido" para o filtro que o seu template `service_order_detail.html` estava pedindo.
 # Ambos 'format_date' e 'format_date_sp' agora funcionarão e farão a mesma coisa.
 app.jinja_env.filters['format_date_sp'] = app.jinja_env.filters['format_date']
@@ -94,6 +105,18 @@ app.config['SESSION_COOKIE_SECURE'] = True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400
 
+# Streams SSE de notificações: cada aba aberta ocupa uma thread do gunicorn (worker gthread).
+# SSE_MAX_STREAMS limita os streams por worker; acima dele (ou com NOTIFICATIONS_SSE=0) as
+# páginas voltam ao polling a cada 30s.
+app.config['NOTIFICATIONS_SSE'] = os.environ.get('NOTIFICATIONS_SSE', '1').lower() in ('1', 'true', 'yes')
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS', 4))
+app.config['SSE_STREAM_TIMEOUT'] = int(os.environ.get('SSE_STREAM_TIMEOUT', 25))
+app.config['SSE_KEEPALIVE_INTERVAL'] = int(os.environ.get('SSE_KEEPALIVE_INTERVAL', 10))
+
+# Entrega de arquivos pelo nginx (X-Accel-Redirect): prefixo da location interna
+# apontando para UPLOAD_FOLDER, ex.: /protected-uploads/. Sem ele, o Flask envia os arquivos.
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
 # Configuração dinâmica do banco de dados
 db_config = get_database_config()
 app.config.update(db_config)
@@ -173,6 +196,7 @@ app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(admin_bp, url_prefix='/')
 app.register_blueprint(employee_bp, url_prefix='/')
 app.register_blueprint(client_bp, url_prefix='/')
+app.register_blueprint(files_bp, url_prefix='/')
 
 
 # =====================
@@ -229,8 +253,42 @@ with app.app_context():
             add_column_if_not_exists('service_order', 'file2_filename', 'VARCHAR(200)')
             add_column_if_not_exists('service_order', 'file3_filename', 'VARCHAR(200)')
         
+        # Criar índices declarados nos modelos que ainda não existem
+        # (db.create_all só cria índices junto com tabelas novas)
+        def create_indexes_if_not_exist():
+            for table in db.metadata.sorted_tables:
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing:
+                        continue
+                    try:
+                        print(f"Criando índice {index.name} na tabela {table.name}...")
+                        index.create(bind=db.engine, checkfirst=True)
+                    except Exception as e:
+                        print(f"Erro ao criar índice {index.name}: {e}")
+
+        create_indexes_if_not_exist()
+
         print("Todas as migrações foram verificadas/aplicadas!")
 
+        # Popular contadores materializados de pedidos na primeira execução
+        from src.services.order_stats import rebuild_order_status_counters
+        if OrderStatusCounter.query.first() is None and Order.query.first() is not None:
+            print("Reconstruindo contadores de status de pedidos...")
+            rebuild_order_status_counters()
+
+        # Popular totais diários das estatísticas na primeira execução
+        from src.services.statistics import rebuild_daily_stats
+        if OrderDailyStats.query.first() is None and Order.query.first() is not None:
+            print("Reconstruindo totais diários de estatísticas...")
+            rebuild_daily_stats()
+
+        # Criar e popular o índice de busca de pedidos na primeira execução
+        from src.services.search import ensure_search_index, rebuild_search_index
+        if ensure_search_index() and Order.query.first() is not None:
+            print("Reconstruindo índice de busca de pedidos...")
+            rebuild_search_index()
+
         # Criar usuários admin padrão se não existirem
         try:
             if not User.query.filter_by(username='Nonato').first():
@@ -261,6 +319,24 @@ with app.app_context():
 def index():
     return redirect(url_for('auth.login'))
 
+def is_upload_path(path):
+    """Verdadeiro se o caminho (relativo à pasta static) estiver dentro de UPLOAD_FOLDER"""
+    uploads = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    full_path = os.path.realpath(os.path.join(app.static_folder, path))
+    return full_path == uploads or full_path.startswith(uploads + os.sep)
+
+@app.before_request
+def block_public_uploads():
+    """
+    Uploads (logos, fotos, arquivos de ordens de serviço, pacotes ZIP) ficam
+    dentro da pasta static, mas só são entregues pelas rotas com controle de
+    acesso e URLs assinadas (files.deliver): as rotas estáticas os recusam.
+    """
+    if request.endpoint in ('static', 'serve_static'):
+        path = request.view_args.get('filename') or request.view_args.get('path') or ''
+        if is_upload_path(path):
+            return "File not found", 404
+
 @app.route('/<path:path>')
 def serve_static(path):
     static_folder_path = app.static_folder
@@ -86,6 +86,15 @@ class Order(db.Model):
     delivered_at = db.Column(db.DateTime)
     is_urgent = db.Column(db.Boolean, default=False)
 
+    # Índices das listagens (filtros por status/cliente e ordenação por data)
+    __table_args__ = (
+        db.Index('ix_order_status_approved_created_at', 'status', 'approved', 'created_at'),
+        db.Index('ix_order_client_id_created_at', 'client_id', 'created_at'),
+        db.Index('ix_order_client_id_delivery_date', 'client_id', 'delivery_date'),
+        db.Index('ix_order_delivery_date', 'delivery_date'),
+        db.Index('ix_order_status_delivered_at', 'status', 'delivered_at'),
+    )
+
     # ==================================================================
     # RELACIONAMENTOS CORRIGIDOS E CENTRALIZADOS
     # ==================================================================
@@ -128,6 +137,67 @@ class Order(db.Model):
         }
 
 
+class OrderStatusCounter(db.Model):
+    """Contadores materializados de pedidos por status (global e por cliente)"""
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = contador global
+    status = db.Column(db.String(50), nullable=False)
+    approved = db.Column(db.Boolean, nullable=False, default=False)
+    is_urgent = db.Column(db.Boolean, nullable=False, default=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('client_id', 'status', 'approved', 'is_urgent', name='unique_order_status_counter'),)
+
+    def __repr__(self):
+        return f'<OrderStatusCounter {self.client_id}/{self.status}: {self.count}>'
+
+    def to_dict(self):
+        return {
+            'client_id': self.client_id or None,
+            'status': self.status,
+            'approved': self.approved,
+            'is_urgent': self.is_urgent,
+            'count': self.count
+        }
+
+
+class OrderDailyStats(db.Model):
+    """Totais diários de pedidos (global e por cliente) para as estatísticas"""
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = total global
+    day = db.Column(db.Date, nullable=False)
+    orders_created = db.Column(db.Integer, nullable=False, default=0)  # pelo dia de criação
+    orders_approved = db.Column(db.Integer, nullable=False, default=0)  # aprovados, pelo dia de criação
+    orders_delivered = db.Column(db.Integer, nullable=False, default=0)  # pelo dia da entrega
+    delivered_on_time = db.Column(db.Integer, nullable=False, default=0)  # entregues até delivery_date
+    lead_time_days = db.Column(db.Integer, nullable=False, default=0)  # soma de dias entre criação e entrega
+
+    __table_args__ = (db.UniqueConstraint('client_id', 'day', name='unique_order_daily_stats'),)
+
+    def __repr__(self):
+        return f'<OrderDailyStats {self.client_id}/{self.day}>'
+
+    def to_dict(self):
+        return {
+            'client_id': self.client_id or None,
+            'day': self.day.isoformat() if self.day else None,
+            'orders_created': self.orders_created,
+            'orders_approved': self.orders_approved,
+            'orders_delivered': self.orders_delivered,
+            'delivered_on_time': self.delivered_on_time,
+            'lead_time_days': self.lead_time_days
+        }
+
+
+class DataVersion(db.Model):
+    """Sequência de alterações por conjunto de dados (usada como ETag das APIs)"""
+    name = db.Column(db.String(50), primary_key=True)  # order, notification, status_permission
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}: {self.version}>'
+
+
 class OrderObservation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
@@ -139,6 +209,8 @@ class OrderObservation(db.Model):
             )
     author = db.relationship('User', back_populates='observations')
 
+    __table_args__ = (db.Index('ix_order_observation_order_id_created_at', 'order_id', 'created_at'),)
+
     def __repr__(self):
                 return f'<OrderObservation {self.id}>'
 
@@ -162,6 +234,7 @@ class Notification(db.Model):
         default=lambda: datetime.now(pytz.timezone("America/Sao_Paulo"))
     )
 
+    __table_args__ = (db.Index('ix_notification_user_id_read_created_at', 'user_id', 'read', 'created_at'),)
 
     def __repr__(self):
         return f'<Notification {self.title}>'
@@ -176,6 +249,52 @@ class Notification(db.Model):
         }
 
 
+class BroadcastNotification(db.Model):
+    """Notificação única enviada a todos os usuários de um tipo (funcionario, admin...)"""
+    id = db.Column(db.Integer, primary_key=True)
+    audience = db.Column(db.String(20), nullable=False)  # user_type dos destinatários
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(pytz.timezone("America/Sao_Paulo"))
+    )
+
+    __table_args__ = (db.Index('ix_broadcast_notification_audience_id', 'audience', 'id'),)
+
+    def __repr__(self):
+        return f'<BroadcastNotification {self.audience}: {self.title}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'audience': self.audience,
+            'title': self.title,
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class NotificationReadState(db.Model):
+    """Cursor de leitura por público: notificações em massa com id <= last_read_id estão lidas"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    audience = db.Column(db.String(20), primary_key=True)
+    last_read_id = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NotificationReadState {self.user_id}/{self.audience}: {self.last_read_id}>'
+
+
+class BroadcastNotificationRead(db.Model):
+    """Notificações em massa lidas individualmente acima do cursor, ou ocultas do usuário"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcast_notification.id'), primary_key=True)
+    hidden = db.Column(db.Boolean, nullable=False, default=False)  # usuário inativo no envio
+
+    def __repr__(self):
+        return f'<BroadcastNotificationRead {self.user_id}: {self.broadcast_id}>'
+
+
 # Tabela de associação entre ServiceOrder e funcionários
 service_order_employees = db.Table('service_order_employees',
     db.Column('service_order_id', db.Integer, db.ForeignKey('service_order.id'), primary_key=True),
@@ -202,6 +321,8 @@ class ServiceOrder(db.Model):
     assigned_employees = db.relationship('User', secondary=service_order_employees, 
                                        backref=db.backref('assigned_service_orders', lazy='dynamic'))
 
+    __table_args__ = (db.Index('ix_service_order_order_id', 'order_id'),)
+
     def __repr__(self):
         return f'<ServiceOrder {self.title}>'
 
@@ -218,13 +339,12 @@ class ServiceOrder(db.Model):
 
     def get_files_list_with_size(self):
         """Retorna lista de arquivos com nome e tamanho"""
-        from flask import current_app
+        from src.services.file_store import file_path as stored_file_path
         import os
         files_with_size = []
-        files_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'service_orders')
         for filename in self.get_files_list():
-            file_path = os.path.join(files_dir, filename)
-            if os.path.exists(file_path):
+            file_path = stored_file_path(filename, 'service_order')
+            if file_path and os.path.exists(file_path):
                 size = os.path.getsize(file_path)
                 files_with_size.append({'filename': filename, 'size': size})
         return files_with_size
@@ -284,6 +404,8 @@ class StatusHistory(db.Model):
     # Relacionamentos
     user = db.relationship('User', backref='status_history_entries')
 
+    __table_args__ = (db.Index('ix_status_history_order_id_created_at', 'order_id', 'created_at'),)
+
     def __repr__(self):
         return f'<StatusHistory {self.order_id}: {self.old_status} -> {self.new_status}>'
 
@@ -311,6 +433,8 @@ class DeliveryOption(db.Model):
     # Relacionamentos
     created_by = db.relationship('User', backref='delivery_options_created')
 
+    __table_args__ = (db.Index('ix_delivery_option_order_id_created_at', 'order_id', 'created_at'),)
+
     def __repr__(self):
         return f'<DeliveryOption {self.order_id}>'
 
@@ -427,6 +551,60 @@ class FileReference(db.Model):
         }
 
 
+class ChunkedUpload(db.Model):
+    """Upload em partes de arquivos grandes (retomável, partes em paralelo)"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    filename = db.Column(db.String(200), nullable=False)  # nome original (secure_filename)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # checksum informado no início (opcional)
+    stored_name = db.Column(db.String(200))  # nome no store após a finalização
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(pytz.timezone("America/Sao_Paulo"))
+    )
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (db.Index('ix_chunked_upload_expires_at', 'expires_at'),)
+
+    @property
+    def total_chunks(self):
+        """Quantidade de partes do arquivo"""
+        return max((self.total_size + self.chunk_size - 1) // self.chunk_size, 1)
+
+    def chunk_length(self, index):
+        """Tamanho esperado da parte (a última pode ser menor)"""
+        if index == self.total_chunks - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+
+    def __repr__(self):
+        return f"<ChunkedUpload {self.id} {self.filename}>"
+
+
+class BackupManifest(db.Model):
+    """Manifesto de um backup gravado no servidor (base dos backups incrementais)"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex (backup_id)
+    parent_id = db.Column(db.String(32))  # backup anterior da cadeia (incremental)
+    mode = db.Column(db.String(20), nullable=False)  # 'full' ou 'incremental'
+    filename = db.Column(db.String(100), nullable=False)  # nome do arquivo ZIP
+    file_count = db.Column(db.Integer, nullable=False, default=0)  # arquivos no manifesto
+    total_size = db.Column(db.BigInteger, nullable=False, default=0)
+    included_count = db.Column(db.Integer, nullable=False, default=0)  # arquivos gravados neste ZIP
+    included_size = db.Column(db.BigInteger, nullable=False, default=0)
+    manifest = db.Column(db.Text, nullable=False)  # JSON: caminho -> tamanho, mtime, sha256, backup
+    created_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(pytz.timezone("America/Sao_Paulo"))
+    )
+
+    __table_args__ = (db.Index('ix_backup_manifest_created_at', 'created_at'),)
+
+    def __repr__(self):
+        return f"<BackupManifest {self.id} {self.mode}>"
+
+
 # Melhorias no modelo ServiceOrder existente
 # Adicione estes métodos à classe ServiceOrder existente:
 
@@ -462,71 +640,3 @@ def get_file_references(self):
             if ref:
                 files.append(ref)
     return files
-
-
-# Funções utilitárias para gerenciamento de arquivos
-def create_file_reference(filename, file_path=None):
-    """Cria ou atualiza referência de arquivo"""
-    ref = FileReference.query.filter_by(filename=filename).first()
-    
-    if not ref:
-        # Obter informações do arquivo se o caminho for fornecido
-        file_size = None
-        file_type = None
-        
-        if file_path and os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-            import mimetypes
-            file_type, _ = mimetypes.guess_type(file_path)
-        
-        ref = FileReference(
-            filename=filename,
-            reference_count=1,
-            file_size=file_size,
-            file_type=file_type
-        )
-        db.session.add(ref)
-    else:
-        ref.increment_reference()
-    
-    return ref
-
-
-def remove_file_reference(filename):
-    """Remove referência de arquivo e exclui fisicamente se necessário"""
-    ref = FileReference.query.filter_by(filename=filename).first()
-    
-    if ref:
-        remaining_refs = ref.decrement_reference()
-        
-        if remaining_refs <= 0:
-            # Remover arquivo físico
-            from flask import current_app
-            file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], "service_orders", filename)
-            
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    current_app.logger.info(f"Arquivo físico removido: {filename}")
-            except OSError as e:
-                current_app.logger.error(f"Erro ao remover arquivo {filename}: {str(e)}")
-            
-            # Remover registro de referência
-            db.session.delete(ref)
-            return True  # Arquivo foi removido
-    
-    return False  # Arquivo não foi removido
-
-
-def cleanup_orphaned_files():
-    """Remove arquivos órfãos do sistema"""
-    orphaned_refs = FileReference.query.filter(FileReference.reference_count <= 0).all()
-    
-    removed_count = 0
-    for ref in orphaned_refs:
-        if remove_file_reference(ref.filename):
-            removed_count += 1
-    
-    return removed_count
-
-
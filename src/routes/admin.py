@@ -1,12 +1,41 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_from_directory, send_file, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, date
 import os
-from src.models.user import db, User, Order, OrderObservation, Notification, ServiceOrder, AuditLog, FileReference # Adicionado AuditLog e FileReference
+import uuid
+from sqlalchemy.orm import defer
+from src.models.user import db, User, Order, OrderObservation, Notification, ServiceOrder, AuditLog, FileReference, BackupManifest # Adicionado AuditLog e FileReference
 from datetime import date
 import pytz
 from src.utils.date_utils import get_delivery_status_text, get_weekday_name_pt
+from src.services.order_queries import (
+    order_list_query, get_service_orders_by_order, get_status_history_by_order, get_latest_observations,
+    ORDER_CREATED_KEYS, ORDER_DELIVERED_KEYS
+)
+from src.services.pagination import keyset_paginate
+from src.services.notifications import (
+    notify_users, notify_user_type, delete_user_notifications, delete_all_notifications,
+    get_unread_count, mark_all_read, paginate_notifications
+)
+from src.services.notification_events import notification_stream_response
+from src.services.data_versions import conditional_get
+from src.services.status_permissions import AVAILABLE_STATUSES, get_status_permissions_map, invalidate_status_permissions
+from src.services.calendar import parse_calendar_window, get_calendar_events
+from src.services.serializers import json_array_response, order_serializer, service_order_serializer
+from src.services.order_stats import get_admin_dashboard_counters, get_order_status_counts, rebuild_order_status_counters
+from src.services.statistics import get_statistics, get_monthly_approved_orders, parse_statistics_args, rebuild_daily_stats, get_delivery_kpis, parse_date_range
+from src.services.search import search_orders, rebuild_search_index
+from src.services.images import InvalidImageError, save_image
+from src.services.file_store import save_file, release_file, file_path, display_name, rebuild_file_references
+from src.services.chunked_uploads import (
+    SERVICE_ORDER_EXTENSIONS, ChunkedUploadError, start_upload, get_upload, upload_status,
+    write_chunk, finalize_upload, take_upload, cancel_upload
+)
+from src.services.file_delivery import IMAGE_URL_TTL, signed_url
+from src.services.backup import (
+    BackupProgress, backup_filename, build_backup, stream_zip
+)
 from sqlalchemy.exc import SQLAlchemyError # Adicionado
 from sqlalchemy import or_ as db_or # Adicionado para db.or_
 import json # Adicionado
@@ -29,25 +58,15 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Dashboard principal do admin"""
-    # Estatísticas gerais (excluindo entregues do total)
-    total_orders = Order.query.filter(Order.status != 'entregue').count()
-    pending_orders = Order.query.filter_by(approved=False).count()
-    in_production = Order.query.filter_by(status='em_producao').count()
-    delivered_orders = Order.query.filter_by(status='entregue').count()
+    # Estatísticas gerais e funcionários ativos (consulta agrupada única)
+    counters = get_admin_dashboard_counters()
 
     # Pedidos recentes (excluindo entregues)
-    recent_orders = Order.query.filter(Order.status != 'entregue').order_by(Order.created_at.desc()).limit(5).all()
-
-    # Funcionários ativos
-    employees = User.query.filter_by(user_type='funcionario', is_active=True).count()
+    recent_orders = order_list_query(Order.status != 'entregue').order_by(Order.created_at.desc()).limit(5).all()
 
     return render_template('admin/dashboard.html', 
-                         total_orders=total_orders,
-                         pending_orders=pending_orders,
-                         in_production=in_production,
-                         delivered_orders=delivered_orders,
                          recent_orders=recent_orders,
-                         employees=employees)
+                         **counters)
 
 @admin_bp.route('/admin/pedidos/adicionar', methods=['GET', 'POST'])
 @login_required
@@ -68,11 +87,8 @@ def add_order():
             if 'company_logo' in request.files:
                 file = request.files['company_logo']
                 if file and file.filename:
-                    filename = secure_filename(file.filename)
-                    # Adicionar timestamp para evitar conflitos
-                    timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S_")
-                    logo_filename = timestamp + filename
-                    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
+                    # Valida, remove metadados e gera miniaturas/WebP (store por conteúdo)
+                    logo_filename = save_image(file)
 
             # Criar pedido
             order = Order(
@@ -108,24 +124,23 @@ def add_order():
 @admin_required
 def orders():
     """Lista de todos os pedidos (excluindo entregues)"""
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
 
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    query = Order.query.filter(Order.status != 'entregue')
+    query = order_list_query(Order.status != 'entregue')
+    counts = get_order_status_counts()
+    total = counts.count(exclude=['entregue'])
     if status_filter and status_filter != 'entregue':
         query = query.filter_by(status=status_filter)
-
-    try:
-        orders_pagination = query.order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False)
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('admin.orders', page=1, status=status_filter))
+        total = counts.count(statuses=[status_filter])
+
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders_pagination = keyset_paginate(
+        query,
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=total
+    )
 
     # Adicionar informações de data calculadas para cada pedido
     orders_with_data = []
@@ -152,16 +167,13 @@ def approve_order(order_id):
         order.status = 'aprovado'
 
         # Notificar funcionários
-        employees = User.query.filter_by(user_type='funcionario', is_active=True).all()
-        for employee in employees:
-            # Garantir que a mensagem seja tratada como UTF-8
-            company_name = order.company_name.encode('utf-8').decode('utf-8') if order.company_name else 'Empresa'
-            notification = Notification(
-                user_id=employee.id,
-                title='Novo pedido aprovado',
-                message=f'O pedido da empresa {company_name} foi aprovado e esta disponivel para producao.'
-            )
-            db.session.add(notification)
+        # Garantir que a mensagem seja tratada como UTF-8
+        company_name = order.company_name.encode('utf-8').decode('utf-8') if order.company_name else 'Empresa'
+        notify_user_type(
+            'funcionario',
+            title='Novo pedido aprovado',
+            message=f'O pedido da empresa {company_name} foi aprovado e esta disponivel para producao.'
+        )
 
         db.session.commit()
         flash('Pedido aprovado com sucesso!', 'success')
@@ -186,10 +198,8 @@ def delete_order(order_id):
     order = Order.query.get_or_404(order_id)
 
     # Remover arquivo de logo se existir
-    if order.company_logo:
-        logo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], order.company_logo)
-        if os.path.exists(logo_path):
-            os.remove(logo_path)
+    # Liberar a logo (arquivo removido quando não houver outras referências)
+    release_file(order.company_logo, 'logo')
 
     db.session.delete(order)
     db.session.commit()
@@ -201,7 +211,7 @@ def delete_order(order_id):
 @admin_required
 def status():
     """Gerenciar status dos pedidos"""
-    orders = Order.query.filter_by(approved=True).order_by(Order.created_at.desc()).all()
+    orders = order_list_query(Order.approved == True).order_by(Order.created_at.desc()).all()
     return render_template('admin/status.html', orders=orders)
 
 @admin_bp.route('/admin/pedidos/<int:order_id>/status', methods=['POST'])
@@ -284,16 +294,13 @@ def update_order_status_quick(order_id):
         order.is_urgent = False
 
         # Notificar funcionários sobre entrega
-        employees = User.query.filter_by(user_type='funcionario', is_active=True).all()
-        for employee in employees:
-            # Garantir que a mensagem seja tratada como UTF-8
-            company_name = order.company_name.encode('utf-8').decode('utf-8') if order.company_name else 'Empresa'
-            notification = Notification(
-                user_id=employee.id,
-                title='Pedido Entregue',
-                message=f'O pedido da empresa {company_name} foi entregue com sucesso.'
-            )
-            db.session.add(notification)
+        # Garantir que a mensagem seja tratada como UTF-8
+        company_name = order.company_name.encode('utf-8').decode('utf-8') if order.company_name else 'Empresa'
+        notify_user_type(
+            'funcionario',
+            title='Pedido Entregue',
+            message=f'O pedido da empresa {company_name} foi entregue com sucesso.'
+        )
 
     db.session.commit()
 
@@ -427,36 +434,58 @@ import pytz
 @admin_required
 def delivered():
     """Pedidos entregues"""
-    page = request.args.get('page', 1, type=int)
+    # Indicadores de pontualidade sobre todas as entregas (consulta agregada)
+    now = datetime.now()
+    delivery_kpis = get_delivery_kpis(now=now)
 
     # Apenas pedidos com status 'entregue' e que tenham data de entrega registrada
-    orders = Order.query.filter(
-        Order.status == 'entregue',
-        Order.delivered_at.isnot(None)
-    ).order_by(Order.delivered_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    # (paginação por cursor em delivered_at, id)
+    orders = keyset_paginate(
+        order_list_query(
+            Order.status == 'entregue',
+            Order.delivered_at.isnot(None)
+        ),
+        ORDER_DELIVERED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=delivery_kpis['total']
     )
 
-    # Conta pedidos entregues no prazo
-    on_time = sum(
-        1 for o in orders.items
-        if o.delivered_at and o.delivery_date >= o.delivered_at.date()
-    )
+    # Histórico de status dos pedidos da página (consulta única)
+    status_history_by_order = get_status_history_by_order([order.id for order in orders.items])
 
     return render_template(
         'admin/delivered.html',
         orders=orders,
-        on_time=on_time,
-        now=datetime.now()
+        delivery_kpis=delivery_kpis,
+        status_history_by_order=status_history_by_order,
+        now=now
     )
 
 
+@admin_bp.route('/admin/api/entregas/indicadores')
+@login_required
+@admin_required
+@conditional_get('order', daily=True)
+def delivery_kpis_api():
+    """API de pontualidade das entregas (start e end opcionais, YYYY-MM-DD)"""
+    try:
+        start, end = parse_date_range(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas inválidas'}), 400
+
+    return jsonify(get_delivery_kpis(start=start, end=end))
+
+
 @admin_bp.route('/admin/configuracoes')
 @login_required
 @admin_required
 def settings():
     """Configurações do admin"""
-    return render_template('admin/settings.html')
+    # Manifesto (JSON grande) não é necessário para exibir o último backup
+    last_backup = BackupManifest.query.options(defer(BackupManifest.manifest)) \
+        .order_by(BackupManifest.created_at.desc()).first()
+    return render_template('admin/settings.html', last_backup=last_backup)
 
 @admin_bp.route('/admin/configuracoes/senha', methods=['POST'])
 @login_required
@@ -493,32 +522,12 @@ def upload_profile_picture():
         flash('Nenhum arquivo selecionado!', 'error')
         return redirect(url_for('admin.settings'))
 
-    # Verificar se é uma imagem válida
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-
-    if file_extension not in allowed_extensions:
-        flash('Formato de arquivo inválido! Use PNG, JPG, JPEG, GIF ou WEBP.', 'error')
-        return redirect(url_for('admin.settings'))
-
     try:
-        # Remover foto anterior se existir
-        if current_user.profile_picture:
-            old_photo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles', current_user.profile_picture)
-            if os.path.exists(old_photo_path):
-                os.remove(old_photo_path)
-
-        # Criar diretório de perfis se não existir
-        profile_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles')
-        os.makedirs(profile_dir, exist_ok=True)
-
-        # Salvar nova foto
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S_")
-        profile_filename = f"{timestamp}profile_{current_user.id}_{filename}"
+        # Valida, remove metadados e gera miniaturas/WebP
+        profile_filename = save_image(file)
 
-        file_path = os.path.join(profile_dir, profile_filename)
-        file.save(file_path)
+        # Liberar a foto anterior após gravar a nova
+        release_file(current_user.profile_picture, 'profile')
 
         # Atualizar banco de dados
         current_user.profile_picture = profile_filename
@@ -526,17 +535,66 @@ def upload_profile_picture():
 
         flash('Foto de perfil atualizada com sucesso!', 'success')
 
+    except InvalidImageError as e:
+        flash(str(e), 'error')
     except Exception as e:
         flash(f'Erro ao fazer upload da foto: {str(e)}', 'error')
 
     return redirect(url_for('admin.settings'))
 
-@admin_bp.route('/uploads/profiles/<filename>')
+@admin_bp.route('/uploads/logos/<path:filename>')
+@login_required
+def serve_logo(filename):
+    """Servir logos dos pedidos (redireciona para a URL assinada)"""
+    path = file_path(filename, 'logo')
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return redirect(signed_url(path, ttl=IMAGE_URL_TTL))
+
+@admin_bp.route('/uploads/profiles/<path:filename>')
 @login_required
 def serve_profile_picture(filename):
-    """Servir imagens de perfil"""
-    profile_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles')
-    return send_from_directory(profile_dir, filename)
+    """Servir imagens de perfil (redireciona para a URL assinada)"""
+    path = file_path(filename, 'profile')
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return redirect(signed_url(path, ttl=IMAGE_URL_TTL))
+
+@admin_bp.route('/admin/api/notificacoes')
+@login_required
+@admin_required
+@conditional_get('notification')
+def notifications_api():
+    """API com as notificações não lidas mais recentes do admin (menu do sino)"""
+    notifications = paginate_notifications(current_user, per_page=10, unread_only=True)
+    return jsonify({
+        'count': get_unread_count(current_user),
+        'notifications': [
+            {
+                'title': notification.title,
+                'message': notification.message,
+                'created_at': notification.created_at.strftime('%d/%m/%Y %H:%M') if notification.created_at else None
+            }
+            for notification in notifications.items
+        ]
+    })
+
+@admin_bp.route('/admin/notificacoes/marcar-todas-lidas', methods=['POST'])
+@login_required
+@admin_required
+def mark_all_notifications_read():
+    """Marcar todas as notificações do admin como lidas"""
+    mark_all_read(current_user)
+    db.session.commit()
+
+    return jsonify({"success": True, "message": "Notificações marcadas como lidas."})
+
+@admin_bp.route('/admin/api/notificacoes/stream')
+@login_required
+@admin_required
+def notifications_stream():
+    """Stream SSE com contagem de não lidas e novas notificações do admin"""
+    return notification_stream_response(current_user)
 
 @admin_bp.route('/admin/calendario')
 @login_required
@@ -548,37 +606,52 @@ def calendar():
 @admin_bp.route('/admin/api/calendario')
 @login_required
 @admin_required
+@conditional_get('order')
 def calendar_api():
     """API para dados do calendário do admin"""
-    orders = Order.query.filter(Order.status != 'entregue').all()
-    events = []
-
-    for order in orders:
-        # Cor baseada no status
-        color_map = {
-            'aprovado': '#3788d8',
-            'em_producao': '#8b4513',
-            'pronto': '#10b981',
-            'entregue': '#4f5553'
-        }
+    # Janela visível enviada pelo FullCalendar (start/end)
+    try:
+        start, end = parse_calendar_window(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas inválidas'}), 400
+
+    events = get_calendar_events(
+        start=start,
+        end=end,
+        approved_only=False,
+        include_delivered=request.args.get('include_delivered') == '1'
+    )
 
-        # Evento para data de entrega
-        events.append({
-            'id': f'delivery_{order.id}',
-            'title': f'{order.company_name}',
-            'start': order.delivery_date.isoformat(),
-            'backgroundColor': color_map.get(order.status, '#6b7280'),
-            'borderColor': color_map.get(order.status, '#6b7280'),
-            'extendedProps': {
-                'type': 'delivery',
-                'order_id': order.id,
-                'company_name': order.company_name,
-                'status': order.status,
-                'order_date': order.order_date.isoformat()
-            }
-        })
+    return json_array_response(events)
+
+@admin_bp.route('/admin/api/exportar/pedidos')
+@login_required
+@admin_required
+def export_orders():
+    """Exporta pedidos em JSON (transmitido em lotes)"""
+    criteria = []
+    status = request.args.get('status')
+    if status:
+        criteria.append(Order.status == status)
+    if request.args.get('approved') in ('0', '1'):
+        criteria.append(Order.approved == (request.args.get('approved') == '1'))
+    client_id = request.args.get('client_id', type=int)
+    if client_id:
+        criteria.append(Order.client_id == client_id)
+
+    return order_serializer.response(*criteria, order_by=Order.id)
+
+@admin_bp.route('/admin/api/exportar/ordens-servico')
+@login_required
+@admin_required
+def export_service_orders():
+    """Exporta ordens de serviço em JSON (transmitido em lotes)"""
+    criteria = []
+    order_id = request.args.get('order_id', type=int)
+    if order_id:
+        criteria.append(ServiceOrder.order_id == order_id)
 
-    return jsonify(events)
+    return service_order_serializer.response(*criteria, order_by=ServiceOrder.id)
 
 # Em src/routes/admin.py
 
@@ -590,28 +663,20 @@ from sqlalchemy import func, extract
 @admin_required
 def statistics():
     """Estatísticas do sistema"""
-    from sqlalchemy import func, extract
+    # Estatísticas básicas (contadores materializados)
+    counts = get_order_status_counts()
+    total_orders = counts.count(approved=True)
+    in_production = counts.count(statuses=['em_producao'], approved=True)
+    completed = counts.count(statuses=['entregue'], approved=True)
 
-    # Estatísticas básicas
-    total_orders = Order.query.filter_by(approved=True).count()
-    in_production = Order.query.filter_by(status='em_producao', approved=True).count()
-    completed = Order.query.filter_by(status='entregue', approved=True).count()
-
-    # Pedidos por mês
-    monthly_orders_rows = db.session.query(
-        extract('month', Order.created_at).label('month'),
-        func.count(Order.id).label('count')
-    ).filter_by(approved=True).group_by(extract('month', Order.created_at)).order_by(extract('month', Order.created_at)).all()
+    # Pedidos aprovados por mês (últimos 12 meses, totais diários)
+    monthly_orders_data = get_monthly_approved_orders()
 
     # Pedidos por status
-    status_counts_rows = db.session.query(
-        Order.status,
-        func.count(Order.id).label('count')
-    ).filter_by(approved=True).group_by(Order.status).all()
+    status_counts_rows = counts.by_status(approved=True)
 
     # Converta os resultados do tipo Row para dicionários
-    monthly_orders_data = [{'month': row.month, 'count': row.count} for row in monthly_orders_rows]
-    status_counts_data = [{'status': row.status, 'count': row.count} for row in status_counts_rows]
+    status_counts_data = [{'status': status, 'count': count} for status, count in status_counts_rows]
 
     return render_template(
         'admin/statistics.html', 
@@ -622,6 +687,33 @@ def statistics():
         status_counts=status_counts_data
     )
 
+@admin_bp.route('/admin/api/estatisticas')
+@login_required
+@admin_required
+@conditional_get('order', daily=True)
+def statistics_api():
+    """API de estatísticas por período (start, end, bucket e client_id)"""
+    try:
+        start, end, bucket = parse_statistics_args(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos'}), 400
+
+    client_id = request.args.get('client_id', type=int)
+    return jsonify(get_statistics(start, end, bucket=bucket, client_id=client_id))
+
+@admin_bp.route('/admin/api/pedidos/busca')
+@login_required
+@admin_required
+def search_orders_api():
+    """Busca de pedidos por relevância (q, page e per_page)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': 'Informe o termo de busca'}), 400
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    return jsonify(dict(search_orders(query, page=page, per_page=per_page), success=True))
+
 
 
 
@@ -632,17 +724,19 @@ def statistics():
 @admin_required
 def service_orders():
     """Lista todos os pedidos para criar ordens de serviço"""
-    page = request.args.get('page', 1, type=int)
     per_page = 10
 
-    # Buscar todos os pedidos
-    orders = Order.query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    # Buscar todos os pedidos (paginação por cursor em created_at, id)
+    orders = keyset_paginate(
+        order_list_query(),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        total=get_order_status_counts().count()
     )
 
-    # Buscar ordens de serviço existentes
-    existing_service_orders = ServiceOrder.query.all()
-    service_orders_by_order = {so.order_id: so for so in existing_service_orders}
+    # Buscar ordens de serviço existentes (apenas dos pedidos da página)
+    service_orders_by_order = get_service_orders_by_order([order.id for order in orders.items])
 
     return render_template('admin/service_orders.html', 
                          orders=orders,
@@ -674,22 +768,21 @@ def create_service_order(order_id):
         uploaded_files = {}
 
         for i, field_name in enumerate(file_fields):
+            # Arquivo já enviado em partes pela API de upload
+            upload_id = request.form.get(f'{field_name}_upload_id')
+            if upload_id:
+                try:
+                    uploaded_files[file_columns[i]] = take_upload(upload_id, current_user)
+                except ChunkedUploadError as e:
+                    flash(str(e), 'error')
+                    return redirect(url_for('admin.create_service_order', order_id=order_id))
+                continue
+
             if field_name in request.files:
                 file = request.files[field_name]
-                if file and file.filename and (file.filename.lower().endswith(('.pdf', '.cdr', '.dxf', '.zip', '.rar', '.xls', '.xlsx', '.ia', '.pptx')) or file.content_type in ['application/pdf', 'application/x-coreldraw', 'image/vnd.dxf', 'application/zip', 'application/x-rar-compressed', 'application/vnd.ms-excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'application/illustrator', 'application/vnd.openxmlformats-officedocument.presentationml.presentation']):
-                    filename = secure_filename(file.filename)
-                    # Adicionar timestamp para evitar conflitos
-                    timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S_")
-                    final_filename = f"{timestamp}{filename}"
-
-                    # Criar diretório para arquivos se não existir
-                    files_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'service_orders')
-                    os.makedirs(files_dir, exist_ok=True)
-
-                    file_path = os.path.join(files_dir, final_filename)
-                    file.save(file_path)
-
-                    uploaded_files[file_columns[i]] = final_filename
+                if file and file.filename and (file.filename.lower().endswith(SERVICE_ORDER_EXTENSIONS) or file.content_type in ['application/pdf', 'application/x-coreldraw', 'image/vnd.dxf', 'application/zip', 'application/x-rar-compressed', 'application/vnd.ms-excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'application/illustrator', 'application/vnd.openxmlformats-officedocument.presentationml.presentation']):
+                    # Store por conteúdo: arquivos reenviados não são gravados de novo
+                    uploaded_files[file_columns[i]] = save_file(file, keep_name=True)
 
         # Criar ou atualizar ordem de serviço
         if existing_service_order:
@@ -698,6 +791,7 @@ def create_service_order(order_id):
             service_order.description = description
             # Atualizar apenas os arquivos que foram enviados
             for column, filename in uploaded_files.items():
+                release_file(getattr(service_order, column), 'service_order')
                 setattr(service_order, column, filename)
         else:
             service_order = ServiceOrder(
@@ -714,21 +808,22 @@ def create_service_order(order_id):
         # Limpar funcionários anteriores e adicionar novos
         service_order.assigned_employees.clear()
 
-        # Adicionar funcionários selecionados
-        for emp_id in selected_employees:
-            employee = User.query.get(int(emp_id))
-            if employee and employee.is_employee():
-                service_order.assigned_employees.append(employee)
-
-                # Criar notificação para o funcionário
-                # Garantir que a mensagem seja tratada como UTF-8
-                safe_title = title.encode('utf-8').decode('utf-8') if title else 'Nova Ordem'
-                notification = Notification(
-                    user_id=employee.id,
-                    title='Nova Ordem de Servico',
-                    message=f'Voce recebeu uma nova ordem de servico: {safe_title}'
-                )
-                db.session.add(notification)
+        # Adicionar funcionários selecionados (busca única)
+        employee_ids = [int(emp_id) for emp_id in selected_employees]
+        employees = User.query.filter(
+            User.id.in_(employee_ids),
+            User.user_type == 'funcionario'
+        ).all() if employee_ids else []
+        service_order.assigned_employees.extend(employees)
+
+        # Criar notificação para os funcionários
+        # Garantir que a mensagem seja tratada como UTF-8
+        safe_title = title.encode('utf-8').decode('utf-8') if title else 'Nova Ordem'
+        notify_users(
+            [employee.id for employee in employees],
+            title='Nova Ordem de Servico',
+            message=f'Voce recebeu uma nova ordem de servico: {safe_title}'
+        )
 
         db.session.commit()
         flash('Ordem de serviço criada/atualizada com sucesso!', 'success')
@@ -742,6 +837,118 @@ def create_service_order(order_id):
                          employees=employees,
                          existing_service_order=existing_service_order)
 
+# Upload em partes (arquivos grandes das ordens de serviço)
+SERVICE_ORDER_FILE_COLUMNS = {1: 'file1_filename', 2: 'file2_filename', 3: 'file3_filename'}
+
+
+def _chunked_upload_or_404(upload_id):
+    upload = get_upload(upload_id, current_user)
+    if upload is None:
+        abort(404)
+    return upload
+
+
+@admin_bp.route('/admin/api/uploads', methods=['POST'])
+@login_required
+@admin_required
+def start_chunked_upload():
+    """
+    Inicia um upload em partes.
+
+    JSON: filename, total_size, chunk_size (opcional) e sha256 (opcional).
+    As partes são enviadas com PUT em /admin/api/uploads/<id>/partes/<índice>.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = start_upload(
+            current_user,
+            data.get('filename'),
+            data.get('total_size'),
+            chunk_size=data.get('chunk_size'),
+            sha256=data.get('sha256')
+        )
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify(dict(upload_status(upload), success=True)), 201
+
+
+@admin_bp.route('/admin/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+@admin_required
+def chunked_upload_status(upload_id):
+    """Partes recebidas e faltantes (para retomar um upload interrompido)"""
+    upload = _chunked_upload_or_404(upload_id)
+    return jsonify(dict(upload_status(upload), success=True))
+
+
+@admin_bp.route('/admin/api/uploads/<upload_id>/partes/<int:index>', methods=['PUT'])
+@login_required
+@admin_required
+def upload_chunk(upload_id, index):
+    """
+    Recebe uma parte (corpo binário, gravado direto no disco).
+
+    Cabeçalho opcional X-Chunk-Sha256 com o checksum da parte.
+    """
+    upload = _chunked_upload_or_404(upload_id)
+    try:
+        write_chunk(
+            upload,
+            index,
+            request.stream,
+            request.content_length,
+            sha256=request.headers.get('X-Chunk-Sha256')
+        )
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'index': index})
+
+
+@admin_bp.route('/admin/api/uploads/<upload_id>/finalizar', methods=['POST'])
+@login_required
+@admin_required
+def finalize_chunked_upload(upload_id):
+    """
+    Finaliza o upload conferindo o checksum.
+
+    JSON opcional: sha256 do arquivo inteiro; service_order_id e slot (1 a 3)
+    para anexar o arquivo direto a uma ordem de serviço existente. Sem eles,
+    o upload_id é enviado no formulário da ordem de serviço (fileN_upload_id).
+    """
+    upload = _chunked_upload_or_404(upload_id)
+    data = request.get_json(silent=True) or {}
+
+    service_order = None
+    column = None
+    if data.get('service_order_id') is not None:
+        column = SERVICE_ORDER_FILE_COLUMNS.get(data.get('slot'))
+        if column is None:
+            return jsonify({'success': False, 'message': 'Posição de arquivo inválida'}), 400
+        service_order = ServiceOrder.query.get_or_404(data['service_order_id'])
+
+    try:
+        filename = finalize_upload(upload, sha256=data.get('sha256'))
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    result = {'success': True, 'upload_id': upload_id, 'filename': filename, 'display_name': display_name(filename)}
+    if service_order is not None:
+        take_upload(upload_id, current_user)
+        release_file(getattr(service_order, column), 'service_order')
+        setattr(service_order, column, filename)
+        db.session.commit()
+        result['service_order_id'] = service_order.id
+    return jsonify(result)
+
+
+@admin_bp.route('/admin/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def cancel_chunked_upload(upload_id):
+    """Cancela um upload em partes"""
+    cancel_upload(_chunked_upload_or_404(upload_id))
+    return jsonify({'success': True})
+
 @admin_bp.route('/admin/ordem-servico/detalhes/<int:service_order_id>')
 @login_required
 @admin_required
@@ -752,6 +959,22 @@ def service_order_details(service_order_id):
     return render_template('admin/service_order_details.html', 
                          service_order=service_order)
 
+@admin_bp.route('/admin/ordem-servico/<int:service_order_id>/download/<path:filename>')
+@login_required
+@admin_required
+def download_service_order_file(service_order_id, filename):
+    """Download de arquivo da ordem de serviço com o nome original"""
+    service_order = ServiceOrder.query.get_or_404(service_order_id)
+
+    if filename not in service_order.get_files_list():
+        abort(404)
+
+    path = file_path(filename, 'service_order')
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    return redirect(signed_url(path, download_name=display_name(filename)))
+
 from sqlalchemy.exc import SQLAlchemyError
 import json
 
@@ -780,32 +1003,9 @@ def delete_service_order(service_order_id):
             'files': service_order.get_files_list()
         }
 
-        # Remover arquivos associados com verificação de referências
-        files_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'service_orders')
-
+        # Liberar arquivos associados (removidos quando não houver outras referências)
         for filename in service_order.get_files_list():
-            if filename:
-                # Verificar se o arquivo é usado por outras ordens de serviço
-                other_orders_using_file = ServiceOrder.query.filter(
-                    ServiceOrder.id != service_order_id,
-                    db_or(
-                        ServiceOrder.file1_filename == filename,
-                        ServiceOrder.file2_filename == filename,
-                        ServiceOrder.file3_filename == filename
-                    )
-                ).count()
-
-                # Só remover o arquivo se não estiver sendo usado por outras ordens
-                if other_orders_using_file == 0:
-                    file_path = os.path.join(files_dir, filename)
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                            current_app.logger.info(f'Arquivo removido: {filename}')
-                        except OSError as e:
-                            current_app.logger.warning(f'Erro ao remover arquivo {filename}: {str(e)}')
-                else:
-                    current_app.logger.info(f'Arquivo {filename} mantido (usado por outras ordens)')
+            release_file(filename, 'service_order')
 
         # Remover notificações específicas desta ordem de serviço
         # Buscar notificações dos funcionários atribuídos que mencionam esta ordem
@@ -1043,16 +1243,10 @@ def edit_order(order_id):
             if 'company_logo' in request.files:
                 file = request.files['company_logo']
                 if file and file.filename:
-                    # Remover logo antiga se existir
-                    if order.company_logo:
-                        old_logo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], order.company_logo)
-                        if os.path.exists(old_logo_path):
-                            os.remove(old_logo_path)
-
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S_")
-                    logo_filename = timestamp + filename
-                    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], logo_filename))
+                    logo_filename = save_image(file)
+
+                    # Liberar a logo antiga após gravar a nova
+                    release_file(order.company_logo, 'logo')
                     order.company_logo = logo_filename
 
             db.session.commit()
@@ -1072,7 +1266,6 @@ def edit_order(order_id):
 def status_orders():
     """Pedidos por status"""
     status = request.args.get('status', 'aprovado')
-    page = request.args.get('page', 1, type=int)
 
     # Mapear nomes de status
     status_config = {
@@ -1097,22 +1290,19 @@ def status_orders():
     if status not in status_config:
         status = 'aprovado'
 
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status=status, approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('admin.status_orders', status=status, page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status=status, approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=[status], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     config = status_config[status]
 
@@ -1129,24 +1319,19 @@ def status_orders():
 @admin_required
 def approved_orders():
     """Pedidos aprovados"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='aprovado', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('admin.approved_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='aprovado', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['aprovado'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('admin/status_orders.html', 
                          orders=orders, 
@@ -1161,24 +1346,19 @@ def approved_orders():
 @admin_required
 def in_production_orders():
     """Pedidos em produção"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='em_producao', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('admin.in_production_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='em_producao', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['em_producao'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('admin/status_orders.html', 
                          orders=orders, 
@@ -1193,24 +1373,19 @@ def in_production_orders():
 @admin_required
 def ready_orders():
     """Pedidos prontos"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='pronto', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('admin.ready_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='pronto', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['pronto'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('admin/status_orders.html', 
                          orders=orders, 
@@ -1227,21 +1402,18 @@ def ready_orders():
 @admin_required
 def manage_status_permissions():
     """Gerenciar permissões de status dos funcionários"""
-    from src.models.user import StatusPermission
-
     # Buscar todos os funcionários ativos
     employees = User.query.filter_by(user_type='funcionario', is_active=True).all()
 
     # Status disponíveis
-    available_statuses = ['aprovado', 'em_producao', 'pronto', 'entregue']
+    available_statuses = AVAILABLE_STATUSES
 
-    # Buscar permissões existentes
-    permissions = {}
-    for employee in employees:
-        permissions[employee.id] = {}
-        for status in available_statuses:
-            permission = StatusPermission.query.filter_by(user_id=employee.id, status=status).first()
-            permissions[employee.id][status] = permission.can_change if permission else False
+    # Buscar permissões existentes (uma consulta para todos os funcionários)
+    allowed_by_employee = get_status_permissions_map([employee.id for employee in employees])
+    permissions = {
+        employee.id: {status: status in allowed_by_employee[employee.id] for status in available_statuses}
+        for employee in employees
+    }
 
     return render_template('admin/manage_status_permissions.html', 
                          employees=employees, 
@@ -1278,6 +1450,7 @@ def update_status_permissions():
             db.session.add(permission)
 
         db.session.commit()
+        invalidate_status_permissions(employee.id)
 
         return jsonify({
             'success': True, 
@@ -1305,7 +1478,7 @@ def clear_system_data():
         db.session.execute(db.text("DELETE FROM service_order_employees"))
 
         # 2. Limpar tabelas dependentes
-        Notification.query.delete()
+        delete_all_notifications()
         OrderObservation.query.delete()
         StatusHistory.query.delete()
         StatusPermission.query.delete()
@@ -1323,6 +1496,13 @@ def clear_system_data():
         # Reativar o modo de verificação de chave estrangeira
         db.session.execute(db.text("PRAGMA foreign_keys = ON"))
 
+        # Exclusões em massa não passam pelo controle de contadores
+        rebuild_order_status_counters()
+        rebuild_daily_stats()
+        rebuild_search_index()
+        rebuild_file_references()
+        invalidate_status_permissions()
+
         flash("Todos os dados do sistema (exceto usuários administradores) foram limpos com sucesso!", "success")
     except Exception as e:
         db.session.rollback()
@@ -1334,112 +1514,73 @@ def clear_system_data():
 
 # ===== FUNCIONALIDADE DE BACKUP DO SISTEMA =====
 
-import zipfile
-import shutil
-import tempfile
-from flask import send_file
+def _long_responses_supported():
+    """
+    Falso no worker síncrono do gunicorn: ele não avisa o arbiter enquanto
+    envia a resposta e é encerrado pelo timeout (30s por padrão). Os workers
+    gthread/gevent marcam wsgi.multithread e não têm esse limite.
+    """
+    environ = request.environ
+    return environ.get('wsgi.multithread') or not environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+
 
 @admin_bp.route('/admin/backup-sistema', methods=['POST'])
 @login_required
 @admin_required
 def backup_system():
-    """Criar backup completo do sistema"""
-    try:
-        # Criar diretório temporário para o backup
-        with tempfile.TemporaryDirectory() as temp_dir:
-            backup_dir = os.path.join(temp_dir, 'backup_sistema')
-            os.makedirs(backup_dir, exist_ok=True)
-
-            # Nome do arquivo de backup com timestamp
-            timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"backup_sistema_{timestamp}.zip"
-            backup_path = os.path.join(temp_dir, backup_filename)
-
-            # Criar arquivo ZIP
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-
-                # 1. Backup do banco de dados SQLite (se existir)
-                from src.database.config import get_database_config, is_production
-
-                if not is_production():
-                    # Ambiente de desenvolvimento - backup do SQLite
-                    config = get_database_config()
-                    db_uri = config['SQLALCHEMY_DATABASE_URI']
-                    if db_uri.startswith('sqlite:///'):
-                        db_path = db_uri.replace('sqlite:///', '')
-                        if os.path.exists(db_path):
-                            zipf.write(db_path, 'database/app.db')
-                            print(f"Banco de dados SQLite incluído no backup: {db_path}")
-                        else:
-                            print("Banco de dados SQLite não encontrado")
-                else:
-                    # Ambiente de produção - criar dump do PostgreSQL
-                    # Nota: Em produção, seria necessário usar pg_dump
-                    # Por enquanto, apenas registramos que é produção
-                    info_content = f"""BACKUP DO SISTEMA - {timestamp}
-
-Ambiente: Produção (PostgreSQL)
-Data/Hora: {datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%d/%m/%Y %H:%M:%S")}
-
-NOTA: Este backup contém apenas os arquivos de upload.
-Para backup completo do banco PostgreSQL, use ferramentas específicas como pg_dump.
-"""
-                    zipf.writestr('backup_info.txt', info_content)
-
-                # 2. Backup dos arquivos de upload
-                upload_folder = current_app.config.get('UPLOAD_FOLDER')
-                if upload_folder and os.path.exists(upload_folder):
-                    for root, dirs, files in os.walk(upload_folder):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            # Caminho relativo dentro do ZIP
-                            arcname = os.path.join('uploads', os.path.relpath(file_path, upload_folder))
-                            zipf.write(file_path, arcname)
-                    print(f"Arquivos de upload incluídos no backup: {upload_folder}")
-
-                # 3. Backup dos arquivos de configuração (opcional)
-                src_dir = os.path.dirname(os.path.dirname(__file__))  # diretório src
-                config_files = ['main.py']
-
-                for config_file in config_files:
-                    config_path = os.path.join(src_dir, config_file)
-                    if os.path.exists(config_path):
-                        zipf.write(config_path, f'config/{config_file}')
-
-                # 4. Adicionar informações do backup
-                backup_info = f"""BACKUP DO SISTEMA RAIMUNDO ACRÍLICOS
-Data/Hora: {datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%d/%m/%Y %H:%M:%S")}
-Versão: 1.0.0
-Usuário: {current_user.username}
-
-CONTEÚDO DO BACKUP:
-- Banco de dados (SQLite ou informações sobre PostgreSQL)
-- Arquivos de upload (logos, PDFs, etc.)
-- Arquivos de configuração
-
-INSTRUÇÕES PARA RESTAURAÇÃO:
-1. Extrair o arquivo ZIP
-2. Restaurar o banco de dados na pasta database/
-3. Restaurar os arquivos de upload na pasta static/uploads/
-4. Verificar configurações no arquivo main.py
-
-IMPORTANTE: Este backup foi gerado automaticamente pelo sistema.
-Mantenha este arquivo em local seguro.
-"""
-                zipf.writestr('LEIA-ME.txt', backup_info)
-
-            # Retornar o arquivo para download
-            return send_file(
-                backup_path,
-                as_attachment=True,
-                download_name=backup_filename,
-                mimetype='application/zip'
-            )
-
-    except Exception as e:
-        flash(f'Erro ao criar backup: {str(e)}', 'error')
+    """
+    Criar backup completo do sistema para download.
+
+    O ZIP é enviado à medida que é gerado (sem arquivo temporário). O
+    progresso pode ser consultado em backup_progress com o backup_id
+    enviado no formulário. O backup baixado não entra na cadeia
+    incremental (o arquivo fica no computador do admin); backups grandes,
+    agendados e incrementais usam o script create_backup.py no servidor.
+    """
+    if not _long_responses_supported():
+        flash('O servidor usa o worker síncrono do gunicorn, que interrompe downloads longos. '
+              'Use o worker gthread ou gere o backup no servidor com create_backup.py.', 'error')
         return redirect(url_for('admin.settings'))
 
+    backup_id = request.form.get('backup_id')
+    if not BackupProgress.valid_id(backup_id) or db.session.get(BackupManifest, backup_id):
+        backup_id = uuid.uuid4().hex
+    filename = backup_filename(backup_id, 'full')
+    BackupProgress.purge()
+    progress = BackupProgress(backup_id)
+    username = current_user.username
+
+    def generate():
+        try:
+            entries, _ = build_backup(username, backup_id, filename, 'full', progress)
+            yield from stream_zip(entries, progress)
+        except Exception as e:
+            # Cabeçalhos já enviados: o download fica incompleto
+            db.session.rollback()
+            current_app.logger.error(f'Erro ao criar backup: {str(e)}')
+            progress.fail(str(e))
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Backup-Id'] = backup_id
+    # Impede proxies (nginx) de acumular a resposta antes de repassar
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@admin_bp.route('/admin/backup-sistema/progresso/<backup_id>')
+@login_required
+@admin_required
+def backup_progress(backup_id):
+    """Progresso do backup em andamento (bytes processados e arquivo atual)"""
+    if not BackupProgress.valid_id(backup_id):
+        abort(404)
+    state = BackupProgress.read(backup_id)
+    if state is None:
+        return jsonify({'status': 'pending'})
+    return jsonify(state)
+
 @admin_bp.route('/admin/funcionarios/<int:employee_id>/excluir', methods=['POST'])
 @login_required
 @admin_required
@@ -1451,14 +1592,11 @@ def delete_employee(employee_id):
         flash('Não é possível excluir um administrador diretamente por esta rota.', 'error')
         return redirect(url_for('admin.employees'))
 
-    # Excluir notificações associadas ao funcionário
-    Notification.query.filter_by(user_id=employee.id).delete()
+    # Excluir notificações e estado de leitura associados ao funcionário
+    delete_user_notifications(employee.id)
 
     # Remover foto de perfil se existir
-    if employee.profile_picture:
-        profile_pic_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles', employee.profile_picture)
-        if os.path.exists(profile_pic_path):
-            os.remove(profile_pic_path)
+    release_file(employee.profile_picture, 'profile')
 
     db.session.delete(employee)
     db.session.commit()
@@ -1627,7 +1765,7 @@ def client_details(client_id):
         flash('Usuário não é um cliente!', 'error')
         return redirect(url_for('admin.clients'))
     
-    client_orders = Order.query.filter_by(client_id=client.id).order_by(Order.created_at.desc()).all()
+    client_orders = order_list_query(Order.client_id == client.id).order_by(Order.created_at.desc()).all()
     
     return render_template('admin/client_details.html', client=client, orders=client_orders)
 
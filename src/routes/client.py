@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from functools import wraps
 from src.models.user import db, User, Order, OrderObservation
+from src.services.order_queries import order_list_query, ORDER_CREATED_KEYS
+from src.services.pagination import keyset_paginate
+from src.services.order_stats import get_order_status_counts
+from src.services.data_versions import conditional_get
 from datetime import datetime, timedelta
 import pytz
 
@@ -27,25 +31,24 @@ def dashboard():
     br_tz = pytz.timezone('America/Sao_Paulo')
     now = datetime.now(br_tz)
     
-    client_orders = Order.query.filter_by(client_id=current_user.id).all()
+    # Totais pelos contadores materializados do cliente
+    counts = get_order_status_counts(client_id=current_user.id)
     
-    total_orders = len(client_orders)
-    orders_pending = len([o for o in client_orders if o.status == 'pendente'])
-    orders_in_production = len([o for o in client_orders if o.status == 'em_producao'])
-    orders_ready = len([o for o in client_orders if o.status == 'pronto'])
-    orders_delivered = len([o for o in client_orders if o.status == 'entregue'])
+    total_orders = counts.count()
+    orders_pending = counts.count(statuses=['pendente'])
+    orders_in_production = counts.count(statuses=['em_producao'])
+    orders_ready = counts.count(statuses=['pronto'])
+    orders_delivered = counts.count(statuses=['entregue'])
     
-    recent_orders = sorted(
-        client_orders, 
-        key=lambda x: x.created_at, 
-        reverse=True
-    )[:5]
+    recent_orders = Order.query.filter(
+        Order.client_id == current_user.id
+    ).order_by(Order.created_at.desc(), Order.id.desc()).limit(5).all()
     
-    upcoming_deliveries = [
-        o for o in client_orders 
-        if o.delivery_date >= now.date() and o.status != 'entregue'
-    ]
-    upcoming_deliveries = sorted(upcoming_deliveries, key=lambda x: x.delivery_date)[:5]
+    upcoming_deliveries = Order.query.filter(
+        Order.client_id == current_user.id,
+        Order.delivery_date >= now.date(),
+        Order.status != 'entregue'
+    ).order_by(Order.delivery_date, Order.id).limit(5).all()
     
     return render_template(
         'client/dashboard.html',
@@ -65,12 +68,25 @@ def dashboard():
 def orders():
     status_filter = request.args.get('status', 'all')
     
-    query = Order.query.filter_by(client_id=current_user.id)
+    per_page = 20
+    
+    query = order_list_query(Order.client_id == current_user.id)
+    counts = get_order_status_counts(client_id=current_user.id)
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
-    
-    client_orders = query.order_by(Order.created_at.desc()).all()
+        total = counts.count(statuses=[status_filter])
+    else:
+        total = counts.count()
+    
+    # Paginação por cursor em (created_at, id), sem carregar todo o histórico
+    client_orders = keyset_paginate(
+        query,
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        total=total
+    )
     
     return render_template(
         'client/orders.html',
@@ -156,18 +172,13 @@ def change_password():
 @client_bp.route('/client/api/orders/stats')
 @login_required
 @client_required
+@conditional_get('order')
 def orders_stats():
-    client_orders = Order.query.filter_by(client_id=current_user.id).all()
+    counts = get_order_status_counts(client_id=current_user.id)
     
     status_counts = {
-        'pendente': 0,
-        'em_producao': 0,
-        'pronto': 0,
-        'entregue': 0
+        status: counts.count(statuses=[status])
+        for status in ['pendente', 'em_producao', 'pronto', 'entregue']
     }
     
-    for order in client_orders:
-        if order.status in status_counts:
-            status_counts[order.status] += 1
-    
     return jsonify(status_counts)
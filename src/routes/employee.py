@@ -4,6 +4,26 @@ from datetime import datetime, date
 import pytz
 from src.models.user import db, User, Order, OrderObservation, Notification, StatusHistory, DeliveryOption, StatusPermission, ServiceOrder
 from src.utils.date_utils import get_delivery_status_text, get_weekday_name_pt, get_elapsed_days_text, is_delivery_urgent
+from src.services.order_queries import (
+    order_list_query, service_order_list_query, get_observation_counts, get_status_history_by_order,
+    get_latest_observations, is_service_order_assignee, ORDER_CREATED_KEYS, ORDER_DELIVERED_KEYS,
+    ORDER_DELIVERY_DATE_KEYS, SERVICE_ORDER_CREATED_KEYS
+)
+from src.services.pagination import keyset_paginate
+from src.services.notifications import (
+    notify_user_type, paginate_notifications, get_unread_count, mark_broadcast_read, mark_all_read
+)
+from src.services.notification_events import queue_notification_event, notification_stream_response
+from src.services.data_versions import conditional_get
+from src.services.status_permissions import can_change_status, get_allowed_statuses_list, invalidate_status_permissions
+from src.services.calendar import parse_calendar_window, get_calendar_events
+from src.services.serializers import json_array_response
+from src.services.order_stats import get_employee_dashboard_counters, get_order_status_counts
+from src.services.statistics import get_statistics, get_monthly_approved_orders, parse_statistics_args, get_delivery_kpis, parse_date_range
+from src.services.images import InvalidImageError, save_image
+from src.services.file_store import release_file, file_path, display_name
+from src.services.bundles import bundle_entries, bundle_key, cached_bundle, stream_bundle
+from src.services.file_delivery import set_content_disposition, signed_url
 
 
 employee_bp = Blueprint('employee', __name__)
@@ -23,51 +43,45 @@ def employee_required(f):
 @employee_required
 def dashboard():
     """Dashboard principal do funcionário"""
-    # Pedidos em produção
-    in_production = Order.query.filter_by(status='em_producao', approved=True).count()
-    ready_orders = Order.query.filter_by(status='pronto', approved=True).count()
-    # Total aprovados excluindo entregues
-    total_approved = Order.query.filter(Order.approved == True, Order.status != 'entregue').count()
+    # Contadores de pedidos e notificações não lidas (consulta agrupada única)
+    counters = get_employee_dashboard_counters(current_user)
 
     # Pedidos recentes aprovados (excluindo entregues)
-    recent_orders = Order.query.filter(Order.approved == True, Order.status != 'entregue').order_by(Order.created_at.desc()).limit(5).all()
-
-    # Notificações não lidas
-    unread_notifications = Notification.query.filter_by(user_id=current_user.id, read=False).count()
-
-    # Pedidos com prazo próximo (próximos 3 dias)
-    from datetime import timedelta
-    upcoming_deadline = date.today() + timedelta(days=3)
-    urgent_orders = Order.query.filter(
-        Order.approved == True,
-        Order.is_urgent == True, # Adicionado para verificar a flag is_urgent
-        Order.status.in_(['aprovado', 'em_producao', 'pronto'])
-    ).count()
+    recent_orders = order_list_query(Order.approved == True, Order.status != 'entregue').order_by(Order.created_at.desc()).limit(5).all()
 
     return render_template('employee/dashboard.html',
-                         in_production=in_production,
-                         ready_orders=ready_orders,
-                         total_approved=total_approved,
                          recent_orders=recent_orders,
-                         unread_notifications=unread_notifications,
-                         urgent_orders=urgent_orders, date=date)
+                         date=date,
+                         **counters)
 
 @employee_bp.route('/funcionario/pedidos')
 @login_required
 @employee_required
 def orders():
     """Lista de pedidos aprovados (excluindo entregues)"""
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
 
-    query = Order.query.filter(Order.approved == True, Order.status != 'entregue')
+    query = order_list_query(Order.approved == True, Order.status != 'entregue')
+    counts = get_order_status_counts()
+    total = counts.count(exclude=['entregue'], approved=True)
     if status_filter and status_filter != 'entregue':
         query = query.filter_by(status=status_filter)
+        total = counts.count(statuses=[status_filter], approved=True)
+
+    # Paginação por cursor (delivery_date, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        query,
+        ORDER_DELIVERY_DATE_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=total
+    )
 
-    orders = query.order_by(Order.delivery_date.asc()).paginate(
-        page=page, per_page=10, error_out=False)
+    # Quantidade de observações de cada pedido da página (consulta agrupada única)
+    observation_counts = get_observation_counts([order.id for order in orders.items])
 
-    return render_template('employee/orders.html', orders=orders, status_filter=status_filter)
+    return render_template('employee/orders.html', orders=orders, status_filter=status_filter,
+                         observation_counts=observation_counts)
 
 @employee_bp.route('/funcionario/pedidos/<int:order_id>')
 @login_required
@@ -137,10 +151,8 @@ def add_observation(order_id):
 @employee_required
 def notifications():
     """Lista de notificações do funcionário"""
-    page = request.args.get('page', 1, type=int)
-
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(
-        Notification.created_at.desc()).paginate(page=page, per_page=15, error_out=False)
+    # Notificações diretas e avisos em massa, lidos ou não (paginação por cursor)
+    notifications = paginate_notifications(current_user, cursor=request.args.get('cursor'), per_page=15)
 
     # Calcular quantas notificações são de hoje ou depois (data sem hora)
     today = date.today()
@@ -158,16 +170,28 @@ def mark_notification_read(notification_id):
         flash('Acesso negado.', 'error')
         return redirect(url_for('employee.notifications'))
     db.session.delete(notification)
+    queue_notification_event(user_ids=[current_user.id])
     db.session.commit()
 
     return jsonify({"success": True, "message": "Notificação marcada como lida e excluída."})
 
+@employee_bp.route('/funcionario/notificacoes/avisos/<int:broadcast_id>/marcar-lida', methods=['POST'])
+@login_required
+@employee_required
+def mark_broadcast_notification_read(broadcast_id):
+    """Marcar aviso em massa como lido"""
+    if not mark_broadcast_read(current_user, broadcast_id):
+        return jsonify({"success": False, "message": "Notificação não encontrada."}), 404
+    db.session.commit()
+
+    return jsonify({"success": True, "message": "Notificação marcada como lida."})
+
 @employee_bp.route('/funcionario/notificacoes/marcar-todas-lidas', methods=['POST'])
 @login_required
 @employee_required
 def mark_all_notifications_read():
     """Marcar todas as notificações como lidas e excluí-las"""
-    Notification.query.filter_by(user_id=current_user.id).delete()
+    mark_all_read(current_user)
     db.session.commit()
 
     flash("Todas as notificações lidas foram excluídas.", "success")
@@ -183,62 +207,40 @@ def calendar():
 @employee_bp.route('/funcionario/api/calendario')
 @login_required
 @employee_required
+@conditional_get('order')
 def calendar_api():
     """API para dados do calendário do funcionário"""
-    # Apenas pedidos aprovados (excluindo entregues)
-    orders = Order.query.filter(Order.approved == True, Order.status != 'entregue').all()
-    events = []
-
-    for order in orders:
-        # Cor baseada no status
-        color_map = {
-            'aprovado': '#3788d8',
-            'em_producao': '#8b4513',
-            'pronto': '#10b981',
-            'entregue': '#4f5553'
-        }
-
-        # Evento para data de entrega
-        events.append({
-            'id': f'delivery_{order.id}',
-            'title': f'{order.company_name}',
-            'start': order.delivery_date.isoformat(),
-            'backgroundColor': color_map.get(order.status, '#6b7280'),
-            'borderColor': color_map.get(order.status, '#6b7280'),
-            'extendedProps': {
-                'type': 'delivery',
-                'order_id': order.id,
-                'company_name': order.company_name,
-                'status': order.status,
-                'order_date': order.order_date.isoformat()
-            }
-        })
+    # Janela visível enviada pelo FullCalendar (start/end)
+    try:
+        start, end = parse_calendar_window(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas inválidas'}), 400
+
+    events = get_calendar_events(
+        start=start,
+        end=end,
+        approved_only=True,
+        include_delivered=request.args.get('include_delivered') == '1'
+    )
 
-    return jsonify(events)
+    return json_array_response(events)
 
 @employee_bp.route('/funcionario/estatisticas')
 @login_required
 @employee_required
 def statistics():
     """Estatísticas para o funcionário"""
-    from sqlalchemy import func, extract
-
     # Estatísticas básicas (excluindo entregues dos contadores principais)
-    total_orders = Order.query.filter(Order.approved == True, Order.status != 'entregue').count()
-    in_production = Order.query.filter_by(status='em_producao', approved=True).count()
-    completed = Order.query.filter_by(status='entregue', approved=True).count()
+    counts = get_order_status_counts()
+    total_orders = counts.count(exclude=['entregue'], approved=True)
+    in_production = counts.count(statuses=['em_producao'], approved=True)
+    completed = counts.count(statuses=['entregue'], approved=True)
 
     # Pedidos por status (incluindo entregues para visualização completa)
-    status_counts = db.session.query(
-        Order.status,
-        func.count(Order.id).label('count')
-    ).filter_by(approved=True).group_by(Order.status).all()
+    status_counts = counts.by_status(approved=True)
 
-    # Pedidos por mês (apenas aprovados)
-    monthly_orders = db.session.query(
-        extract('month', Order.created_at).label('month'),
-        func.count(Order.id).label('count')
-    ).filter_by(approved=True).group_by(extract('month', Order.created_at)).all()
+    # Pedidos aprovados por mês (últimos 12 meses, totais diários)
+    monthly_orders = get_monthly_approved_orders()
 
     return render_template('employee/statistics.html',
                          total_orders=total_orders,
@@ -247,14 +249,35 @@ def statistics():
                          status_counts=status_counts,
                          monthly_orders=monthly_orders)
 
+@employee_bp.route('/funcionario/api/estatisticas')
+@login_required
+@employee_required
+@conditional_get('order', daily=True)
+def statistics_api():
+    """API de estatísticas por período (start, end e bucket)"""
+    try:
+        start, end, bucket = parse_statistics_args(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos'}), 400
+
+    return jsonify(get_statistics(start, end, bucket=bucket))
+
 @employee_bp.route('/funcionario/api/notificacoes-nao-lidas')
 @login_required
 @employee_required
+@conditional_get('notification')
 def unread_notifications_count():
     """API para contar notificações não lidas"""
-    count = Notification.query.filter_by(user_id=current_user.id, read=False).count()
+    count = get_unread_count(current_user)
     return jsonify({'count': count})
 
+@employee_bp.route('/funcionario/api/notificacoes/stream')
+@login_required
+@employee_required
+def notifications_stream():
+    """Stream SSE com contagem de não lidas e novas notificações"""
+    return notification_stream_response(current_user)
+
 @employee_bp.route('/funcionario/perfil')
 @login_required
 @employee_required
@@ -270,9 +293,6 @@ def profile():
 @employee_required
 def upload_profile_picture():
     """Upload da foto de perfil do funcionário"""
-    from werkzeug.utils import secure_filename
-    import os
-
     if 'profile_picture' not in request.files:
         flash('Nenhum arquivo selecionado!', 'error')
         return redirect(url_for('employee.profile'))
@@ -283,34 +303,12 @@ def upload_profile_picture():
         flash('Nenhum arquivo selecionado!', 'error')
         return redirect(url_for('employee.profile'))
 
-    # Verificar se é uma imagem válida
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-
-    if file_extension not in allowed_extensions:
-        flash('Formato de arquivo inválido! Use PNG, JPG, JPEG, GIF ou WEBP.', 'error')
-        return redirect(url_for('employee.profile'))
-
     try:
-        from flask import current_app
-
-        # Remover foto anterior se existir
-        if current_user.profile_picture:
-            old_photo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles', current_user.profile_picture)
-            if os.path.exists(old_photo_path):
-                os.remove(old_photo_path)
-
-        # Criar diretório de perfis se não existir
-        profile_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles')
-        os.makedirs(profile_dir, exist_ok=True)
+        # Valida, remove metadados e gera miniaturas/WebP
+        profile_filename = save_image(file)
 
-        # Salvar nova foto
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S_")
-        profile_filename = f"{timestamp}profile_{current_user.id}_{filename}"
-
-        file_path = os.path.join(profile_dir, profile_filename)
-        file.save(file_path)
+        # Liberar a foto anterior após gravar a nova
+        release_file(current_user.profile_picture, 'profile')
 
         # Atualizar banco de dados
         current_user.profile_picture = profile_filename
@@ -318,6 +316,8 @@ def upload_profile_picture():
 
         flash('Foto de perfil atualizada com sucesso!', 'success')
 
+    except InvalidImageError as e:
+        flash(str(e), 'error')
     except Exception as e:
         flash(f'Erro ao fazer upload da foto: {str(e)}', 'error')
 
@@ -331,15 +331,19 @@ def upload_profile_picture():
 @employee_required
 def service_orders():
     """Lista ordens de serviço atribuídas ao funcionário"""
-    page = request.args.get('page', 1, type=int)
     per_page = 10
 
     # Buscar ordens de serviço atribuídas ao funcionário atual, excluindo as entregues
-    service_orders = ServiceOrder.query.join(Order).filter(
-        ServiceOrder.assigned_employees.contains(current_user),
-        Order.status != 'entregue'
-    ).order_by(ServiceOrder.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    # (paginação por cursor em created_at, id)
+    service_orders = keyset_paginate(
+        service_order_list_query(
+            ServiceOrder.assigned_employees.contains(current_user),
+            Order.status != 'entregue'
+        ),
+        SERVICE_ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=per_page,
+        total='approximate'
     )
 
     return render_template('employee/service_orders.html', 
@@ -387,18 +391,23 @@ def download_service_order_pdf(service_order_id):
 
     return download_service_order_file(service_order_id, first_file)
 
-@employee_bp.route('/funcionario/ordem-servico/<int:service_order_id>/download/<filename>')
+@employee_bp.route('/funcionario/ordem-servico/<int:service_order_id>/download/<path:filename>')
 @login_required
 @employee_required
 def download_service_order_file(service_order_id, filename):
-    """Download de arquivo específico da ordem de serviço"""
-    from flask import send_from_directory, current_app
+    """
+    Download de arquivo específico da ordem de serviço.
+
+    Após a verificação de acesso, redireciona para uma URL assinada e
+    temporária: os bytes são enviados pelo nginx (X-Accel-Redirect) ou
+    pela rota files.deliver, sem prender este worker.
+    """
     import os
 
     service_order = ServiceOrder.query.get_or_404(service_order_id)
 
     # Verificar se o funcionário tem acesso a esta ordem de serviço
-    if current_user not in service_order.assigned_employees:
+    if not is_service_order_assignee(service_order.id, current_user.id):
         flash('Você não tem acesso a esta ordem de serviço.', 'error')
         return redirect(url_for('employee.service_orders'))
 
@@ -408,20 +417,15 @@ def download_service_order_file(service_order_id, filename):
         flash('Arquivo não encontrado nesta ordem de serviço.', 'error')
         return redirect(url_for('employee.service_order_detail', service_order_id=service_order_id))
 
-    # Caminho do arquivo
-    files_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'service_orders')
-    file_path = os.path.join(files_dir, filename)
+    # Caminho do arquivo (store por conteúdo ou upload antigo)
+    path = file_path(filename, 'service_order')
 
     # Verificar se o arquivo existe fisicamente
-    if not os.path.exists(file_path):
+    if path is None or not os.path.exists(path):
         flash('Arquivo não encontrado no servidor.', 'error')
         return redirect(url_for('employee.service_order_detail', service_order_id=service_order_id))
 
-    try:
-        return send_from_directory(files_dir, filename, as_attachment=True)
-    except Exception as e:
-        flash('Erro ao baixar o arquivo.', 'error')
-        return redirect(url_for('employee.service_order_detail', service_order_id=service_order_id))
+    return redirect(signed_url(path, download_name=display_name(filename)))
 
 
 # ===== ROTAS PARA ALTERAÇÃO DE STATUS COM PERMISSÕES =====
@@ -431,7 +435,7 @@ def download_service_order_file(service_order_id, filename):
 @employee_required
 def change_order_status(order_id):
     """Alterar status do pedido com verificação de permissões"""
-    from src.models.user import StatusPermission, StatusHistory, DeliveryOption
+    from src.models.user import StatusHistory, DeliveryOption
 
     order = Order.query.get_or_404(order_id)
 
@@ -443,12 +447,7 @@ def change_order_status(order_id):
         return jsonify({'success': False, 'message': 'Status não informado.'})
 
     # Verificar se o funcionário tem permissão para alterar para este status
-    permission = StatusPermission.query.filter_by(
-        user_id=current_user.id, 
-        status=new_status
-    ).first()
-
-    if not permission or not permission.can_change:
+    if not can_change_status(current_user.id, new_status):
         return jsonify({
             'success': False, 
             'message': f'Você não tem permissão para alterar o status para "{new_status}".'
@@ -498,17 +497,12 @@ def change_order_status(order_id):
             now_saopaulo = datetime.now(tz_saopaulo)
             order.delivered_at = now_saopaulo.astimezone(pytz.utc)
 
-        db.session.commit()
-
-        # Criar notificação para administradores
-        admins = User.query.filter_by(user_type='admin').all()
-        for admin in admins:
-            notification = Notification(
-                user_id=admin.id,
-                title='Status de pedido alterado',
-                message=f'{current_user.username} alterou o status do pedido da empresa {order.company_name} de "{old_status}" para "{new_status}".'
-            )
-            db.session.add(notification)
+        # Criar notificação para administradores (mesma transação)
+        notify_user_type(
+            'admin',
+            title='Status de pedido alterado',
+            message=f'{current_user.username} alterou o status do pedido da empresa {order.company_name} de "{old_status}" para "{new_status}".'
+        )
 
         db.session.commit()
 
@@ -530,7 +524,6 @@ def change_order_status(order_id):
 def status_orders():
     """Pedidos por status"""
     status = request.args.get('status', 'aprovado')
-    page = request.args.get('page', 1, type=int)
 
     # Mapear nomes de status
     status_config = {
@@ -560,22 +553,19 @@ def status_orders():
     if status not in status_config:
         status = 'aprovado'
 
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status=status, approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('employee.status_orders', status=status, page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status=status, approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=[status], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     config = status_config[status]
 
@@ -592,24 +582,19 @@ def status_orders():
 @employee_required
 def approved_orders():
     """Pedidos aprovados"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='aprovado', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('employee.approved_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='aprovado', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['aprovado'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('employee/status_orders.html', 
                          orders=orders, 
@@ -624,24 +609,19 @@ def approved_orders():
 @employee_required
 def in_production_orders():
     """Pedidos em produção"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='em_producao', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('employee.in_production_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='em_producao', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['em_producao'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('employee/status_orders.html', 
                          orders=orders, 
@@ -656,24 +636,19 @@ def in_production_orders():
 @employee_required
 def ready_orders():
     """Pedidos prontos"""
-    page = request.args.get('page', 1, type=int)
-
-    # Garantir que a página seja pelo menos 1
-    if page < 1:
-        page = 1
-
-    try:
-        orders = Order.query.filter_by(status='pronto', approved=True).order_by(Order.created_at.desc()).paginate(
-            page=page, per_page=10, error_out=False
-        )
-    except Exception as e:
-        # Em caso de erro na paginação, redirecionar para a primeira página
-        flash('Erro na paginação. Redirecionando para a primeira página.', 'warning')
-        return redirect(url_for('employee.ready_orders', page=1))
+    # Paginação por cursor (created_at, id); total vem dos contadores materializados
+    orders = keyset_paginate(
+        order_list_query().filter_by(status='pronto', approved=True),
+        ORDER_CREATED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=get_order_status_counts().count(statuses=['pronto'], approved=True)
+    )
 
-    # Processar observações para cada pedido
+    # Últimas observações de cada pedido (uma consulta para a página)
+    latest_observations = get_latest_observations([order.id for order in orders.items])
     for order in orders.items:
-        order.last_observations = list(order.observations)[-3:]
+        order.last_observations = latest_observations[order.id]
 
     return render_template('employee/status_orders.html', 
                          orders=orders, 
@@ -688,135 +663,107 @@ def ready_orders():
 @employee_required
 def delivered_orders():
     """Pedidos entregues"""
-    page = request.args.get('page', 1, type=int)
+    # Indicadores de pontualidade sobre todas as entregas (consulta agregada)
+    now = datetime.now()
+    delivery_kpis = get_delivery_kpis(now=now, approved_only=True)
 
     # Apenas pedidos com status 'entregue' e que tenham data de entrega registrada
-    orders = Order.query.filter(
-        Order.status == 'entregue',
-        Order.delivered_at.isnot(None),
-        Order.approved == True
-    ).order_by(Order.delivered_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    # (paginação por cursor em delivered_at, id)
+    orders = keyset_paginate(
+        order_list_query(
+            Order.status == 'entregue',
+            Order.delivered_at.isnot(None),
+            Order.approved == True
+        ),
+        ORDER_DELIVERED_KEYS,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        total=delivery_kpis['total']
     )
 
-    # Conta pedidos entregues no prazo
-    on_time = sum(
-        1 for o in orders.items
-        if o.delivered_at and o.delivery_date >= o.delivered_at.date()
-    )
+    # Histórico de status dos pedidos da página (consulta única)
+    status_history_by_order = get_status_history_by_order([order.id for order in orders.items])
 
     return render_template(
         'employee/delivered.html',
         orders=orders,
-        on_time=on_time,
-        now=datetime.now()
+        delivery_kpis=delivery_kpis,
+        status_history_by_order=status_history_by_order,
+        now=now
     )
 
+@employee_bp.route('/funcionario/api/entregas/indicadores')
+@login_required
+@employee_required
+@conditional_get('order', daily=True)
+def delivery_kpis_api():
+    """API de pontualidade das entregas (start e end opcionais, YYYY-MM-DD)"""
+    try:
+        start, end = parse_date_range(request.args)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas inválidas'}), 400
+
+    return jsonify(get_delivery_kpis(start=start, end=end, approved_only=True))
+
 @employee_bp.route('/funcionario/api/permissoes-status')
 @login_required
 @employee_required
+@conditional_get('status_permission')
 def get_status_permissions():
     """API para obter permissões de status do funcionário atual"""
-    from src.models.user import StatusPermission
-
-    permissions = StatusPermission.query.filter_by(user_id=current_user.id).all()
-
-    allowed_statuses = []
-    for permission in permissions:
-        if permission.can_change:
-            allowed_statuses.append({
-                'status': permission.status,
-                'display_name': {
-                    'aprovado': 'Aprovado',
-                    'em_producao': 'Em Produção',
-                    'pronto': 'Pronto',
-                    'entregue': 'Entregue'
-                }.get(permission.status, permission.status.title())
-            })
-
-    return jsonify({'allowed_statuses': allowed_statuses})
+    return jsonify({'allowed_statuses': get_allowed_statuses_list(current_user.id)})
 
 # Rota alternativa para compatibilidade com o template
 @employee_bp.route('/funcionario/get_status_permissions')
 @login_required
 @employee_required
+@conditional_get('status_permission')
 def get_status_permissions_alt():
     """Rota alternativa para permissões de status"""
-    from src.models.user import StatusPermission
-
-    permissions = StatusPermission.query.filter_by(user_id=current_user.id).all()
-
-    allowed_statuses = []
-    for permission in permissions:
-        if permission.can_change:
-            allowed_statuses.append({
-                'status': permission.status,
-                'display_name': {
-                    'aprovado': 'Aprovado',
-                    'em_producao': 'Em Produção',
-                    'pronto': 'Pronto',
-                    'entregue': 'Entregue'
-                }.get(permission.status, permission.status.title())
-            })
-
-    return jsonify({'allowed_statuses': allowed_statuses})
+    return jsonify({'allowed_statuses': get_allowed_statuses_list(current_user.id)})
 
 @employee_bp.route('/funcionario/ordem-servico/<int:service_order_id>/download-files')
 @login_required
 @employee_required
 def download_service_order_files(service_order_id):
-    """Download de todos os arquivos da ordem de serviço em um ZIP"""
-    from flask import send_file, current_app
-    import os
-    import zipfile
-    import tempfile
+    """
+    Download de todos os arquivos da ordem de serviço em um ZIP.
+
+    O primeiro download envia o ZIP enquanto é montado e o guarda no
+    cache (downloads simultâneos acompanham a mesma montagem); os
+    seguintes são redirecionados para o arquivo pronto (URL assinada),
+    enquanto o conjunto de arquivos não mudar.
+    """
+    from flask import Response, stream_with_context
 
     service_order = ServiceOrder.query.get_or_404(service_order_id)
 
     # Verificar se o funcionário tem acesso a esta ordem de serviço
-    if current_user not in service_order.assigned_employees:
+    if not is_service_order_assignee(service_order.id, current_user.id):
         flash('Você não tem acesso a esta ordem de serviço.', 'error')
         return redirect(url_for('employee.service_orders'))
 
     # Obter lista de arquivos
     files_list = service_order.get_files_list()
+    entries = bundle_entries(files_list)
 
-    if not files_list:
+    if not entries:
         flash('Esta ordem de serviço não possui arquivos.', 'error')
         return redirect(url_for('employee.service_order_detail', service_order_id=service_order_id))
 
-    try:
-        # Criar arquivo ZIP temporário
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-
-        with zipfile.ZipFile(temp_zip.name, 'w') as zip_file:
-            files_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'service_orders')
-
-            for filename in files_list:
-                file_path = os.path.join(files_dir, filename)
-                if os.path.exists(file_path):
-                    # Adicionar arquivo ao ZIP com nome limpo
-                    zip_file.write(file_path, filename)
-
-        # Nome do arquivo ZIP para download
-        zip_filename = f"OS_{service_order_id}_{service_order.title.replace(' ', '_')}.zip"
-
-        return send_file(
-            temp_zip.name,
-            as_attachment=True,
-            download_name=zip_filename,
-            mimetype='application/zip'
-        )
+    # Nome do arquivo ZIP para download
+    zip_filename = f"OS_{service_order_id}_{service_order.title.replace(' ', '_')}.zip"
 
-    except Exception as e:
-        flash('Erro ao criar arquivo ZIP.', 'error')
-        return redirect(url_for('employee.service_order_detail', service_order_id=service_order_id))
-    finally:
-        # Limpar arquivo temporário após o download
-        try:
-            os.unlink(temp_zip.name)
-        except:
-            pass
+    key = bundle_key(files_list)
+    cached_path = cached_bundle(key)
+    if cached_path is not None:
+        # Pacote pronto: entregue como arquivo estático pela URL assinada
+        return redirect(signed_url(cached_path, download_name=zip_filename))
+
+    response = Response(stream_with_context(stream_bundle(key, entries)), mimetype='application/zip')
+    set_content_disposition(response.headers, zip_filename)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @employee_bp.route('/funcionario/debug/permissoes')
 @login_required
@@ -860,6 +807,7 @@ def debug_permissions():
 
         try:
             db.session.commit()
+            invalidate_status_permissions(current_user.id)
             print("Permissões criadas com sucesso!")
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,29 @@
+import time
+
+from flask import Blueprint, request, abort
+from src.services.file_store import STORE_FOLDER
+from src.services.file_delivery import IMMUTABLE_MAX_AGE, deliver_file, verify_signature
+
+files_bp = Blueprint('files', __name__)
+
+@files_bp.route('/arquivos/<path:path>')
+def deliver(path):
+    """
+    Entrega um arquivo por URL assinada (file_delivery.signed_url).
+
+    Não exige sessão nem consulta o banco: o acesso foi verificado quando
+    a URL foi gerada; aqui só assinatura e validade são conferidas.
+    """
+    download_name = request.args.get('dl')
+    if not verify_signature(path, request.args.get('exp'), download_name, request.args.get('sig')):
+        abort(403)
+
+    # Arquivos do store nunca mudam de conteúdo: o navegador pode guardá-los
+    # até a URL expirar (não além, senão o cache sobrevive à assinatura)
+    max_age = None
+    if path.startswith(f'{STORE_FOLDER}/'):
+        max_age = min(IMMUTABLE_MAX_AGE, int(request.args['exp']) - int(time.time()))
+    response = deliver_file(path, download_name, max_age=max_age)
+    if response is None:
+        abort(404)
+    return response
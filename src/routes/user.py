@@ -1,12 +1,12 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, abort
 from src.models.user import User, db
+from src.services.serializers import user_serializer
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return user_serializer.response(order_by=User.id)
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -19,8 +19,10 @@ def create_user():
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    user = user_serializer.first(User.id == user_id)
+    if user is None:
+        abort(404)
+    return jsonify(user)
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
@@ -0,0 +1 @@
+# Módulo de serviços (consultas e regras compartilhadas entre as rotas)
@@ -0,0 +1,581 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+from flask import current_app
+from werkzeug.security import safe_join
+from src.models.user import db, BackupManifest
+from src.services.chunked_uploads import CHUNKED_FOLDER
+from src.services.file_store import CACHE_FOLDER
+from src.services.data_dump import dump_database, restore_database
+from src.services.search import rebuild_search_index
+
+# Formatos já comprimidos: gravados sem compressão (STORED), pois DEFLATE
+# só gastaria CPU sem reduzir o tamanho
+STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    # Formatos baseados em ZIP (Office Open XML, CorelDraw X4+)
+    '.xlsx', '.pptx', '.docx', '.cdr',
+    '.pdf', '.mp3', '.mp4',
+})
+
+# Tamanho dos blocos lidos dos arquivos e enviados na resposta
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Intervalo mínimo (segundos) entre gravações do progresso
+PROGRESS_INTERVAL = 1.0
+
+# Pasta (no diretório temporário do sistema) com o progresso dos backups
+PROGRESS_FOLDER = 'raimundo_backups'
+
+# Threads usadas para calcular os checksums (leitura de disco, o hashlib
+# libera o GIL em blocos grandes)
+HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Manifestos mantidos no banco (cada um descreve sozinho o seu ponto no tempo)
+MAX_MANIFESTS = 60
+
+# Manifesto gravado em cada backup
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+BACKUP_MODES = ('full', 'incremental')
+
+# Arquivo a incluir no backup: caminho no disco, conteúdo em memória ou
+# gerador de bytes (chunks, tamanho desconhecido)
+BackupEntry = namedtuple('BackupEntry', 'arcname path data size chunks', defaults=(None, None, 0, None))
+
+
+def compression_for(name):
+    """Método de compressão do arquivo no ZIP, pela extensão"""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _is_temporary_upload(relative_path):
+    """Uploads em andamento, cache e arquivos temporários do store não entram no backup"""
+    parts = relative_path.split(os.sep)
+    return parts[0] in (CHUNKED_FOLDER, CACHE_FOLDER) or parts[-1].startswith('.upload-')
+
+
+def sha256_file(path):
+    """SHA-256 (hex) do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(COPY_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_files(paths, workers=HASH_WORKERS, progress=None):
+    """
+    Calcula o SHA-256 de vários arquivos em paralelo.
+
+    Returns:
+        dict: {caminho: sha256} (arquivos que sumiram ficam de fora)
+    """
+    def safe_hash(path):
+        try:
+            return sha256_file(path)
+        except OSError:
+            return None
+
+    hashes = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, (path, digest) in enumerate(zip(paths, executor.map(safe_hash, paths)), 1):
+            if digest is not None:
+                hashes[path] = digest
+            if progress:
+                progress.update(index, len(paths), stage='hashing')
+    return hashes
+
+
+def scan_uploads(upload_folder, previous_files=None, progress=None):
+    """
+    Lista os arquivos de UPLOAD_FOLDER com tamanho, mtime e SHA-256.
+
+    O checksum do manifesto anterior é reaproveitado quando tamanho e
+    mtime não mudaram; apenas arquivos novos ou alterados são lidos.
+
+    Args:
+        upload_folder: Pasta de uploads
+        previous_files: 'files' do manifesto anterior (ou None)
+        progress: BackupProgress (opcional)
+
+    Returns:
+        dict: {arcname: {'path', 'size', 'mtime_ns', 'sha256'}}
+    """
+    previous_files = previous_files or {}
+    files = {}
+    if not upload_folder or not os.path.isdir(upload_folder):
+        return files
+
+    for root, dirs, filenames in os.walk(upload_folder):
+        dirs.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            relative_path = os.path.relpath(path, upload_folder)
+            if _is_temporary_upload(relative_path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            arcname = 'uploads/' + relative_path.replace(os.sep, '/')
+            previous = previous_files.get(arcname)
+            unchanged = previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns
+            files[arcname] = {
+                'path': path,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': previous['sha256'] if unchanged else None,
+            }
+
+    pending = [info['path'] for info in files.values() if info['sha256'] is None]
+    hashes = hash_files(pending, progress=progress) if pending else {}
+    for arcname, info in list(files.items()):
+        if info['sha256'] is None:
+            if info['path'] not in hashes:
+                # Removido durante a leitura
+                del files[arcname]
+                continue
+            info['sha256'] = hashes[info['path']]
+    return files
+
+
+def database_entries():
+    """
+    Banco de dados a incluir no backup (arquivo SQLite, se for o caso).
+
+    Returns:
+        list: BackupEntry (vazia no PostgreSQL)
+    """
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return []
+    if not os.path.exists(url.database):
+        return []
+    return [BackupEntry(arcname='database/app.db', path=url.database, size=os.path.getsize(url.database))]
+
+
+class _ZipOutput:
+    """
+    Destino do ZipFile que apenas acumula os bytes escritos.
+
+    Sem seek/tell: o zipfile grava cada entrada com data descriptor, o que
+    permite enviar o ZIP em sequência, sem arquivo temporário.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Bytes escritos desde a última chamada"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname, path=None):
+    """ZipInfo com data de modificação do arquivo (ou a atual) e compressão pelo tipo"""
+    timestamp = os.path.getmtime(path) if path else time.time()
+    date_time = time.localtime(timestamp)[:6]
+    # O formato ZIP não representa datas anteriores a 1980
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    info.compress_type = compression_for(arcname)
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def stream_zip(entries, progress=None):
+    """
+    Gera o ZIP em blocos à medida que é escrito.
+
+    Os arquivos são lidos em blocos de COPY_CHUNK_SIZE; a memória usada
+    independe do tamanho do backup.
+
+    Args:
+        entries: BackupEntry a incluir, na ordem
+        progress: BackupProgress (opcional)
+
+    Yields:
+        bytes: Próximo trecho do ZIP
+    """
+    output = _ZipOutput()
+    total = sum(entry.size for entry in entries)
+    done = 0
+    if progress:
+        progress.update(done, total, force=True)
+
+    with zipfile.ZipFile(output, 'w', allowZip64=True) as archive:
+        for entry in entries:
+            if entry.chunks is not None:
+                # Tamanho desconhecido: ZIP64 sempre
+                with archive.open(_zip_info(entry.arcname), 'w', force_zip64=True) as target:
+                    for block in entry.chunks:
+                        target.write(block)
+                        data = output.drain()
+                        if data:
+                            yield data
+                        if progress:
+                            progress.update(done, total, entry.arcname)
+                yield output.drain()
+                continue
+
+            if entry.path is None:
+                archive.writestr(_zip_info(entry.arcname), entry.data)
+                done += entry.size
+                yield output.drain()
+                continue
+
+            try:
+                source = open(entry.path, 'rb')
+            except OSError as e:
+                # Arquivo removido durante o backup: segue com os demais
+                current_app.logger.warning(f'Backup: arquivo ignorado {entry.path}: {str(e)}')
+                done += entry.size
+                continue
+
+            with source:
+                info = _zip_info(entry.arcname, entry.path)
+                # Tamanho informado antes: define se a entrada precisa de ZIP64
+                info.file_size = entry.size
+                with archive.open(info, 'w') as target:
+                    for block in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+                        target.write(block)
+                        done += len(block)
+                        data = output.drain()
+                        if data:
+                            yield data
+                        if progress:
+                            progress.update(done, total, entry.arcname)
+            yield output.drain()
+
+    yield output.drain()
+    if progress:
+        progress.finish(total)
+
+
+class BackupProgress:
+    """
+    Progresso de um backup em andamento, gravado em um arquivo JSON.
+
+    O arquivo é lido por qualquer worker (endpoint de progresso), então o
+    acompanhamento funciona com vários processos do gunicorn.
+    """
+
+    def __init__(self, backup_id):
+        self.backup_id = backup_id
+        self._last_write = 0.0
+
+    @staticmethod
+    def valid_id(backup_id):
+        return bool(backup_id) and re.fullmatch(r'[0-9a-f]{32}', backup_id) is not None
+
+    @staticmethod
+    def _path(backup_id):
+        return os.path.join(tempfile.gettempdir(), PROGRESS_FOLDER, f'{backup_id}.json')
+
+    def _write(self, state):
+        path = self._path(self.backup_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(temp_path, path)
+        self._last_write = time.monotonic()
+
+    def update(self, done, total, current=None, force=False, stage='writing'):
+        """
+        Registra o andamento (no máximo a cada PROGRESS_INTERVAL).
+
+        stage 'hashing' conta arquivos com checksum calculado; 'writing'
+        conta os bytes gravados no ZIP.
+        """
+        if not force and time.monotonic() - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._write({
+            'status': 'running',
+            'stage': stage,
+            'done': done,
+            'total': total,
+            'percent': round(100 * done / total, 1) if total else 0,
+            'current': current,
+        })
+
+    @classmethod
+    def purge(cls, max_age=24 * 3600):
+        """Remove os registros de progresso antigos"""
+        folder = os.path.dirname(cls._path('0' * 32))
+        if not os.path.isdir(folder):
+            return
+        limit = time.time() - max_age
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def finish(self, total):
+        self._write({'status': 'done', 'done': total, 'total': total, 'percent': 100, 'current': None})
+
+    def fail(self, message):
+        self._write({'status': 'error', 'message': message})
+
+    @classmethod
+    def read(cls, backup_id):
+        """Último progresso registrado ou None"""
+        try:
+            with open(cls._path(backup_id)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+
+def backup_info_text(username):
+    """Conteúdo do LEIA-ME.txt incluído no backup"""
+    now = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%d/%m/%Y %H:%M:%S")
+    return f"""BACKUP DO SISTEMA RAIMUNDO ACRÍLICOS
+Data/Hora: {now}
+Versão: 1.0.0
+Usuário: {username}
+
+CONTEÚDO DO BACKUP:
+- Banco de dados: uma tabela por arquivo em database/tables/ (JSONL) e,
+  no SQLite, o arquivo database/app.db
+- Arquivos de upload (logos, PDFs, etc.) e manifest.json
+- Arquivos de configuração
+
+INSTRUÇÕES PARA RESTAURAÇÃO:
+1. Manter na mesma pasta este ZIP e os backups anteriores (incrementais)
+2. Restaurar banco e uploads:
+   python restore_backup.py <este arquivo> static/uploads --banco
+3. Verificar configurações no arquivo main.py
+
+IMPORTANTE: Este backup foi gerado automaticamente pelo sistema.
+Mantenha este arquivo em local seguro.
+"""
+
+
+def latest_manifest():
+    """Manifesto do último backup da cadeia (dict) ou None"""
+    record = BackupManifest.query.order_by(BackupManifest.created_at.desc()).first()
+    return json.loads(record.manifest) if record else None
+
+
+def resolve_backup_mode(mode):
+    """Modo efetivo: incremental sem backup anterior vira 'full'"""
+    if mode not in BACKUP_MODES:
+        return 'full'
+    if mode == 'incremental' and db.session.query(BackupManifest.id).first() is None:
+        return 'full'
+    return mode
+
+
+def backup_filename(backup_id, mode):
+    """Nome do ZIP: data/hora, modo e início do backup_id (únicos na pasta)"""
+    timestamp = datetime.now(pytz.timezone("America/Sao_Paulo")).strftime("%Y%m%d_%H%M%S")
+    suffix = '_incremental' if mode == 'incremental' else ''
+    return f"backup_sistema_{timestamp}{suffix}_{backup_id[:8]}.zip"
+
+
+def build_backup(username, backup_id, filename, mode='full', progress=None):
+    """
+    Monta o backup: banco (SQLite), uploads, configuração, LEIA-ME e
+    manifesto.
+
+    No modo incremental só entram os uploads novos ou alterados desde o
+    último backup; os demais ficam referenciados no manifesto pelo backup
+    que contém o conteúdo. O manifesto de qualquer backup descreve todos os
+    arquivos daquele momento, então restaurar um ponto no tempo exige só ele
+    e os ZIPs que ele referencia. Sem backup anterior, o modo vira 'full'.
+
+    Args:
+        username: Usuário que solicitou (LEIA-ME)
+        backup_id: Identificador do backup (uuid4 hex)
+        filename: Nome do arquivo ZIP gerado
+        mode: 'full' ou 'incremental'
+        progress: BackupProgress (opcional)
+
+    Returns:
+        tuple: (lista de BackupEntry, manifesto)
+    """
+    previous = latest_manifest()
+    if mode == 'incremental' and previous is None:
+        mode = 'full'
+
+    files = scan_uploads(
+        current_app.config.get('UPLOAD_FOLDER'),
+        previous['files'] if previous else None,
+        progress
+    )
+
+    # Conteúdo já guardado em algum backup anterior, por checksum
+    stored = {}
+    if mode == 'incremental':
+        for arcname, info in previous['files'].items():
+            stored.setdefault(info['sha256'], dict(info, source=info.get('source', arcname)))
+
+    # Dump JSONL de todas as tabelas (SQLite e PostgreSQL) e, no SQLite,
+    # também o arquivo do banco
+    entries = [BackupEntry(arcname=arcname, chunks=chunks) for arcname, chunks in dump_database()]
+    entries.extend(database_entries())
+
+    manifest_files = {}
+    archives = {backup_id: filename}
+    for arcname, info in files.items():
+        entry = {'size': info['size'], 'mtime_ns': info['mtime_ns'], 'sha256': info['sha256']}
+        earlier = stored.get(info['sha256'])
+        if earlier is not None:
+            entry['backup'] = earlier['backup']
+            if earlier['source'] != arcname:
+                entry['source'] = earlier['source']
+            archives[earlier['backup']] = previous['archives'][earlier['backup']]
+        else:
+            entry['backup'] = backup_id
+            entries.append(BackupEntry(arcname=arcname, path=info['path'], size=info['size']))
+        manifest_files[arcname] = entry
+
+    main_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'main.py')
+    if os.path.exists(main_path):
+        entries.append(BackupEntry(arcname='config/main.py', path=main_path, size=os.path.getsize(main_path)))
+
+    readme = backup_info_text(username).encode('utf-8')
+    entries.append(BackupEntry(arcname='LEIA-ME.txt', data=readme, size=len(readme)))
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'backup_id': backup_id,
+        'parent_id': previous['backup_id'] if mode == 'incremental' else None,
+        'mode': mode,
+        'filename': filename,
+        'created_at': datetime.now(pytz.timezone("America/Sao_Paulo")).isoformat(),
+        'archives': archives,
+        'files': manifest_files,
+    }
+    data = json.dumps(manifest, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    entries.append(BackupEntry(arcname=MANIFEST_NAME, data=data, size=len(data)))
+    return entries, manifest
+
+
+def record_backup(manifest):
+    """
+    Guarda o manifesto de um backup gravado no servidor (base do próximo
+    incremental) e descarta os mais antigos que MAX_MANIFESTS.
+    """
+    included = [info for info in manifest['files'].values() if info['backup'] == manifest['backup_id']]
+    db.session.add(BackupManifest(
+        id=manifest['backup_id'],
+        parent_id=manifest['parent_id'],
+        mode=manifest['mode'],
+        filename=manifest['filename'],
+        file_count=len(manifest['files']),
+        total_size=sum(info['size'] for info in manifest['files'].values()),
+        included_count=len(included),
+        included_size=sum(info['size'] for info in included),
+        manifest=json.dumps(manifest, separators=(',', ':'), sort_keys=True)
+    ))
+    db.session.flush()
+
+    stale = [
+        record_id for record_id, in
+        db.session.query(BackupManifest.id)
+        .order_by(BackupManifest.created_at.desc())
+        .offset(MAX_MANIFESTS)
+    ]
+    if stale:
+        BackupManifest.query.filter(BackupManifest.id.in_(stale)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def read_manifest(archive_path):
+    """Manifesto gravado em um ZIP de backup"""
+    with zipfile.ZipFile(archive_path) as archive:
+        return json.loads(archive.read(MANIFEST_NAME))
+
+
+def restore_backup_database(archive_path):
+    """
+    Restaura o banco a partir do dump JSONL do backup (SQLite ou
+    PostgreSQL) e reconstrói o índice de busca.
+
+    Returns:
+        dict: {tabela: linhas restauradas}
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        restored = restore_database(archive)
+    rebuild_search_index()
+    return restored
+
+
+def restore_uploads(archive_path, target_folder):
+    """
+    Restaura os uploads do ponto no tempo de um backup.
+
+    Os arquivos vêm do próprio ZIP ou dos backups anteriores referenciados
+    no manifesto, procurados na mesma pasta do ZIP informado. Cada arquivo
+    é copiado em blocos e conferido pelo SHA-256.
+
+    Args:
+        archive_path: ZIP do backup a restaurar
+        target_folder: Pasta de uploads de destino
+
+    Returns:
+        int: Quantidade de arquivos restaurados
+
+    Raises:
+        FileNotFoundError: Backup referenciado ausente
+        ValueError: Checksum divergente
+    """
+    manifest = read_manifest(archive_path)
+    directory = os.path.dirname(os.path.abspath(archive_path))
+
+    by_backup = {}
+    for arcname, info in manifest['files'].items():
+        by_backup.setdefault(info['backup'], []).append((arcname, info))
+
+    restored = 0
+    for backup_id, items in by_backup.items():
+        source_path = os.path.join(directory, manifest['archives'][backup_id])
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f'Backup necessário não encontrado: {source_path}')
+
+        with zipfile.ZipFile(source_path) as archive:
+            for arcname, info in items:
+                target_path = safe_join(target_folder, arcname[len('uploads/'):])
+                if target_path is None:
+                    raise ValueError(f'Caminho inválido no manifesto: {arcname}')
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+                digest = hashlib.sha256()
+                with archive.open(info.get('source', arcname)) as source, open(target_path, 'wb') as target:
+                    for block in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+                        digest.update(block)
+                        target.write(block)
+                if digest.hexdigest() != info['sha256']:
+                    raise ValueError(f'Checksum não confere: {arcname}')
+
+                os.utime(target_path, ns=(info['mtime_ns'], info['mtime_ns']))
+                restored += 1
+    return restored
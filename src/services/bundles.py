@@ -0,0 +1,299 @@
+import fcntl
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app
+from src.services.backup import BackupEntry, stream_zip
+from src.services.file_store import CACHE_FOLDER, blob_key, display_name, file_path
+
+# Pasta (dentro de UPLOAD_FOLDER) com os ZIPs de ordens de serviço já montados
+BUNDLE_FOLDER = os.path.join(CACHE_FOLDER, 'bundles')
+
+# Espaço máximo do cache; os pacotes menos usados são descartados
+MAX_CACHE_SIZE = 5 * 1024 * 1024 * 1024
+
+# Cópias parciais e locks deixados por processos interrompidos são removidos após
+STALE_PART_AGE = 24 * 3600
+
+# Espera pelo início de uma montagem feita por outra requisição
+BUILD_START_TIMEOUT = 10
+
+# Leitura do pacote em montagem: tamanho do bloco e intervalo entre tentativas
+FOLLOW_READ_SIZE = 1024 * 1024
+FOLLOW_POLL_INTERVAL = 0.1
+
+
+def _bundle_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], BUNDLE_FOLDER)
+
+
+def _unique_name(name, used):
+    """Evita nomes repetidos dentro do ZIP (arte.pdf, arte (2).pdf...)"""
+    stem, ext = os.path.splitext(name)
+    candidate, counter = name, 2
+    while candidate.lower() in used:
+        candidate = f'{stem} ({counter}){ext}'
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def bundle_entries(filenames):
+    """
+    Arquivos do pacote, com o nome original dentro do ZIP.
+
+    Returns:
+        list: BackupEntry (arquivos ausentes no disco ficam de fora)
+    """
+    entries = []
+    used = set()
+    for filename in filenames:
+        path = file_path(filename, 'service_order')
+        if path is None or not os.path.isfile(path):
+            continue
+        entries.append(BackupEntry(
+            arcname=_unique_name(display_name(filename), used),
+            path=path,
+            size=os.path.getsize(path)
+        ))
+    return entries
+
+
+def bundle_key(filenames):
+    """
+    Chave do pacote no cache, derivada do conjunto de arquivos.
+
+    Arquivos do store já trazem o SHA-256 do conteúdo no nome; para
+    uploads antigos entram tamanho e data de modificação. Trocar qualquer
+    arquivo gera outra chave.
+    """
+    digest = hashlib.sha256()
+    for filename in filenames:
+        digest.update(filename.encode('utf-8'))
+        if blob_key(filename) is None:
+            path = file_path(filename, 'service_order')
+            if path is not None and os.path.isfile(path):
+                stat = os.stat(path)
+                digest.update(f':{stat.st_size}:{stat.st_mtime_ns}'.encode('ascii'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cached_bundle(key):
+    """Caminho do pacote já montado ou None (marca o uso para o descarte LRU)"""
+    path = os.path.join(_bundle_dir(), f'{key}.zip')
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def _bundle_paths(key):
+    directory = _bundle_dir()
+    return (
+        os.path.join(directory, f'{key}.zip'),
+        os.path.join(directory, f'.{key}.part'),
+        os.path.join(directory, f'.{key}.lock')
+    )
+
+
+def _try_lock(lock_path):
+    """Descritor com o lock exclusivo (flock) do pacote ou None se outra requisição o monta"""
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _build_running(lock_path):
+    """Verdadeiro enquanto outra requisição (ou processo) segura o lock do pacote"""
+    fd = _try_lock(lock_path)
+    if fd is None:
+        return True
+    os.close(fd)
+    return False
+
+
+def _same_file(source, path):
+    try:
+        return os.path.samestat(os.fstat(source.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def _build_bundle(app, entries, part_file, paths, lock_fd):
+    """Grava o ZIP no arquivo parcial e o publica no cache (thread própria)"""
+    path, part_path, _ = paths
+    with app.app_context():
+        try:
+            with part_file:
+                for data in stream_zip(entries):
+                    part_file.write(data)
+            os.replace(part_path, path)
+        except Exception as e:
+            current_app.logger.error(f'Erro ao montar pacote {os.path.basename(path)}: {str(e)}')
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+        finally:
+            # Fechar o descritor libera o lock
+            os.close(lock_fd)
+        prune_bundle_cache()
+
+
+def _start_build(key, entries):
+    """
+    Inicia a montagem do pacote se nenhuma outra requisição o estiver montando.
+
+    O lock é um flock no arquivo .lock do pacote: vale entre workers e é
+    liberado pelo kernel se o processo morrer, então uma montagem
+    interrompida nunca trava o pacote.
+    """
+    paths = _bundle_paths(key)
+    path, part_path, lock_path = paths
+    lock_fd = _try_lock(lock_path)
+    if lock_fd is None:
+        return
+
+    try:
+        os.utime(lock_path)
+        if os.path.exists(path):
+            # Outra requisição terminou o pacote antes de obtermos o lock
+            os.close(lock_fd)
+            return
+        # Sobra de montagem interrompida: novo arquivo (quem ainda lê a
+        # cópia antiga percebe que ela foi descartada)
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+        part_file = open(part_path, 'xb')
+    except Exception:
+        os.close(lock_fd)
+        raise
+
+    threading.Thread(
+        target=_build_bundle,
+        args=(current_app._get_current_object(), entries, part_file, paths, lock_fd),
+        name=f'bundle-{key[:12]}',
+        daemon=True
+    ).start()
+
+
+def _open_bundle(key):
+    """
+    Abre o pacote pronto ou o arquivo parcial em montagem.
+
+    Returns:
+        tuple: (arquivo, True se o pacote já estiver completo)
+    """
+    path, part_path, lock_path = _bundle_paths(key)
+    deadline = time.monotonic() + BUILD_START_TIMEOUT
+    while True:
+        try:
+            return open(part_path, 'rb'), False
+        except FileNotFoundError:
+            pass
+        try:
+            return open(path, 'rb'), True
+        except FileNotFoundError:
+            pass
+        # Lock obtido, arquivo parcial ainda não criado
+        if time.monotonic() > deadline or not _build_running(lock_path):
+            raise RuntimeError('O pacote não começou a ser montado.')
+        time.sleep(FOLLOW_POLL_INTERVAL)
+
+
+def stream_bundle(key, entries):
+    """
+    Envia o ZIP enquanto é montado, uma única vez por pacote.
+
+    A primeira requisição obtém o lock do pacote e o monta em uma thread,
+    gravando no arquivo parcial do cache; todas as requisições (inclusive
+    a primeira) enviam o ZIP lendo esse arquivo à medida que cresce. Vários
+    funcionários baixando o mesmo pacote ao mesmo tempo compartilham a
+    mesma montagem, e um download interrompido não descarta o pacote. O
+    arquivo só passa a valer no cache (os.replace) se o ZIP for gerado por
+    completo.
+
+    Yields:
+        bytes: Próximo trecho do ZIP
+
+    Raises:
+        RuntimeError: Montagem interrompida (o download fica incompleto)
+    """
+    os.makedirs(_bundle_dir(), exist_ok=True)
+    path, _, lock_path = _bundle_paths(key)
+    _start_build(key, entries)
+
+    source, complete = _open_bundle(key)
+    with source:
+        while True:
+            data = source.read(FOLLOW_READ_SIZE)
+            if data:
+                yield data
+                continue
+            if complete:
+                return
+            if _same_file(source, path):
+                # Publicado no cache: o restante já está no arquivo
+                complete = True
+                continue
+            if os.fstat(source.fileno()).st_nlink == 0 or not _build_running(lock_path):
+                if _same_file(source, path):
+                    complete = True
+                    continue
+                raise RuntimeError('A montagem do pacote foi interrompida.')
+            time.sleep(FOLLOW_POLL_INTERVAL)
+
+
+def prune_bundle_cache(max_size=MAX_CACHE_SIZE):
+    """
+    Descarta os pacotes usados há mais tempo até o cache caber em max_size
+    (e cópias parciais e locks abandonados).
+
+    Returns:
+        int: Quantidade de pacotes removidos
+    """
+    directory = _bundle_dir()
+    if not os.path.isdir(directory):
+        return 0
+
+    bundles = []
+    stale_limit = time.time() - STALE_PART_AGE
+    for filename in os.listdir(directory):
+        path = os.path.join(directory, filename)
+        try:
+            stat = os.stat(path)
+            if filename.endswith('.part') and stat.st_mtime < stale_limit:
+                os.remove(path)
+            elif filename.endswith('.lock') and stat.st_mtime < stale_limit:
+                # Só remove o lock que ninguém segura (removido ainda travado)
+                lock_fd = _try_lock(path)
+                if lock_fd is not None:
+                    os.remove(path)
+                    os.close(lock_fd)
+        except OSError:
+            continue
+        if filename.endswith('.zip'):
+            bundles.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in bundles)
+    removed = 0
+    for _, size, path in sorted(bundles):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
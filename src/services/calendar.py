@@ -0,0 +1,86 @@
+from datetime import datetime
+from src.models.user import db, Order
+from src.services.serializers import STREAM_BATCH_SIZE
+
+# Cor do evento por status do pedido
+STATUS_COLORS = {
+    'aprovado': '#3788d8',
+    'em_producao': '#8b4513',
+    'pronto': '#10b981',
+    'entregue': '#4f5553'
+}
+
+
+def parse_calendar_window(args):
+    """
+    Lê a janela visível enviada pelo FullCalendar (parâmetros start/end).
+
+    Aceita datas (YYYY-MM-DD) ou datas ISO com horário/fuso, das quais
+    apenas a data é usada.
+
+    Args:
+        args: request.args
+
+    Returns:
+        tuple: (start, end) como date ou None quando ausentes
+
+    Raises:
+        ValueError: Se alguma data for inválida
+    """
+    window = []
+    for name in ('start', 'end'):
+        value = args.get(name)
+        window.append(datetime.strptime(value[:10], '%Y-%m-%d').date() if value else None)
+    return tuple(window)
+
+
+def get_calendar_events(start=None, end=None, approved_only=False, include_delivered=False):
+    """
+    Gera os eventos de entrega do calendário para a janela informada.
+
+    Usa o índice de delivery_date para o filtro de intervalo e lê apenas
+    as colunas emitidas, em lotes, sem carregar objetos Order completos.
+
+    Args:
+        start: Primeira data de entrega incluída (padrão: sem limite)
+        end: Data de entrega final, exclusiva (padrão: sem limite)
+        approved_only: Apenas pedidos aprovados (calendário do funcionário)
+        include_delivered: Incluir pedidos já entregues
+
+    Yields:
+        dict: Evento no formato do FullCalendar
+    """
+    query = db.session.query(
+        Order.id,
+        Order.company_name,
+        Order.status,
+        Order.order_date,
+        Order.delivery_date
+    )
+
+    if start is not None:
+        query = query.filter(Order.delivery_date >= start)
+    if end is not None:
+        query = query.filter(Order.delivery_date < end)
+    if approved_only:
+        query = query.filter(Order.approved == True)
+    if not include_delivered:
+        query = query.filter(Order.status != 'entregue')
+
+    rows = query.order_by(Order.delivery_date, Order.id).yield_per(STREAM_BATCH_SIZE)
+    for order_id, company_name, status, order_date, delivery_date in rows:
+        color = STATUS_COLORS.get(status, '#6b7280')
+        yield {
+            'id': f'delivery_{order_id}',
+            'title': f'{company_name}',
+            'start': delivery_date.isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'extendedProps': {
+                'type': 'delivery',
+                'order_id': order_id,
+                'company_name': company_name,
+                'status': status,
+                'order_date': order_date.isoformat()
+            }
+        }
@@ -0,0 +1,329 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+import pytz
+from flask import current_app
+from sqlalchemy.orm.exc import ObjectDeletedError
+from werkzeug.utils import secure_filename
+from src.models.user import db, ChunkedUpload
+from src.services.file_store import release_file, save_local_file
+
+# Extensões aceitas nos arquivos de ordens de serviço
+SERVICE_ORDER_EXTENSIONS = ('.pdf', '.cdr', '.dxf', '.zip', '.rar', '.xls', '.xlsx', '.ia', '.pptx')
+
+# Tamanho das partes: padrão e limites aceitos do cliente
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Tamanho máximo do arquivo enviado em partes
+MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024
+
+# Uploads não concluídos são descartados após este prazo
+UPLOAD_TTL = timedelta(hours=24)
+
+# Pasta (dentro de UPLOAD_FOLDER) dos uploads em andamento
+CHUNKED_FOLDER = 'chunked'
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ChunkedUploadError(ValueError):
+    """Requisição inválida no fluxo de upload em partes"""
+
+
+def _now():
+    # Sem fuso: comparável com o valor lido do banco
+    return datetime.now(pytz.timezone("America/Sao_Paulo")).replace(tzinfo=None)
+
+
+def _upload_dir(upload_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], CHUNKED_FOLDER, upload_id)
+
+
+def _data_path(upload_id):
+    return os.path.join(_upload_dir(upload_id), 'data')
+
+
+def _part_marker(upload_id, index):
+    return os.path.join(_upload_dir(upload_id), 'parts', str(index))
+
+
+def _remove_upload(upload):
+    """Remove o registro e os arquivos temporários do upload"""
+    shutil.rmtree(_upload_dir(upload.id), ignore_errors=True)
+    db.session.delete(upload)
+
+
+def cleanup_expired_uploads():
+    """
+    Descarta uploads expirados (arquivos temporários e referências não usadas).
+
+    Returns:
+        int: Quantidade de uploads removidos
+    """
+    expired = ChunkedUpload.query.filter(ChunkedUpload.expires_at < _now()).all()
+    for upload in expired:
+        release_file(upload.stored_name, 'service_order')
+        _remove_upload(upload)
+    if expired:
+        db.session.commit()
+    return len(expired)
+
+
+def start_upload(user, filename, total_size, chunk_size=None, sha256=None):
+    """
+    Inicia um upload em partes.
+
+    O arquivo de destino é pré-alocado, então as partes podem ser
+    gravadas em qualquer ordem e em paralelo.
+
+    Args:
+        user: Usuário que envia
+        filename: Nome original do arquivo
+        total_size: Tamanho total em bytes
+        chunk_size: Tamanho das partes (padrão: DEFAULT_CHUNK_SIZE)
+        sha256: Checksum do arquivo inteiro, se conhecido
+
+    Returns:
+        ChunkedUpload: Upload criado
+
+    Raises:
+        ChunkedUploadError: Se os parâmetros forem inválidos
+    """
+    cleanup_expired_uploads()
+
+    name = secure_filename(filename or '')
+    if not name or not name.lower().endswith(SERVICE_ORDER_EXTENSIONS):
+        raise ChunkedUploadError('Formato de arquivo não suportado (PDF, CDR, DXF, ZIP, RAR, XLS, XLSX, IA, PPTX).')
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise ChunkedUploadError('Tamanho do arquivo inválido.')
+    if total_size > MAX_UPLOAD_SIZE:
+        raise ChunkedUploadError('Arquivo maior que o limite permitido.')
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not isinstance(chunk_size, int) or not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ChunkedUploadError('Tamanho de parte inválido.')
+    if sha256 is not None and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256.lower())):
+        raise ChunkedUploadError('Checksum inválido.')
+
+    upload = ChunkedUpload(
+        id=uuid.uuid4().hex,
+        filename=name,
+        total_size=total_size,
+        chunk_size=chunk_size,
+        sha256=sha256.lower() if sha256 else None,
+        created_by_id=user.id,
+        expires_at=_now() + UPLOAD_TTL
+    )
+
+    os.makedirs(os.path.join(_upload_dir(upload.id), 'parts'))
+    with open(_data_path(upload.id), 'wb') as data:
+        data.truncate(total_size)
+
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def get_upload(upload_id, user):
+    """Upload em andamento do usuário ou None (inexistente, de outro usuário ou expirado)"""
+    upload = db.session.get(ChunkedUpload, upload_id)
+    if upload is None or upload.created_by_id != user.id or upload.expires_at < _now():
+        return None
+    return upload
+
+
+def received_chunks(upload):
+    """Índices das partes já gravadas"""
+    parts_dir = os.path.join(_upload_dir(upload.id), 'parts')
+    try:
+        return sorted(int(name) for name in os.listdir(parts_dir) if name.isdigit())
+    except FileNotFoundError:
+        return []
+
+
+def upload_status(upload):
+    """
+    Situação do upload (usada pelo cliente para retomar).
+
+    Returns:
+        dict: upload_id, filename, total_size, chunk_size, total_chunks,
+        received, missing e finalized
+    """
+    received = received_chunks(upload) if upload.stored_name is None else list(range(upload.total_chunks))
+    received_set = set(received)
+    return {
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'total_size': upload.total_size,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'received': received,
+        'missing': [index for index in range(upload.total_chunks) if index not in received_set],
+        'finalized': upload.stored_name is not None
+    }
+
+
+def write_chunk(upload, index, stream, content_length, sha256=None):
+    """
+    Grava uma parte direto no arquivo de destino, na posição da parte.
+
+    O corpo é lido do stream da requisição em blocos, sem ser carregado
+    inteiro na memória. Reenviar uma parte apenas a sobrescreve.
+
+    Args:
+        upload: ChunkedUpload
+        index: Índice da parte (0 em diante)
+        stream: request.stream
+        content_length: Tamanho do corpo informado
+        sha256: Checksum da parte (opcional, cabeçalho X-Chunk-Sha256)
+
+    Raises:
+        ChunkedUploadError: Parte fora do intervalo, tamanho ou checksum incorretos
+    """
+    if upload.stored_name is not None:
+        raise ChunkedUploadError('Upload já finalizado.')
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkedUploadError('Parte inexistente.')
+
+    expected = upload.chunk_length(index)
+    if content_length != expected:
+        raise ChunkedUploadError(f'A parte {index} deve ter {expected} bytes.')
+
+    digest = hashlib.sha256()
+    written = 0
+    offset = index * upload.chunk_size
+    data_path = _data_path(upload.id)
+    try:
+        fd = os.open(data_path, os.O_WRONLY)
+    except FileNotFoundError:
+        raise ChunkedUploadError('Upload já finalizado.')
+    try:
+        # Partes gravam em paralelo (lock compartilhado); a finalização
+        # espera as gravações em andamento e bloqueia novas (lock exclusivo)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        if not os.path.exists(data_path):
+            # Finalizado enquanto esta parte aguardava: o descritor aponta
+            # para o arquivo já movido para o store
+            raise ChunkedUploadError('Upload já finalizado.')
+
+        while written < expected:
+            block = stream.read(min(COPY_CHUNK_SIZE, expected - written))
+            if not block:
+                break
+            os.pwrite(fd, block, offset + written)
+            digest.update(block)
+            written += len(block)
+
+        if written != expected:
+            raise ChunkedUploadError('Parte incompleta (conexão interrompida).')
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise ChunkedUploadError('Checksum da parte não confere.')
+
+        # Marcador gravado só após a parte completa
+        open(_part_marker(upload.id, index), 'wb').close()
+    finally:
+        os.close(fd)
+
+
+def _finalized_name(upload):
+    """Nome no store gravado por outra finalização do mesmo upload"""
+    try:
+        db.session.refresh(upload)
+    except ObjectDeletedError:
+        # A outra requisição já anexou o arquivo a uma ordem de serviço
+        raise ChunkedUploadError('Upload já anexado a uma ordem de serviço.')
+    if upload.stored_name is None:
+        raise ChunkedUploadError('Arquivos do upload não encontrados.')
+    return upload.stored_name
+
+
+def finalize_upload(upload, sha256=None):
+    """
+    Confere se todas as partes chegaram, valida o checksum e move o arquivo
+    para o store endereçado por conteúdo.
+
+    A referência criada no store fica com o upload até ser transferida
+    para uma ordem de serviço (take_upload).
+
+    Args:
+        upload: ChunkedUpload
+        sha256: Checksum do arquivo inteiro (opcional, além do informado no início)
+
+    Returns:
+        str: Nome do arquivo no store
+
+    Raises:
+        ChunkedUploadError: Partes faltando ou checksum divergente
+    """
+    if upload.stored_name is not None:
+        return upload.stored_name
+
+    data_path = _data_path(upload.id)
+    try:
+        data = open(data_path, 'rb')
+    except FileNotFoundError:
+        return _finalized_name(upload)
+
+    with data:
+        # Lock exclusivo até o commit: espera as partes em gravação e
+        # serializa finalizações simultâneas (ex.: nova tentativa do cliente
+        # após perder a resposta), que recebem o resultado da primeira
+        fcntl.flock(data, fcntl.LOCK_EX)
+        if not os.path.exists(data_path):
+            return _finalized_name(upload)
+
+        missing = upload.total_chunks - len(received_chunks(upload))
+        if missing:
+            raise ChunkedUploadError(f'Faltam {missing} partes.')
+
+        digest = hashlib.sha256()
+        for block in iter(lambda: data.read(COPY_CHUNK_SIZE), b''):
+            digest.update(block)
+        checksum = digest.hexdigest()
+
+        for expected in (upload.sha256, sha256.lower() if sha256 else None):
+            if expected and expected != checksum:
+                raise ChunkedUploadError('Checksum do arquivo não confere.')
+
+        upload.stored_name = save_local_file(data_path, upload.filename, checksum, keep_name=True)
+        db.session.commit()
+
+    shutil.rmtree(_upload_dir(upload.id), ignore_errors=True)
+    return upload.stored_name
+
+
+def take_upload(upload_id, user):
+    """
+    Retira um upload finalizado para anexá-lo a uma ordem de serviço.
+
+    A referência do arquivo no store passa para a coluna que receber o
+    nome retornado; o registro do upload é removido na mesma transação.
+
+    Returns:
+        str: Nome do arquivo no store
+
+    Raises:
+        ChunkedUploadError: Upload inexistente ou não finalizado
+    """
+    upload = get_upload(upload_id, user)
+    if upload is None:
+        raise ChunkedUploadError('Upload não encontrado ou expirado.')
+    if upload.stored_name is None:
+        raise ChunkedUploadError('Upload ainda não finalizado.')
+
+    stored_name = upload.stored_name
+    db.session.delete(upload)
+    return stored_name
+
+
+def cancel_upload(upload):
+    """Cancela o upload, descartando partes e a referência no store"""
+    release_file(upload.stored_name, 'service_order')
+    _remove_upload(upload)
+    db.session.commit()
@@ -0,0 +1,250 @@
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import func, select, text
+from sqlalchemy.types import Date, DateTime
+from src.models.user import db, BackupManifest, ChunkedUpload
+
+# Pasta (dentro do ZIP de backup) com uma tabela por arquivo JSONL
+DUMP_FOLDER = 'database/tables'
+
+# Linhas lidas do cursor e gravadas por lote
+DUMP_BATCH_SIZE = 1000
+
+# Tabelas fora do dump: uploads em andamento (arquivos temporários não vão
+# para o backup) e os próprios manifestos de backup
+EXCLUDED_TABLES = frozenset({ChunkedUpload.__tablename__, BackupManifest.__tablename__})
+
+
+def dump_tables():
+    """Tabelas exportadas, em ordem de dependência (pais antes dos filhos)"""
+    return [table for table in db.metadata.sorted_tables if table.name not in EXCLUDED_TABLES]
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(value).__name__}')
+
+
+def _json_line(value):
+    return (json.dumps(value, default=_encode, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class DatabaseSnapshot:
+    """
+    Conexão própria com uma única transação de leitura para o dump.
+
+    Todas as tabelas são lidas no mesmo snapshot (REPEATABLE READ no
+    PostgreSQL, BEGIN explícito no SQLite): linhas gravadas durante o
+    backup não geram filhos sem pai no arquivo. A conexão é fechada
+    quando a última tabela termina.
+    """
+
+    def __init__(self, table_count):
+        self._remaining = table_count
+        self._connection = None
+
+    def connection(self):
+        if self._connection is None:
+            connection = db.engine.connect()
+            if connection.dialect.name == 'postgresql':
+                connection = connection.execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+                connection.begin()
+            else:
+                connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+                connection.exec_driver_sql('BEGIN')
+            self._connection = connection
+        return self._connection
+
+    def release(self):
+        self._remaining -= 1
+        if self._remaining <= 0:
+            self.close()
+
+    def close(self):
+        if self._connection is not None:
+            if self._connection.dialect.name != 'postgresql':
+                self._connection.exec_driver_sql('COMMIT')
+            self._connection.close()
+            self._connection = None
+
+
+def _table_chunks(snapshot, table):
+    """
+    Gera o JSONL de uma tabela: cabeçalho com as colunas e uma linha
+    (lista de valores) por registro.
+
+    As linhas vêm de um cursor no servidor (yield_per) em lotes de
+    DUMP_BATCH_SIZE; a tabela nunca é carregada inteira na memória.
+    """
+    try:
+        columns = [column.name for column in table.columns]
+        yield _json_line({'table': table.name, 'columns': columns})
+
+        connection = snapshot.connection()
+        order_by = list(table.primary_key.columns) or list(table.columns)
+        result = connection.execution_options(yield_per=DUMP_BATCH_SIZE).execute(
+            select(table).order_by(*order_by)
+        )
+        for rows in result.partitions():
+            yield b''.join(_json_line(list(row)) for row in rows)
+    finally:
+        snapshot.release()
+
+
+def dump_database():
+    """
+    Exporta todas as tabelas dos modelos como JSONL.
+
+    Returns:
+        list: (arcname, gerador de bytes) por tabela, em ordem de dependência
+    """
+    tables = dump_tables()
+    snapshot = DatabaseSnapshot(len(tables))
+    return [(f'{DUMP_FOLDER}/{table.name}.jsonl', _table_chunks(snapshot, table)) for table in tables]
+
+
+def _converters(table, columns):
+    """Funções que convertem os valores do JSON para os tipos das colunas"""
+    converters = []
+    for name in columns:
+        column_type = table.columns[name].type
+        if isinstance(column_type, DateTime):
+            converters.append(lambda value: datetime.fromisoformat(value) if value is not None else None)
+        elif isinstance(column_type, Date):
+            converters.append(lambda value: date.fromisoformat(value) if value is not None else None)
+        else:
+            converters.append(None)
+    return converters
+
+
+def _read_batches(stream, table):
+    """
+    Lê o JSONL de uma tabela em lotes.
+
+    Colunas que não existem mais no modelo são ignoradas.
+
+    Yields:
+        tuple: (colunas, lista de linhas convertidas)
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8')
+    header = json.loads(next(lines))
+    positions = [index for index, name in enumerate(header['columns']) if name in table.columns]
+    columns = [header['columns'][index] for index in positions]
+    converters = _converters(table, columns)
+
+    batch = []
+    for line in lines:
+        values = json.loads(line)
+        row = [values[index] for index in positions]
+        batch.append([convert(value) if convert else value for convert, value in zip(converters, row)])
+        if len(batch) >= DUMP_BATCH_SIZE:
+            yield columns, batch
+            batch = []
+    if batch:
+        yield columns, batch
+
+
+def _csv_value(value):
+    """
+    Valor no formato CSV do COPY: NULL é o campo vazio sem aspas, então
+    todo texto vai entre aspas (inclusive a string vazia).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_batch(connection, table, columns, rows):
+    """Carrega um lote com COPY (PostgreSQL)"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.dialect.identifier_preparer.quote
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {quote(table.name)} ({", ".join(quote(name) for name in columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _reset_sequences(connection, tables):
+    """Ajusta as sequências do PostgreSQL ao maior id restaurado"""
+    quote = connection.dialect.identifier_preparer.quote
+    for table in tables:
+        primary_key = list(table.primary_key.columns)
+        if len(primary_key) != 1 or not primary_key[0].autoincrement or primary_key[0].type.python_type is not int:
+            continue
+        column = primary_key[0]
+        sequence = connection.execute(
+            select(func.pg_get_serial_sequence(quote(table.name), column.name))
+        ).scalar()
+        if sequence:
+            connection.execute(
+                text(f'SELECT setval(:sequence, COALESCE(MAX({quote(column.name)}), 1), MAX({quote(column.name)}) IS NOT NULL) '
+                     f'FROM {quote(table.name)}'),
+                {'sequence': sequence}
+            )
+
+
+def restore_database(archive):
+    """
+    Substitui o conteúdo do banco pelo dump JSONL de um backup.
+
+    Roda em uma única transação: as tabelas são esvaziadas e recarregadas
+    em ordem de dependência, em lotes de DUMP_BATCH_SIZE (COPY no
+    PostgreSQL, executemany nos demais bancos). Uploads em andamento e
+    manifestos de backup são descartados.
+
+    Args:
+        archive: zipfile.ZipFile do backup
+
+    Returns:
+        dict: {tabela: linhas restauradas}
+
+    Raises:
+        ValueError: Se o backup não tiver o dump do banco
+    """
+    names = set(archive.namelist())
+    tables = [table for table in dump_tables() if f'{DUMP_FOLDER}/{table.name}.jsonl' in names]
+    if not tables:
+        raise ValueError('O backup não contém o dump do banco de dados.')
+
+    restored = {}
+    with db.engine.begin() as connection:
+        postgresql = connection.dialect.name == 'postgresql'
+        all_tables = db.metadata.sorted_tables
+        if postgresql:
+            quote = connection.dialect.identifier_preparer.quote
+            connection.execute(text(f'TRUNCATE {", ".join(quote(table.name) for table in all_tables)}'))
+        else:
+            for table in reversed(all_tables):
+                connection.execute(table.delete())
+
+        for table in tables:
+            restored[table.name] = 0
+            with archive.open(f'{DUMP_FOLDER}/{table.name}.jsonl') as stream:
+                for columns, rows in _read_batches(stream, table):
+                    if postgresql:
+                        _copy_batch(connection, table, columns, rows)
+                    else:
+                        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+                    restored[table.name] += len(rows)
+
+        if postgresql:
+            _reset_sequences(connection, tables)
+    return restored
@@ -0,0 +1,186 @@
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import current_app, make_response, request
+from flask_login import current_user
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from src.models.user import (
+    db, Order, Notification, BroadcastNotification, NotificationReadState,
+    BroadcastNotificationRead, StatusPermission, DataVersion
+)
+
+# Conjunto de dados afetado por alterações em cada modelo
+VERSIONED_MODELS = {
+    Order: 'order',
+    Notification: 'notification',
+    BroadcastNotification: 'notification',
+    NotificationReadState: 'notification',
+    BroadcastNotificationRead: 'notification',
+    StatusPermission: 'status_permission',
+}
+
+
+def _version_name(obj_or_class):
+    """Retorna o conjunto de dados de um objeto/classe ou None se não versionado"""
+    cls = obj_or_class if isinstance(obj_or_class, type) else type(obj_or_class)
+    for model, name in VERSIONED_MODELS.items():
+        if issubclass(cls, model):
+            return name
+    return None
+
+
+def _bump_versions(connection, names):
+    """Incrementa a versão dos conjuntos de dados via UPSERT"""
+    table = DataVersion.__table__
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    for name in sorted(names):
+        if insert is not None:
+            stmt = insert(table).values(name=name, version=1)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['name'],
+                set_={'version': table.c.version + 1}
+            )
+            connection.execute(stmt)
+            continue
+
+        # Outros bancos: UPDATE e, se não existir, INSERT
+        result = connection.execute(
+            update(table).where(table.c.name == name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+
+
+def _queue_versions(session, names):
+    """Guarda os conjuntos alterados na sessão; as versões sobem após o commit"""
+    session.info.setdefault('pending_data_versions', set()).update(names)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_data_versions(session, flush_context, instances):
+    """Registra os conjuntos alterados pelo flush"""
+    names = set()
+
+    for obj in session.new:
+        names.add(_version_name(obj))
+
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            names.add(_version_name(obj))
+
+    for obj in session.deleted:
+        names.add(_version_name(obj))
+
+    names.discard(None)
+    if names:
+        _queue_versions(session, names)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_data_versions(orm_execute_state):
+    """Registra os conjuntos alterados por INSERT/UPDATE/DELETE em massa (fora do flush)"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+
+    mapper = orm_execute_state.bind_mapper
+    name = _version_name(mapper.class_) if mapper is not None else None
+    if name:
+        _queue_versions(orm_execute_state.session, {name})
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_data_versions(session):
+    """
+    Incrementa as versões numa transação curta e separada, após o commit.
+
+    As linhas de data_version são globais: atualizá-las dentro da transação
+    do escritor manteria o lock da linha até o COMMIT e serializaria todas
+    as gravações de pedidos. Entre o commit e o incremento um GET
+    condicional ainda pode responder 304 com o conteúdo anterior; o
+    próximo polling já recebe a versão nova.
+    """
+    names = session.info.pop('pending_data_versions', None)
+    if not names:
+        return
+
+    bind = session.get_bind()
+    engine = bind.engine if isinstance(bind, Connection) else bind
+    try:
+        with engine.begin() as connection:
+            _bump_versions(connection, names)
+    except Exception as e:
+        current_app.logger.warning(f'Erro ao atualizar versões {sorted(names)}: {str(e)}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_data_versions(session):
+    session.info.pop('pending_data_versions', None)
+
+
+def get_data_versions(*names):
+    """
+    Lê as versões atuais dos conjuntos de dados.
+
+    Args:
+        names: Nomes dos conjuntos (ex.: 'order', 'notification')
+
+    Returns:
+        dict: Versão de cada conjunto (0 se nunca alterado)
+    """
+    rows = db.session.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names))
+    ).all()
+    versions = dict.fromkeys(names, 0)
+    versions.update(rows)
+    return versions
+
+
+def conditional_get(*names, daily=False):
+    """
+    Decorator para GET condicional (ETag / If-None-Match) em APIs JSON.
+
+    O ETag é derivado das versões dos conjuntos de dados informados, do
+    usuário logado e da URL completa. Se o cliente já possui a mesma versão,
+    responde 304 sem executar a view.
+
+    Args:
+        names: Conjuntos de dados dos quais a resposta depende
+        daily: A resposta depende da data atual (ex.: "esta semana", período
+               padrão até hoje); o ETag muda à meia-noite (America/Sao_Paulo)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            token = json.dumps([
+                get_data_versions(*names),
+                current_user.get_id(),
+                request.full_path,
+                datetime.now(pytz.timezone("America/Sao_Paulo")).date().isoformat() if daily else None
+            ], sort_keys=True)
+            etag = hashlib.sha1(token.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
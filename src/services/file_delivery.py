@@ -0,0 +1,142 @@
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import time
+import unicodedata
+from urllib.parse import quote
+
+from flask import Response, current_app, send_file, url_for
+from werkzeug.security import safe_join
+
+# Validade das URLs de download (segundos). A expiração é arredondada
+# para o fim da janela seguinte: a URL fica igual durante a janela (o
+# navegador reaproveita o cache) e vale entre TTL e 2 x TTL.
+DOWNLOAD_URL_TTL = 3600
+IMAGE_URL_TTL = 24 * 3600
+
+# Teto do cache das respostas de arquivos do store (conteúdo imutável)
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def _signing_key():
+    # Chave própria, derivada da SECRET_KEY (não reutiliza a da sessão)
+    secret = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hashlib.sha256(b'file-delivery:' + secret).digest()
+
+
+def _signature(relative_path, expires, download_name):
+    message = f'{relative_path}\n{expires}\n{download_name or ""}'.encode('utf-8')
+    digest = hmac.new(_signing_key(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+
+def relative_upload_path(path):
+    """Caminho relativo a UPLOAD_FOLDER (com /), usado nas URLs assinadas"""
+    return os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+
+
+def signed_url(path, download_name=None, ttl=DOWNLOAD_URL_TTL):
+    """
+    URL assinada (HMAC-SHA256) e com validade para um arquivo de UPLOAD_FOLDER.
+
+    Deve ser gerada só depois da verificação de acesso: quem tem a URL
+    baixa o arquivo sem nova consulta ao banco.
+
+    Args:
+        path: Caminho absoluto do arquivo (file_store.file_path)
+        download_name: Nome do download (anexo) ou None para exibir inline
+        ttl: Janela de validade em segundos
+
+    Returns:
+        str: URL de files.deliver
+    """
+    relative_path = relative_upload_path(path)
+    expires = (int(time.time()) // ttl + 2) * ttl
+    params = {'exp': expires, 'sig': _signature(relative_path, expires, download_name)}
+    if download_name:
+        params['dl'] = download_name
+    return url_for('files.deliver', path=relative_path, **params)
+
+
+def verify_signature(relative_path, expires, download_name, signature):
+    """Confere assinatura e validade de uma URL gerada por signed_url"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    expected = _signature(relative_path, expires, download_name)
+    return hmac.compare_digest(expected, signature or '')
+
+
+def set_content_disposition(headers, download_name, as_attachment=True):
+    """
+    Cabeçalho Content-Disposition no mesmo formato do send_file.
+
+    Nomes fora do ASCII (acentos, emoji, CJK) vão em filename*=UTF-8''
+    (RFC 5987), com uma versão ASCII em filename para clientes antigos;
+    aspas e barras no nome são escapadas pelo werkzeug.
+
+    Args:
+        headers: response.headers
+        download_name: Nome do arquivo
+        as_attachment: attachment (download) ou inline
+    """
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': "UTF-8''" + quote(download_name, safe="!#$&+-.^_`|~")}
+    else:
+        names = {'filename': download_name}
+    headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', **names)
+
+
+def deliver_file(relative_path, download_name=None, max_age=None):
+    """
+    Resposta que entrega um arquivo de UPLOAD_FOLDER.
+
+    Com X_ACCEL_REDIRECT_PREFIX configurado, o nginx à frente envia os
+    bytes (X-Accel-Redirect para a location interna que aponta para
+    UPLOAD_FOLDER) e o worker é liberado na hora. Sem ele, o próprio Flask
+    envia o arquivo com suporte a Range e requisições condicionais.
+
+    Args:
+        relative_path: Caminho relativo a UPLOAD_FOLDER (já validado)
+        download_name: Nome do anexo ou None para inline
+        max_age: Cache-Control max-age (segundos) ou None. O cache é
+            sempre private: o arquivo só foi liberado para quem tinha a
+            URL assinada, e proxies compartilhados não podem guardá-lo
+
+    Returns:
+        Response ou None se o arquivo não existir
+    """
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    if path is None or not os.path.isfile(path):
+        return None
+
+    prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if not prefix:
+        response = send_file(
+            path,
+            as_attachment=download_name is not None,
+            download_name=download_name,
+            conditional=True,
+            max_age=max_age
+        )
+    else:
+        response = Response(mimetype=mimetypes.guess_type(download_name or path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative_path)
+        if download_name is not None:
+            set_content_disposition(response.headers, download_name)
+        if max_age is not None:
+            response.cache_control.max_age = max_age
+
+    if max_age is not None:
+        # send_file marca como public quando há max_age
+        response.cache_control.public = False
+        response.cache_control.private = True
+    return response
@@ -0,0 +1,468 @@
+import glob
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytz
+from flask import current_app
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from src.models.user import db, ChunkedUpload, FileReference, Order, ServiceOrder, User
+
+# Pasta (dentro de UPLOAD_FOLDER) dos arquivos endereçados por conteúdo
+STORE_FOLDER = 'store'
+
+# Pasta (dentro de UPLOAD_FOLDER) de dados derivados, que podem ser
+# apagados e gerados de novo (fora dos backups)
+CACHE_FOLDER = 'cache'
+
+# Pastas dos uploads antigos (nomes com timestamp) por categoria
+LEGACY_FOLDERS = {'logo': '', 'profile': 'profiles', 'service_order': 'service_orders'}
+
+# Colunas que referenciam arquivos, por categoria
+FILE_COLUMNS = {
+    'logo': [Order.company_logo],
+    'profile': [User.profile_picture],
+    'service_order': [
+        ServiceOrder.file1_filename, ServiceOrder.file2_filename, ServiceOrder.file3_filename,
+        # Uploads em partes finalizados e ainda não anexados
+        ChunkedUpload.stored_name,
+    ],
+}
+
+# Tamanho máximo do nome original guardado junto da chave (colunas VARCHAR(200))
+MAX_DISPLAY_NAME = 100
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# store/<2 hex>/<2 hex>/<sha256>[.ext]
+_BLOB_KEY = re.compile(r'^store/([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(\.[a-z0-9]{1,10})?(?=/|$)')
+
+# Arquivo derivado de um blob, gravado ao lado dele (ex.: miniaturas <sha256>_sm.webp)
+_DERIVED_KEY = re.compile(r'^store/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}_[a-z0-9]{1,10}(\.[a-z0-9]{1,10})?$')
+
+# Chave da sessão com os arquivos a remover após o commit
+_PENDING_REMOVALS = 'file_store_pending_removals'
+
+
+def blob_key(name):
+    """
+    Chave do arquivo no store (caminho relativo a UPLOAD_FOLDER).
+
+    Nomes gravados por save_file têm a forma store/ab/cd/<sha256>.ext,
+    seguida de /<nome original> quando o nome é preservado.
+
+    Returns:
+        str: Chave ou None para nomes de uploads antigos
+    """
+    match = _BLOB_KEY.match(name or '')
+    return match.group(0) if match else None
+
+
+def display_name(name):
+    """Nome exibido/baixado de um arquivo gravado (filtro de template)"""
+    if not name:
+        return ''
+    key = blob_key(name)
+    if key is None:
+        return name
+    return name[len(key) + 1:] or os.path.basename(key)
+
+
+def file_path(name, category):
+    """
+    Caminho absoluto do arquivo gravado.
+
+    Args:
+        name: Valor da coluna (chave do store ou nome antigo)
+        category: 'logo', 'profile' ou 'service_order' (pasta dos nomes antigos)
+
+    Returns:
+        str: Caminho ou None se o nome for inválido
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    key = blob_key(name)
+    if key is not None:
+        return safe_join(upload_folder, key)
+    if _DERIVED_KEY.match(name or ''):
+        return safe_join(upload_folder, name)
+    legacy_folder = os.path.join(upload_folder, LEGACY_FOLDERS[category])
+    return safe_join(legacy_folder, name) if name else None
+
+
+def open_file(name, category):
+    """
+    Abre um arquivo gravado para leitura binária.
+
+    Raises:
+        FileNotFoundError: Se o arquivo não existir
+    """
+    path = file_path(name, category)
+    if path is None:
+        raise FileNotFoundError(name)
+    return open(path, 'rb')
+
+
+def write_atomic(path, write):
+    """
+    Grava um arquivo por meio de um temporário na mesma pasta.
+
+    O arquivo só aparece no caminho final completo, então leitores (e
+    uploads simultâneos do mesmo conteúdo) nunca veem arquivos parciais.
+
+    Args:
+        path: Caminho final
+        write: Função que recebe o caminho temporário e grava o conteúdo
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _hash_stream(stream):
+    """SHA-256 e tamanho do conteúdo (o stream volta ao início)"""
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+def _copy_stream(stream, path):
+    with open(path, 'wb') as output:
+        shutil.copyfileobj(stream, output, COPY_CHUNK_SIZE)
+
+
+def _acquire_reference(key, file_size, file_type):
+    """
+    Cria a referência do arquivo ou incrementa o contador (UPSERT).
+
+    O UPSERT bloqueia a linha até o commit: uma remoção concorrente do
+    mesmo conteúdo (_remove_released_files) espera a transação terminar e
+    então encontra o contador acima de zero. Por isso a existência do
+    arquivo no disco só é conferida depois desta chamada.
+    """
+    table = FileReference.__table__
+    now = datetime.now(pytz.timezone("America/Sao_Paulo"))
+    values = dict(
+        filename=key, reference_count=1, file_size=file_size,
+        file_type=file_type, created_at=now, last_accessed=now
+    )
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['filename'],
+            set_={'reference_count': table.c.reference_count + 1, 'last_accessed': now}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Outros bancos: UPDATE e, se não existir, INSERT
+    result = db.session.execute(
+        update(table).where(table.c.filename == key).values(
+            reference_count=table.c.reference_count + 1, last_accessed=now
+        )
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**values))
+
+
+def _normalize_extension(extension):
+    extension = (extension or '').lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+def _blob_key_for(digest, extension):
+    return f'{STORE_FOLDER}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def _stored_name(key, original_name, keep_name):
+    """Nome guardado na coluna: a chave, seguida do nome original se preservado"""
+    if not keep_name:
+        return key
+    stem, ext = os.path.splitext(original_name)
+    return f'{key}/{stem[:MAX_DISPLAY_NAME - len(ext)]}{ext}'
+
+
+def save_file(file, keep_name=False, extension=None, write=None, file_type=None):
+    """
+    Grava um upload no store endereçado por conteúdo (SHA-256).
+
+    Conteúdos iguais são gravados uma única vez; cada chamada soma uma
+    referência em FileReference, na transação corrente.
+
+    Args:
+        file: FileStorage recebido em request.files
+        keep_name: Preservar o nome original (exibido e usado no download)
+        extension: Extensão gravada (padrão: a do nome original)
+        write: Função(caminho) que grava o arquivo final quando o conteúdo
+            ainda não existe (padrão: copia o upload)
+        file_type: Tipo MIME (padrão: deduzido da extensão)
+
+    Returns:
+        str: Nome a guardar na coluna do modelo
+    """
+    digest, file_size = _hash_stream(file.stream)
+    original_name = secure_filename(file.filename or '') or 'arquivo'
+    if extension is None:
+        extension = os.path.splitext(original_name)[1]
+
+    key = _blob_key_for(digest, _normalize_extension(extension))
+    path = file_path(key, None)
+    _acquire_reference(key, file_size, file_type or mimetypes.guess_type(path)[0])
+    if not os.path.exists(path):
+        if write is not None:
+            write(path)
+        else:
+            write_atomic(path, lambda temp_path: _copy_stream(file.stream, temp_path))
+
+    return _stored_name(key, original_name, keep_name)
+
+
+def save_local_file(source_path, filename, digest, keep_name=False):
+    """
+    Move para o store um arquivo já gravado no disco (ex.: upload em partes).
+
+    O arquivo de origem é movido (mesmo sistema de arquivos, sem cópia) ou
+    descartado quando o conteúdo já existe no store.
+
+    Args:
+        source_path: Caminho do arquivo a mover
+        filename: Nome original
+        digest: SHA-256 do conteúdo (hex)
+        keep_name: Preservar o nome original
+
+    Returns:
+        str: Nome a guardar na coluna do modelo
+    """
+    original_name = secure_filename(filename or '') or 'arquivo'
+    key = _blob_key_for(digest, _normalize_extension(os.path.splitext(original_name)[1]))
+    path = file_path(key, None)
+    _acquire_reference(key, os.path.getsize(source_path), mimetypes.guess_type(path)[0])
+
+    if os.path.exists(path):
+        os.remove(source_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    return _stored_name(key, original_name, keep_name)
+
+
+def release_file(name, category):
+    """
+    Libera uma referência ao arquivo.
+
+    Quando não restam referências, o arquivo (e seus derivados, como
+    miniaturas) é removido do disco após o commit da transação. A linha
+    de FileReference fica com contador zero até a remoção, que só acontece
+    se nenhuma outra transação voltar a referenciar o conteúdo.
+
+    Uploads antigos (nomes com timestamp) podem ser compartilhados entre
+    registros: só são removidos se nenhuma coluna da categoria ainda
+    apontar para o nome depois do commit.
+
+    Args:
+        name: Valor da coluna (chave do store ou nome antigo)
+        category: 'logo', 'profile' ou 'service_order'
+    """
+    if not name:
+        return
+
+    key = blob_key(name)
+    if key is None:
+        if file_path(name, category) is not None:
+            db.session.info.setdefault(_PENDING_REMOVALS, set()).add(('legacy', (category, name)))
+        return
+
+    released = db.session.execute(
+        update(FileReference)
+        .where(FileReference.filename == key, FileReference.reference_count > 0)
+        .values(reference_count=FileReference.reference_count - 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if released:
+        db.session.info.setdefault(_PENDING_REMOVALS, set()).add(('store', key))
+
+
+def _remove_blob(upload_folder, key):
+    """Remove o arquivo do store e os derivados gravados ao lado (<sha256>*)"""
+    stem = os.path.splitext(os.path.join(upload_folder, key))[0]
+    for path in glob.glob(glob.escape(stem) + '*'):
+        os.remove(path)
+
+
+def _remove_legacy(path):
+    """Remove um upload antigo e suas miniaturas/variantes WebP"""
+    from src.services.images import variant_paths
+    for candidate in [path] + variant_paths(path):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+
+
+def _legacy_in_use(connection, category, name):
+    """Verdadeiro se alguma coluna da categoria ainda referencia o upload antigo"""
+    return any(
+        connection.execute(select(column).where(column == name).limit(1)).first() is not None
+        for column in FILE_COLUMNS[category]
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_released_files(session):
+    """
+    Remove do disco os arquivos liberados pela transação confirmada.
+
+    Cada arquivo do store é removido numa transação curta que apaga a linha
+    de FileReference com contador zero. Se outra transação voltou a
+    referenciar o conteúdo, o DELETE espera o commit dela (lock da linha)
+    e não encontra mais o contador zerado; enquanto o DELETE segura a
+    linha, um save_file do mesmo conteúdo espera e depois grava o arquivo
+    de novo.
+    """
+    pending = session.info.pop(_PENDING_REMOVALS, None)
+    if not pending:
+        return
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    table = FileReference.__table__
+    for kind, value in pending:
+        try:
+            with db.engine.begin() as connection:
+                if kind == 'store':
+                    removed = connection.execute(
+                        delete(table).where(table.c.filename == value, table.c.reference_count <= 0)
+                    ).rowcount
+                    if removed:
+                        _remove_blob(upload_folder, value)
+                elif not _legacy_in_use(connection, *value):
+                    _remove_legacy(file_path(value[1], value[0]))
+        except (OSError, SQLAlchemyError) as e:
+            # O commit já foi feito: o arquivo fica órfão até rebuild_file_references
+            current_app.logger.warning(f'Erro ao remover arquivo {value}: {str(e)}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_released_files(session):
+    """Transação desfeita: nenhum arquivo liberado deve ser removido"""
+    session.info.pop(_PENDING_REMOVALS, None)
+
+
+def rebuild_file_references():
+    """
+    Recalcula FileReference a partir das colunas que referenciam arquivos
+    e remove do store os arquivos sem referência (uploads de transações
+    desfeitas, exclusões em massa).
+
+    Returns:
+        tuple: (arquivos referenciados, arquivos removidos do disco)
+    """
+    counts = {}
+    for columns in FILE_COLUMNS.values():
+        for column in columns:
+            for name, in db.session.query(column).filter(column.like(f'{STORE_FOLDER}/%')):
+                key = blob_key(name)
+                if key is not None:
+                    counts[key] = counts.get(key, 0) + 1
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    references = []
+    for key, count in counts.items():
+        path = os.path.join(upload_folder, key)
+        if os.path.exists(path):
+            references.append(dict(
+                filename=key,
+                reference_count=count,
+                file_size=os.path.getsize(path),
+                file_type=mimetypes.guess_type(path)[0]
+            ))
+
+    FileReference.query.delete()
+    if references:
+        db.session.execute(FileReference.__table__.insert(), references)
+    db.session.commit()
+
+    # Arquivos do store sem nenhuma referência
+    referenced = {os.path.splitext(os.path.basename(key))[0] for key in counts}
+    removed = 0
+    store_dir = os.path.join(upload_folder, STORE_FOLDER)
+    for directory, _, filenames in os.walk(store_dir):
+        for filename in filenames:
+            if filename.startswith('.upload-'):
+                continue
+            digest = re.match(r'[0-9a-f]{64}', filename)
+            if digest is None or digest.group(0) not in referenced:
+                os.remove(os.path.join(directory, filename))
+                removed += 1
+    return len(references), removed
+
+
+def migrate_legacy_uploads():
+    """
+    Move os uploads antigos (nomes com timestamp) para o store por conteúdo
+    e atualiza as colunas que os referenciam.
+
+    Imagens passam pelo processamento de save_image (miniaturas/WebP no
+    store); os arquivos antigos são removidos após o commit.
+
+    Returns:
+        int: Quantidade de referências migradas
+    """
+    from werkzeug.datastructures import FileStorage
+    from src.services.images import InvalidImageError, save_image
+
+    migrated = 0
+    for category, columns in FILE_COLUMNS.items():
+        for column in columns:
+            model = column.class_
+            records = model.query.filter(
+                column.isnot(None), column != '', ~column.like(f'{STORE_FOLDER}/%')
+            ).all()
+            for record in records:
+                name = getattr(record, column.key)
+                path = file_path(name, category)
+                if path is None or not os.path.isfile(path):
+                    continue
+
+                # Nome original sem o prefixo de timestamp dos uploads antigos
+                original_name = re.sub(r'^\d{8}_\d{6}_', '', name)
+                with open(path, 'rb') as stream:
+                    upload = FileStorage(stream, filename=original_name)
+                    if category == 'service_order':
+                        new_name = save_file(upload, keep_name=True)
+                    else:
+                        try:
+                            new_name = save_image(upload)
+                        except InvalidImageError:
+                            continue
+
+                release_file(name, category)
+                setattr(record, column.key, new_name)
+                migrated += 1
+
+    db.session.commit()
+    return migrated
@@ -0,0 +1,247 @@
+import os
+
+from flask import current_app, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+from src.services.file_delivery import IMAGE_URL_TTL, signed_url
+from src.services.file_store import LEGACY_FOLDERS, file_path, save_file, write_atomic
+
+# Formatos aceitos (formato do Pillow -> extensão gravada)
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Limite de pixels da imagem enviada (protege contra "bombas" de descompressão)
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Miniaturas quadradas geradas no upload (recorte central, como o
+# object-fit: cover usado nas listagens): rótulo -> lado em pixels
+THUMBNAIL_SIZES = {'sm': 64, 'md': 128, 'lg': 256}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# Rota protegida (login) que serve cada tipo de imagem. As páginas recebem
+# URLs assinadas (file_delivery), servidas sem passar pela rota a cada imagem;
+# a rota só é usada quando o arquivo não está no disco.
+IMAGE_KINDS = {
+    'logo': 'admin.serve_logo',
+    'profile': 'admin.serve_profile_picture',
+}
+
+
+class InvalidImageError(ValueError):
+    """Arquivo enviado não é uma imagem aceita"""
+
+
+def variant_filename(filename, size=None, webp=False):
+    """
+    Nome do arquivo derivado de uma imagem.
+
+    Args:
+        filename: Nome da imagem original
+        size: Rótulo da miniatura (THUMBNAIL_SIZES) ou None para o tamanho original
+        webp: Variante em WebP
+
+    Returns:
+        str: Ex.: logo.png -> logo_sm.png, logo_sm.webp ou logo.webp
+    """
+    stem, ext = os.path.splitext(filename)
+    if size:
+        stem = f'{stem}_{size}'
+    return stem + ('.webp' if webp else ext)
+
+
+def variant_paths(path):
+    """Caminhos de todos os arquivos derivados gerados para a imagem"""
+    paths = [variant_filename(path, webp=True)]
+    for size in THUMBNAIL_SIZES:
+        paths.append(variant_filename(path, size))
+        paths.append(variant_filename(path, size, webp=True))
+    # Original já em WebP: a variante de tamanho original é o próprio arquivo
+    return [candidate for candidate in paths if candidate != path]
+
+
+def _open_image(stream):
+    """
+    Abre e valida a imagem enviada.
+
+    Returns:
+        tuple: (imagem com orientação aplicada, formato do Pillow)
+
+    Raises:
+        InvalidImageError: Se não for uma imagem aceita
+    """
+    try:
+        image = Image.open(stream)
+        image_format = image.format
+        if image_format not in ALLOWED_FORMATS:
+            raise InvalidImageError('Formato de arquivo inválido! Use PNG, JPG, JPEG, GIF ou WEBP.')
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise InvalidImageError('Imagem muito grande!')
+        image.verify()
+
+        # verify() invalida a imagem: reabrir para decodificar
+        stream.seek(0)
+        image = Image.open(stream)
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImageError('Arquivo de imagem inválido ou corrompido!')
+
+    # Aplica a rotação do EXIF antes de descartar os metadados
+    image = ImageOps.exif_transpose(image)
+    return image, image_format
+
+
+def _prepare_mode(image, image_format):
+    """Converte o modo de cor para um aceito pelo formato de destino"""
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if image_format == 'JPEG':
+        return image.convert('RGB')
+    if image_format == 'GIF':
+        return image if image.mode in ('P', 'L') else image.convert('RGBA' if has_alpha else 'RGB')
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _save(image, path, image_format):
+    """Grava a imagem sem metadados (EXIF, ICC, comentários)"""
+    image = _prepare_mode(image, image_format)
+    if image_format == 'JPEG':
+        image.save(path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(path, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif image_format == 'PNG':
+        image.save(path, 'PNG', optimize=True)
+    else:
+        image.save(path, image_format)
+
+
+def save_image(file):
+    """
+    Valida e grava uma imagem enviada, gerando miniaturas e variantes WebP.
+
+    A imagem vai para o store endereçado por conteúdo: reenvios da mesma
+    imagem reutilizam o arquivo já processado. O original é regravado sem
+    metadados (apenas o primeiro quadro de GIFs animados) e as miniaturas
+    (THUMBNAIL_SIZES) são gravadas no formato original e em WebP, ao lado
+    dele.
+
+    Args:
+        file: FileStorage recebido em request.files
+
+    Returns:
+        str: Nome a guardar na coluna (liberar com file_store.release_file)
+
+    Raises:
+        InvalidImageError: Se o arquivo não for uma imagem aceita
+    """
+    image, image_format = _open_image(file.stream)
+
+    def write(path):
+        generate_variants(image, path, image_format)
+        # Original por último: sua existência indica que as variantes estão prontas
+        write_atomic(path, lambda temp_path: _save(image, temp_path, image_format))
+
+    return save_file(
+        file,
+        extension='.' + ALLOWED_FORMATS[image_format],
+        write=write,
+        file_type=Image.MIME.get(image_format)
+    )
+
+
+def generate_variants(image, path, image_format):
+    """
+    Gera as miniaturas e variantes WebP de uma imagem.
+
+    Args:
+        image: Imagem aberta (Pillow)
+        path: Caminho da imagem original
+        image_format: Formato do Pillow da imagem original
+    """
+    webp_path = variant_filename(path, webp=True)
+    if webp_path != path:
+        write_atomic(webp_path, lambda temp_path: _save(image, temp_path, 'WEBP'))
+
+    for size, pixels in THUMBNAIL_SIZES.items():
+        thumbnail = ImageOps.fit(image, (pixels, pixels), Image.Resampling.LANCZOS)
+        write_atomic(
+            variant_filename(path, size),
+            lambda temp_path: _save(thumbnail, temp_path, image_format)
+        )
+        write_atomic(
+            variant_filename(path, size, webp=True),
+            lambda temp_path: _save(thumbnail, temp_path, 'WEBP')
+        )
+
+
+def rebuild_image_variants(kind):
+    """
+    Gera as variantes que faltam para as imagens antigas (fora do store)
+    de um tipo.
+
+    Returns:
+        int: Quantidade de imagens processadas
+    """
+    directory = os.path.join(current_app.config['UPLOAD_FOLDER'], LEGACY_FOLDERS[kind])
+    if not os.path.isdir(directory):
+        return 0
+
+    paths = {os.path.join(directory, filename) for filename in os.listdir(directory)}
+    derived = {candidate for path in paths for candidate in variant_paths(path)}
+    processed = 0
+    for path in sorted(paths - derived):
+        if not os.path.isfile(path):
+            continue
+        if all(candidate in paths for candidate in variant_paths(path)):
+            continue
+        try:
+            with open(path, 'rb') as stream:
+                image, image_format = _open_image(stream)
+                generate_variants(image, path, image_format)
+        except InvalidImageError:
+            continue
+        processed += 1
+    return processed
+
+
+def _file_url(filename, kind):
+    path = file_path(filename, kind)
+    if path is not None and os.path.isfile(path):
+        return signed_url(path, ttl=IMAGE_URL_TTL)
+    return url_for(IMAGE_KINDS[kind], filename=filename)
+
+
+def _has_variant(filename, kind, size=None, webp=False):
+    path = file_path(filename, kind)
+    return path is not None and os.path.exists(variant_filename(path, size, webp))
+
+
+def image_url(filename, kind='logo', size=None):
+    """
+    URL da imagem no tamanho pedido (helper de template).
+
+    Imagens enviadas antes da geração de miniaturas não têm variantes:
+    nesse caso retorna a URL do original.
+
+    Args:
+        filename: Nome da imagem original
+        kind: 'logo' ou 'profile'
+        size: Rótulo de THUMBNAIL_SIZES ou None para o original
+    """
+    if size and _has_variant(filename, kind, size):
+        return _file_url(variant_filename(filename, size), kind)
+    return _file_url(filename, kind)
+
+
+def image_srcset(filename, kind='logo', webp=True):
+    """
+    Valor de srcset com as miniaturas disponíveis (helper de template).
+
+    Returns:
+        str: Ex.: ".../logo_sm.webp 64w, .../logo_md.webp 128w" ou '' se
+        a imagem não tiver miniaturas
+    """
+    entries = [
+        f'{_file_url(variant_filename(filename, size, webp), kind)} {pixels}w'
+        for size, pixels in THUMBNAIL_SIZES.items()
+        if _has_variant(filename, kind, size, webp)
+    ]
+    return ', '.join(entries)
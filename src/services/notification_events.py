@@ -0,0 +1,243 @@
+import json
+import queue
+import select
+import threading
+import time
+from types import SimpleNamespace
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+
+# Canal do LISTEN/NOTIFY no PostgreSQL
+PG_CHANNEL = 'notification_events'
+
+# Limite de payload do pg_notify (8000 bytes); mensagens longas são truncadas
+MAX_MESSAGE_LENGTH = 300
+
+
+class NotificationBroker:
+    """
+    Pub/sub em processo para os streams SSE.
+
+    Cada conexão SSE assina uma fila; os eventos são entregues apenas às
+    filas do usuário ou do público (user_type) de destino.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, user_id, user_type, limit=None):
+        """Assina os eventos; retorna None se já houver limit assinaturas abertas"""
+        subscription = (user_id, user_type, queue.Queue(maxsize=100))
+        with self._lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, payload):
+        user_ids = set(payload.get('user_ids') or [])
+        audience = payload.get('audience')
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for user_id, user_type, events in subscribers:
+            if user_id in user_ids or (audience and audience == user_type):
+                try:
+                    events.put_nowait(payload)
+                except queue.Full:
+                    # Cliente lento: descarta o evento, a contagem é recalculada no próximo
+                    pass
+
+
+broker = NotificationBroker()
+
+
+# ===== PUBLICAÇÃO =====
+
+def queue_notification_event(user_ids=None, audience=None, title=None, message=None):
+    """
+    Agenda um evento de notificação para ser publicado no commit da transação.
+
+    No PostgreSQL o evento é enviado com pg_notify na própria transação
+    (entregue a todos os workers do gunicorn somente após o COMMIT); nos
+    demais bancos fica pendente na sessão e é publicado no broker local.
+
+    Args:
+        user_ids: IDs dos destinatários diretos
+        audience: user_type dos destinatários (notificações em massa)
+        title: Título da notificação (None para eventos de leitura)
+        message: Mensagem da notificação
+    """
+    payload = {
+        'user_ids': list(user_ids or []),
+        'audience': audience,
+        'title': title,
+        'message': (message or '')[:MAX_MESSAGE_LENGTH] if title else None
+    }
+
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(
+            text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': PG_CHANNEL, 'payload': json.dumps(payload)}
+        )
+    else:
+        db.session.info.setdefault('pending_notification_events', []).append(payload)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    for payload in session.info.pop('pending_notification_events', []):
+        broker.publish(payload)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_events(session):
+    session.info.pop('pending_notification_events', None)
+
+
+# ===== LISTENER DO POSTGRESQL =====
+
+_listener_lock = threading.Lock()
+_listener_thread = None
+
+
+def _listen_postgres(engine):
+    """Repassa os NOTIFY do PostgreSQL para o broker local (uma thread por worker)"""
+    while True:
+        connection = None
+        try:
+            connection = engine.raw_connection()
+            connection.detach()
+            pg_connection = connection.dbapi_connection
+            pg_connection.autocommit = True
+            pg_connection.cursor().execute(f'LISTEN {PG_CHANNEL}')
+
+            while True:
+                if select.select([pg_connection], [], [], 30) == ([], [], []):
+                    continue
+                pg_connection.poll()
+                while pg_connection.notifies:
+                    notify = pg_connection.notifies.pop(0)
+                    try:
+                        broker.publish(json.loads(notify.payload))
+                    except ValueError:
+                        pass
+        except Exception:
+            # Conexão perdida: tenta novamente em instantes
+            time.sleep(5)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+
+def _ensure_listener():
+    """Inicia o listener do PostgreSQL no worker atual (após o fork do gunicorn)"""
+    global _listener_thread
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with _listener_lock:
+        if _listener_thread is None or not _listener_thread.is_alive():
+            _listener_thread = threading.Thread(
+                target=_listen_postgres,
+                args=(db.engine,),
+                name='notification-listener',
+                daemon=True
+            )
+            _listener_thread.start()
+
+
+# ===== STREAM SSE =====
+
+def _sse(event_name, data):
+    return f'event: {event_name}\ndata: {json.dumps(data)}\n\n'
+
+
+def _streams_unavailable():
+    """503: o EventSource desiste da conexão e a página volta ao polling"""
+    response = Response('Notificações em tempo real indisponíveis', status=503, mimetype='text/plain')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def notification_stream_response(user):
+    """
+    Resposta SSE com a contagem de não lidas e as novas notificações do usuário.
+
+    Cada stream aberto ocupa uma thread do gunicorn, então o worker aceita no
+    máximo SSE_MAX_STREAMS streams simultâneos. Acima do limite, ou num
+    servidor de uma thread por worker (gunicorn sync), a resposta é 503 e a
+    página passa a consultar a contagem por polling. O stream é encerrado
+    após SSE_STREAM_TIMEOUT segundos e o EventSource do navegador reconecta
+    sozinho. Comentários de keep-alive mantêm a conexão aberta em proxies.
+
+    Args:
+        user: Usuário logado
+
+    Returns:
+        Response: Resposta text/event-stream
+    """
+    from src.services.notifications import get_unread_count
+
+    if not current_app.config.get('NOTIFICATIONS_SSE'):
+        abort(404)
+
+    # Cópia simples do usuário: o stream não mantém a sessão do banco aberta
+    subscriber = SimpleNamespace(id=user.id, user_type=user.user_type, created_at=user.created_at)
+    stream_timeout = current_app.config.get('SSE_STREAM_TIMEOUT', 25)
+    keepalive_interval = current_app.config.get('SSE_KEEPALIVE_INTERVAL', 10)
+
+    # Worker de uma thread só: o stream bloquearia todas as outras requisições
+    if not request.environ.get('wsgi.multithread'):
+        return _streams_unavailable()
+
+    subscription = broker.subscribe(
+        subscriber.id, subscriber.user_type, limit=current_app.config.get('SSE_MAX_STREAMS')
+    )
+    if subscription is None:
+        return _streams_unavailable()
+    _ensure_listener()
+
+    def unread_event():
+        try:
+            return _sse('unread', {'count': get_unread_count(subscriber)})
+        finally:
+            # Devolve a conexão ao pool enquanto o stream aguarda eventos
+            db.session.rollback()
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            yield unread_event()
+
+            deadline = time.monotonic() + stream_timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    payload = subscription[2].get(timeout=min(keepalive_interval, remaining))
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                if payload.get('title'):
+                    yield _sse('notification', {'title': payload['title'], 'message': payload['message']})
+                yield unread_event()
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Libera a vaga mesmo se o cliente desconectar antes do primeiro evento
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Desativa o buffer do nginx
+    return response
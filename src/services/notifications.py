@@ -0,0 +1,355 @@
+from datetime import datetime
+import pytz
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, union_all
+from src.models.user import (
+    db, User, Notification, BroadcastNotification, NotificationReadState, BroadcastNotificationRead
+)
+from src.services.notification_events import queue_notification_event
+from src.services.pagination import keyset_paginate
+
+# Títulos das notificações que eram copiadas para todos os usuários de um tipo
+LEGACY_BROADCAST_TITLES = {
+    'Novo pedido aprovado': 'funcionario',
+    'Pedido Entregue': 'funcionario',
+    'Status de pedido alterado': 'admin',
+}
+
+
+def notify_users(user_ids, title, message):
+    """
+    Cria a mesma notificação para vários usuários com um único INSERT em lote.
+
+    A operação entra na transação corrente; o commit fica a cargo da rota.
+
+    Args:
+        user_ids: IDs dos destinatários
+        title: Título da notificação
+        message: Mensagem da notificação
+
+    Returns:
+        int: Quantidade de notificações criadas
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return 0
+
+    created_at = datetime.now(pytz.timezone("America/Sao_Paulo"))
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': user_id,
+            'title': title,
+            'message': message,
+            'read': False,
+            'created_at': created_at
+        }
+        for user_id in user_ids
+    ])
+    queue_notification_event(user_ids=user_ids, title=title, message=message)
+    return len(user_ids)
+
+
+def notify_user_type(user_type, title, message):
+    """
+    Notifica todos os usuários ativos de um tipo com uma única linha compartilhada.
+
+    Usuários inativos no momento do envio recebem um registro oculto em
+    BroadcastNotificationRead e não veem o aviso se forem reativados.
+
+    Args:
+        user_type: 'admin', 'funcionario' ou 'cliente'
+        title: Título da notificação
+        message: Mensagem da notificação
+
+    Returns:
+        BroadcastNotification: Notificação criada (ainda não commitada)
+    """
+    broadcast = BroadcastNotification(audience=user_type, title=title, message=message)
+    db.session.add(broadcast)
+
+    inactive_ids = [
+        user_id for (user_id,) in db.session.query(User.id).filter(
+            User.user_type == user_type,
+            User.is_active == False
+        )
+    ]
+    if inactive_ids:
+        db.session.flush()
+        db.session.execute(insert(BroadcastNotificationRead), [
+            {'user_id': user_id, 'broadcast_id': broadcast.id, 'hidden': True}
+            for user_id in inactive_ids
+        ])
+    queue_notification_event(audience=user_type, title=title, message=message)
+    return broadcast
+
+
+# ===== LEITURA =====
+
+def _read_cursor(user):
+    """Subconsulta escalar com o cursor de leitura do usuário no seu público (0 se não houver)"""
+    return func.coalesce(
+        select(NotificationReadState.last_read_id)
+        .where(
+            NotificationReadState.user_id == user.id,
+            NotificationReadState.audience == user.user_type
+        )
+        .scalar_subquery(),
+        0
+    )
+
+
+def _broadcast_read_rows(user, hidden=None):
+    """EXISTS dos registros de leitura do usuário para a notificação em massa da linha"""
+    query = select(BroadcastNotificationRead.broadcast_id).where(
+        BroadcastNotificationRead.user_id == user.id,
+        BroadcastNotificationRead.broadcast_id == BroadcastNotification.id
+    )
+    if hidden is not None:
+        query = query.where(BroadcastNotificationRead.hidden == hidden)
+    return query.exists()
+
+
+def _visible_broadcasts_filter(user):
+    """Filtro das notificações em massa destinadas ao usuário (lidas ou não)"""
+    criteria = [
+        BroadcastNotification.audience == user.user_type,
+        ~_broadcast_read_rows(user, hidden=True)
+    ]
+    # Usuários novos não herdam avisos anteriores ao cadastro
+    if user.created_at:
+        criteria.append(BroadcastNotification.created_at >= user.created_at)
+    return and_(*criteria)
+
+
+def _broadcast_read_expression(user):
+    """Expressão booleana: a notificação em massa está abaixo do cursor ou foi lida individualmente"""
+    return or_(
+        BroadcastNotification.id <= _read_cursor(user),
+        _broadcast_read_rows(user, hidden=False)
+    )
+
+
+def _unread_broadcasts_filter(user):
+    """Filtro das notificações em massa ainda não lidas pelo usuário"""
+    return and_(
+        _visible_broadcasts_filter(user),
+        BroadcastNotification.id > _read_cursor(user),
+        ~_broadcast_read_rows(user)
+    )
+
+
+def get_unread_count(user):
+    """
+    Conta as notificações não lidas (diretas e em massa) do usuário.
+
+    Args:
+        user: Usuário logado
+
+    Returns:
+        int: Quantidade de notificações não lidas
+    """
+    direct = select(func.count(Notification.id)).where(
+        Notification.user_id == user.id,
+        Notification.read == False
+    ).scalar_subquery()
+    broadcasts = select(func.count(BroadcastNotification.id)).where(
+        _unread_broadcasts_filter(user)
+    ).scalar_subquery()
+    return db.session.execute(select(direct + broadcasts)).scalar() or 0
+
+
+def paginate_notifications(user, cursor=None, per_page=15, unread_only=False):
+    """
+    Lista as notificações do usuário, mais recentes primeiro.
+
+    Cada item tem id, title, message, read, created_at e kind
+    ('direct' para Notification, 'broadcast' para BroadcastNotification).
+    As notificações em massa lidas (cursor ou leitura individual) continuam
+    na lista com read=True.
+
+    Args:
+        user: Usuário logado
+        cursor: Cursor da página (None = mais recentes)
+        per_page: Itens por página
+        unread_only: Lista só as não lidas (menu do sino)
+
+    Returns:
+        KeysetPagination: Página de notificações (linhas, não entidades)
+    """
+    direct = select(
+        Notification.id,
+        Notification.title,
+        Notification.message,
+        Notification.read,
+        Notification.created_at,
+        literal('direct').label('kind')
+    ).where(Notification.user_id == user.id)
+
+    if unread_only:
+        direct = direct.where(Notification.read == False)
+        broadcasts = select(
+            BroadcastNotification.id,
+            BroadcastNotification.title,
+            BroadcastNotification.message,
+            literal(False).label('read'),
+            BroadcastNotification.created_at,
+            literal('broadcast').label('kind')
+        ).where(_unread_broadcasts_filter(user))
+    else:
+        broadcasts = select(
+            BroadcastNotification.id,
+            BroadcastNotification.title,
+            BroadcastNotification.message,
+            case((_broadcast_read_expression(user), True), else_=False).label('read'),
+            BroadcastNotification.created_at,
+            literal('broadcast').label('kind')
+        ).where(_visible_broadcasts_filter(user))
+
+    feed = union_all(direct, broadcasts).subquery()
+
+    # ids de tabelas diferentes podem coincidir: kind entra na chave
+    return keyset_paginate(
+        db.session.query(feed),
+        [(feed.c.created_at, True), (feed.c.kind, True), (feed.c.id, True)],
+        cursor=cursor,
+        per_page=per_page,
+        total='approximate'
+    )
+
+
+# ===== MARCAR COMO LIDA =====
+
+def mark_broadcast_read(user, broadcast_id):
+    """
+    Marca uma notificação em massa como lida para o usuário.
+
+    Args:
+        user: Usuário logado
+        broadcast_id: ID da BroadcastNotification
+
+    Returns:
+        bool: False se a notificação não for destinada ao usuário
+    """
+    broadcast = db.session.get(BroadcastNotification, broadcast_id)
+    if not broadcast or broadcast.audience != user.user_type:
+        return False
+
+    read = db.session.get(BroadcastNotificationRead, (user.id, broadcast_id))
+    if read and read.hidden:
+        return False
+
+    state = db.session.get(NotificationReadState, (user.id, user.user_type))
+    cursor = state.last_read_id if state else 0
+    if broadcast_id > cursor and not read:
+        db.session.add(BroadcastNotificationRead(user_id=user.id, broadcast_id=broadcast_id))
+    queue_notification_event(user_ids=[user.id])
+    return True
+
+
+def mark_all_read(user):
+    """
+    Marca todas as notificações do usuário como lidas.
+
+    As notificações diretas são excluídas (comportamento original) e o
+    cursor das notificações em massa avança até a mais recente.
+
+    Args:
+        user: Usuário logado
+    """
+    Notification.query.filter_by(user_id=user.id).delete()
+
+    latest_id = db.session.query(func.max(BroadcastNotification.id)).filter(
+        BroadcastNotification.audience == user.user_type
+    ).scalar() or 0
+
+    state = db.session.get(NotificationReadState, (user.id, user.user_type))
+    if state is None:
+        state = NotificationReadState(user_id=user.id, audience=user.user_type, last_read_id=0)
+        db.session.add(state)
+    state.last_read_id = max(state.last_read_id or 0, latest_id)
+
+    # Leituras individuais abaixo do cursor não são mais necessárias (as ocultas ficam)
+    db.session.execute(delete(BroadcastNotificationRead).where(
+        BroadcastNotificationRead.user_id == user.id,
+        BroadcastNotificationRead.hidden == False,
+        BroadcastNotificationRead.broadcast_id.in_(
+            select(BroadcastNotification.id).where(
+                BroadcastNotification.audience == user.user_type,
+                BroadcastNotification.id <= state.last_read_id
+            )
+        )
+    ))
+    queue_notification_event(user_ids=[user.id])
+
+
+def delete_user_notifications(user_id):
+    """Remove notificações diretas e o estado de leitura de um usuário"""
+    Notification.query.filter_by(user_id=user_id).delete()
+    BroadcastNotificationRead.query.filter_by(user_id=user_id).delete()
+    NotificationReadState.query.filter_by(user_id=user_id).delete()
+
+
+def delete_all_notifications():
+    """Remove todas as notificações (diretas, em massa e estados de leitura)"""
+    BroadcastNotificationRead.query.delete()
+    NotificationReadState.query.delete()
+    BroadcastNotification.query.delete()
+    Notification.query.delete()
+
+
+# ===== MIGRAÇÃO =====
+
+def migrate_legacy_notifications():
+    """
+    Converte as cópias por usuário das notificações em massa em BroadcastNotification.
+
+    Cada grupo (título, mensagem) de LEGACY_BROADCAST_TITLES vira uma única
+    linha; usuários do público que já tinham excluído a cópia (lida) ganham
+    um registro em BroadcastNotificationRead.
+
+    Returns:
+        tuple: (notificações em massa criadas, linhas antigas removidas)
+    """
+    created = 0
+    removed = 0
+
+    for title, audience in LEGACY_BROADCAST_TITLES.items():
+        groups = db.session.query(
+            Notification.message,
+            func.min(Notification.created_at)
+        ).join(User, User.id == Notification.user_id).filter(
+            Notification.title == title,
+            User.user_type == audience
+        ).group_by(Notification.message).all()
+
+        audience_ids = set(
+            user_id for (user_id,) in db.session.query(User.id).filter(User.user_type == audience)
+        )
+
+        for message, created_at in groups:
+            rows = Notification.query.join(User, User.id == Notification.user_id).filter(
+                Notification.title == title,
+                Notification.message == message,
+                User.user_type == audience
+            ).all()
+
+            broadcast = BroadcastNotification(
+                audience=audience, title=title, message=message, created_at=created_at
+            )
+            db.session.add(broadcast)
+            db.session.flush()
+
+            # Quem não tem mais a cópia (ou já a tinha lida) leu o aviso
+            unread_ids = {row.user_id for row in rows if not row.read}
+            read_ids = audience_ids - unread_ids
+            if read_ids:
+                db.session.execute(insert(BroadcastNotificationRead), [
+                    {'user_id': user_id, 'broadcast_id': broadcast.id} for user_id in read_ids
+                ])
+
+            for row in rows:
+                db.session.delete(row)
+            created += 1
+            removed += len(rows)
+
+    db.session.commit()
+    return created, removed
@@ -0,0 +1,172 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
+from src.models.user import db, Order, OrderObservation, ServiceOrder, StatusHistory, service_order_employees
+
+
+def order_list_query(*criteria):
+    """
+    Query base para listagens de pedidos.
+
+    Carrega created_by e client no mesmo SELECT (JOIN), evitando uma
+    consulta extra por linha nos templates e em Order.to_dict().
+
+    Args:
+        *criteria: Filtros SQLAlchemy aplicados à query
+
+    Returns:
+        Query: Query de Order pronta para ordenação/paginação
+    """
+    return Order.query.options(
+        joinedload(Order.created_by),
+        joinedload(Order.client)
+    ).filter(*criteria)
+
+
+def service_order_list_query(*criteria):
+    """
+    Query base para listagens de ordens de serviço.
+
+    Faz JOIN com o pedido (permitindo filtrar por colunas de Order) e
+    carrega o pedido, os criadores e os funcionários atribuídos de uma vez.
+
+    Args:
+        *criteria: Filtros SQLAlchemy aplicados à query
+
+    Returns:
+        Query: Query de ServiceOrder pronta para ordenação/paginação
+    """
+    return ServiceOrder.query.join(ServiceOrder.order).options(
+        contains_eager(ServiceOrder.order).joinedload(Order.created_by),
+        joinedload(ServiceOrder.created_by),
+        selectinload(ServiceOrder.assigned_employees)
+    ).filter(*criteria)
+
+
+def get_service_orders_by_order(order_ids):
+    """
+    Busca as ordens de serviço dos pedidos informados em uma única consulta.
+
+    Args:
+        order_ids: IDs dos pedidos da página
+
+    Returns:
+        dict: {order_id: ServiceOrder}
+    """
+    if not order_ids:
+        return {}
+    service_orders = ServiceOrder.query.options(
+        selectinload(ServiceOrder.assigned_employees)
+    ).filter(ServiceOrder.order_id.in_(order_ids)).all()
+    return {so.order_id: so for so in service_orders}
+
+
+def is_service_order_assignee(service_order_id, user_id):
+    """
+    Verifica se o funcionário está atribuído à ordem de serviço.
+
+    Consulta só a tabela de associação, sem carregar a lista de
+    funcionários da ordem.
+    """
+    return db.session.query(
+        select(service_order_employees.c.user_id).where(
+            service_order_employees.c.service_order_id == service_order_id,
+            service_order_employees.c.user_id == user_id
+        ).exists()
+    ).scalar()
+
+
+def get_observation_counts(order_ids):
+    """
+    Conta as observações dos pedidos informados em uma única consulta.
+
+    Args:
+        order_ids: IDs dos pedidos da página
+
+    Returns:
+        dict: {order_id: quantidade de observações}
+    """
+    if not order_ids:
+        return {}
+    rows = db.session.query(
+        OrderObservation.order_id,
+        func.count(OrderObservation.id)
+    ).filter(OrderObservation.order_id.in_(order_ids)).group_by(OrderObservation.order_id).all()
+    return dict(rows)
+
+
+def get_status_history_by_order(order_ids):
+    """
+    Busca o histórico de status dos pedidos informados em uma única consulta.
+
+    Args:
+        order_ids: IDs dos pedidos da página
+
+    Returns:
+        dict: {order_id: [StatusHistory, ...]} em ordem cronológica
+    """
+    history_by_order = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return history_by_order
+    entries = StatusHistory.query.options(
+        joinedload(StatusHistory.user)
+    ).filter(StatusHistory.order_id.in_(order_ids)).order_by(
+        StatusHistory.created_at, StatusHistory.id
+    ).all()
+    for entry in entries:
+        history_by_order[entry.order_id].append(entry)
+    return history_by_order
+
+
+def get_latest_observations(order_ids, limit=3):
+    """
+    Busca as últimas observações de cada pedido informado em uma única consulta.
+
+    Usa ROW_NUMBER() OVER (PARTITION BY order_id ORDER BY created_at DESC);
+    em SQLite sem funções de janela (< 3.25) usa uma subconsulta correlacionada
+    com LIMIT. Ambas aproveitam o índice (order_id, created_at).
+
+    Args:
+        order_ids: IDs dos pedidos da página
+        limit: Quantidade de observações por pedido
+
+    Returns:
+        dict: {order_id: [OrderObservation, ...]} em ordem cronológica
+    """
+    observations_by_order = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return observations_by_order
+
+    dialect = db.session.get_bind().dialect
+    if dialect.name == 'sqlite' and (dialect.server_version_info or (0,)) < (3, 25):
+        newer = aliased(OrderObservation)
+        latest_ids = select(newer.id).where(
+            newer.order_id == OrderObservation.order_id
+        ).order_by(newer.created_at.desc(), newer.id.desc()).limit(limit).correlate(OrderObservation)
+    else:
+        ranked = select(
+            OrderObservation.id,
+            func.row_number().over(
+                partition_by=OrderObservation.order_id,
+                order_by=(OrderObservation.created_at.desc(), OrderObservation.id.desc())
+            ).label('position')
+        ).where(OrderObservation.order_id.in_(order_ids)).subquery()
+        latest_ids = select(ranked.c.id).where(ranked.c.position <= limit)
+
+    observations = OrderObservation.query.options(
+        joinedload(OrderObservation.author)
+    ).filter(
+        OrderObservation.order_id.in_(order_ids),
+        OrderObservation.id.in_(latest_ids)
+    ).order_by(
+        OrderObservation.created_at, OrderObservation.id
+    ).all()
+    for observation in observations:
+        observations_by_order[observation.order_id].append(observation)
+    return observations_by_order
+
+
+# Chaves de ordenação para paginação por cursor (a última coluna é única)
+ORDER_CREATED_KEYS = [(Order.created_at, True), (Order.id, True)]
+ORDER_DELIVERED_KEYS = [(Order.delivered_at, True), (Order.id, True)]
+ORDER_DELIVERY_DATE_KEYS = [(Order.delivery_date, False), (Order.id, False)]
+SERVICE_ORDER_CREATED_KEYS = [(ServiceOrder.created_at, True), (ServiceOrder.id, True)]
@@ -0,0 +1,284 @@
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.orm import Session
+from src.models.user import db, User, Order, OrderStatusCounter
+from src.services.notifications import get_unread_count
+
+# Escopo do contador global na tabela order_status_counter
+GLOBAL_SCOPE = 0
+
+# Colunas de Order que determinam em qual contador o pedido é contado
+TRACKED_ATTRIBUTES = ('status', 'approved', 'is_urgent', 'client_id')
+
+
+class OrderStatusCounts:
+    """
+    Contadores de pedidos agrupados por (status, approved, is_urgent).
+
+    Todos os totais dos dashboards são derivados destes grupos em memória,
+    sem novas consultas ao banco.
+    """
+
+    def __init__(self, rows):
+        self._buckets = {}
+        for status, approved, is_urgent, count in rows:
+            key = (status, bool(approved), bool(is_urgent))
+            self._buckets[key] = self._buckets.get(key, 0) + count
+
+    def count(self, statuses=None, exclude=None, approved=None, is_urgent=None):
+        """
+        Soma os grupos que atendem aos filtros informados.
+
+        Args:
+            statuses: Lista de status aceitos (padrão: todos)
+            exclude: Lista de status ignorados
+            approved: Filtrar por aprovação (True/False) ou None para ambos
+            is_urgent: Filtrar por urgência (True/False) ou None para ambos
+
+        Returns:
+            int: Quantidade de pedidos
+        """
+        total = 0
+        for (status, bucket_approved, bucket_urgent), count in self._buckets.items():
+            if statuses is not None and status not in statuses:
+                continue
+            if exclude is not None and status in exclude:
+                continue
+            if approved is not None and bucket_approved != approved:
+                continue
+            if is_urgent is not None and bucket_urgent != is_urgent:
+                continue
+            total += count
+        return total
+
+    def by_status(self, approved=None):
+        """
+        Retorna a lista de (status, quantidade) ordenada por status.
+
+        Args:
+            approved: Filtrar por aprovação (True/False) ou None para ambos
+
+        Returns:
+            list: Tuplas (status, count) com quantidade maior que zero
+        """
+        totals = {}
+        for (status, bucket_approved, _), count in self._buckets.items():
+            if approved is not None and bucket_approved != approved:
+                continue
+            totals[status] = totals.get(status, 0) + count
+        return [(status, count) for status, count in sorted(totals.items()) if count > 0]
+
+
+def get_order_status_counts(client_id=None):
+    """
+    Lê os contadores materializados de pedidos.
+
+    Args:
+        client_id: ID do cliente para contadores por cliente (padrão: global)
+
+    Returns:
+        OrderStatusCounts: Contadores agrupados
+    """
+    rows = db.session.query(
+        OrderStatusCounter.status,
+        OrderStatusCounter.approved,
+        OrderStatusCounter.is_urgent,
+        OrderStatusCounter.count
+    ).filter(OrderStatusCounter.client_id == (client_id or GLOBAL_SCOPE)).all()
+    return OrderStatusCounts(rows)
+
+
+def get_admin_dashboard_counters():
+    """Contadores exibidos no dashboard do admin"""
+    counts = get_order_status_counts()
+    employees = db.session.query(func.count(User.id)).filter(
+        User.user_type == 'funcionario',
+        User.is_active == True
+    ).scalar()
+
+    return {
+        # Total excluindo entregues
+        'total_orders': counts.count(exclude=['entregue']),
+        'pending_orders': counts.count(approved=False),
+        'in_production': counts.count(statuses=['em_producao']),
+        'delivered_orders': counts.count(statuses=['entregue']),
+        'employees': employees
+    }
+
+
+def get_employee_dashboard_counters(user):
+    """Contadores exibidos no dashboard do funcionário"""
+    counts = get_order_status_counts()
+    unread_notifications = get_unread_count(user)
+
+    return {
+        'in_production': counts.count(statuses=['em_producao'], approved=True),
+        'ready_orders': counts.count(statuses=['pronto'], approved=True),
+        # Total aprovados excluindo entregues
+        'total_approved': counts.count(exclude=['entregue'], approved=True),
+        'urgent_orders': counts.count(
+            statuses=['aprovado', 'em_producao', 'pronto'],
+            approved=True,
+            is_urgent=True
+        ),
+        'unread_notifications': unread_notifications
+    }
+
+
+# ===== MANUTENÇÃO DOS CONTADORES =====
+
+def _counter_keys(order, old=False):
+    """
+    Retorna as chaves de contador (escopo, status, approved, is_urgent) do pedido.
+
+    Args:
+        order: Instância de Order
+        old: Usar os valores anteriores à alteração pendente
+
+    Returns:
+        list: Chave global e, se houver cliente, a chave do cliente
+    """
+    state = inspect(order)
+    values = {}
+    for attr in TRACKED_ATTRIBUTES:
+        history = state.attrs[attr].history
+        if history.has_changes():
+            if old:
+                values[attr] = history.deleted[0] if history.deleted else None
+            else:
+                values[attr] = history.added[0] if history.added else None
+        else:
+            values[attr] = getattr(order, attr)
+
+    # Valores padrão das colunas ainda não aplicados em pedidos novos
+    bucket = (
+        values['status'] or 'pendente',
+        bool(values['approved']),
+        bool(values['is_urgent'])
+    )
+    keys = [(GLOBAL_SCOPE,) + bucket]
+    if values['client_id']:
+        keys.append((values['client_id'],) + bucket)
+    return keys
+
+
+def _apply_counter_deltas(connection, deltas):
+    """Aplica as variações de contadores via UPSERT na transação corrente"""
+    table = OrderStatusCounter.__table__
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    for (client_id, status, approved, is_urgent), delta in deltas.items():
+        if delta == 0:
+            continue
+
+        if insert is not None:
+            stmt = insert(table).values(
+                client_id=client_id,
+                status=status,
+                approved=approved,
+                is_urgent=is_urgent,
+                count=delta
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['client_id', 'status', 'approved', 'is_urgent'],
+                set_={'count': table.c.count + stmt.excluded.count}
+            )
+            connection.execute(stmt)
+            continue
+
+        # Outros bancos: UPDATE e, se não existir, INSERT
+        result = connection.execute(
+            update(table).where(
+                table.c.client_id == client_id,
+                table.c.status == status,
+                table.c.approved == approved,
+                table.c.is_urgent == is_urgent
+            ).values(count=table.c.count + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(
+                client_id=client_id,
+                status=status,
+                approved=approved,
+                is_urgent=is_urgent,
+                count=delta
+            ))
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_order_counters(session, flush_context, instances):
+    """Mantém order_status_counter em sincronia com as alterações de Order"""
+    deltas = {}
+
+    def add(keys, amount):
+        for key in keys:
+            deltas[key] = deltas.get(key, 0) + amount
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(_counter_keys(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order) and obj not in session.deleted:
+            old_keys = _counter_keys(obj, old=True)
+            new_keys = _counter_keys(obj)
+            if old_keys != new_keys:
+                add(old_keys, -1)
+                add(new_keys, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            add(_counter_keys(obj, old=True), -1)
+
+    if any(deltas.values()):
+        _apply_counter_deltas(session.connection(), deltas)
+
+
+# Carrega o valor anterior ao alterar os atributos, mesmo após expirar a sessão
+for _attr in TRACKED_ATTRIBUTES:
+    event.listen(getattr(Order, _attr), 'set', lambda *args: None, active_history=True)
+
+
+def rebuild_order_status_counters():
+    """
+    Reconstrói a tabela order_status_counter a partir da tabela order.
+
+    Returns:
+        int: Quantidade de linhas de contador gravadas
+    """
+    status_col = func.coalesce(Order.status, 'pendente')
+    approved_col = func.coalesce(Order.approved, False)
+    urgent_col = func.coalesce(Order.is_urgent, False)
+
+    global_rows = db.session.query(
+        status_col, approved_col, urgent_col, func.count(Order.id)
+    ).group_by(status_col, approved_col, urgent_col).all()
+
+    client_rows = db.session.query(
+        Order.client_id, status_col, approved_col, urgent_col, func.count(Order.id)
+    ).filter(Order.client_id.isnot(None)).group_by(
+        Order.client_id, status_col, approved_col, urgent_col
+    ).all()
+
+    counters = [
+        {'client_id': GLOBAL_SCOPE, 'status': status, 'approved': bool(approved),
+         'is_urgent': bool(is_urgent), 'count': count}
+        for status, approved, is_urgent, count in global_rows
+    ]
+    counters += [
+        {'client_id': client_id, 'status': status, 'approved': bool(approved),
+         'is_urgent': bool(is_urgent), 'count': count}
+        for client_id, status, approved, is_urgent, count in client_rows
+    ]
+
+    OrderStatusCounter.query.delete()
+    if counters:
+        db.session.execute(OrderStatusCounter.__table__.insert(), counters)
+    db.session.commit()
+    return len(counters)
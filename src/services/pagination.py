@@ -0,0 +1,194 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+from src.models.user import db
+
+
+def _encode_value(value):
+    """Converte um valor de chave para JSON, preservando datas"""
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    """Inverso de _encode_value"""
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('Valor de cursor inválido')
+    return value
+
+
+def encode_cursor(direction, values):
+    """
+    Gera um cursor opaco para a URL.
+
+    Args:
+        direction: 'next' (itens após a chave) ou 'prev' (itens antes)
+        values: Valores das colunas de ordenação do item de referência
+
+    Returns:
+        str: Cursor em base64 (seguro para URL)
+    """
+    payload = json.dumps([direction[0], [_encode_value(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Lê um cursor gerado por encode_cursor.
+
+    Args:
+        cursor: Cursor recebido na URL
+        size: Quantidade esperada de colunas de ordenação
+
+    Returns:
+        tuple: (direction, values)
+
+    Raises:
+        ValueError: Se o cursor for inválido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError('Cursor inválido')
+    if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != size:
+        raise ValueError('Cursor inválido')
+    return ('next' if direction == 'n' else 'prev'), [_decode_value(value) for value in values]
+
+
+def _keyset_condition(keys, values, reverse):
+    """
+    Condição "depois da chave" na ordenação informada (comparação lexicográfica).
+
+    (a, b) depois de (va, vb) em ordem decrescente: a < va OR (a = va AND b < vb)
+    """
+    clauses = []
+    for position, (column, descending) in enumerate(keys):
+        if descending != reverse:
+            comparison = column < values[position]
+        else:
+            comparison = column > values[position]
+        equal_prefix = [keys[index][0] == values[index] for index in range(position)]
+        clauses.append(and_(*equal_prefix, comparison))
+    return or_(*clauses)
+
+
+def approximate_count(query):
+    """
+    Total aproximado de linhas da consulta.
+
+    Usa a estimativa do planejador do PostgreSQL (EXPLAIN), sem percorrer
+    a tabela. Os demais bancos não têm estimativa equivalente e um COUNT(*)
+    percorreria a tabela inteira, então o total é omitido.
+
+    Args:
+        query: Query sem ORDER BY/LIMIT
+
+    Returns:
+        int: Total estimado (None fora do PostgreSQL)
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        compiled = query.statement.compile(dialect=connection.dialect)
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return None
+
+
+class KeysetPagination:
+    """
+    Página obtida por keyset (cursor) em vez de OFFSET.
+
+    Atributos: items, per_page, has_next, has_prev, next_cursor,
+    prev_cursor e total (None quando não solicitado).
+    """
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=10, total=None):
+    """
+    Pagina uma consulta pelas colunas de ordenação, sem COUNT nem OFFSET.
+
+    O custo de cada página independe da profundidade: a posição é dada
+    pelos valores da chave do último (ou primeiro) item exibido. A última
+    coluna da chave deve ser única (normalmente o id).
+
+    Args:
+        query: Query com os filtros (a ordenação é definida aqui)
+        keys: Lista de (coluna, decrescente) que define a ordenação
+        cursor: Cursor recebido na URL (None ou inválido = primeira página)
+        per_page: Itens por página
+        total: Total conhecido (int), 'approximate' para estimar (só no
+               PostgreSQL; nos demais bancos fica None) ou None
+
+    Returns:
+        KeysetPagination: Página de itens
+    """
+    direction, values = 'next', None
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor, len(keys))
+        except ValueError:
+            direction, values = 'next', None
+
+    reverse = direction == 'prev'
+    page_query = query.order_by(None)
+    if values is not None:
+        page_query = page_query.filter(_keyset_condition(keys, values, reverse))
+    page_query = page_query.order_by(*[
+        column.desc() if descending != reverse else column.asc()
+        for column, descending in keys
+    ])
+
+    items = page_query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if reverse:
+        items.reverse()
+
+    if reverse:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = values is not None, has_more
+
+    def key_of(item):
+        return [getattr(item, column.key) for column, _ in keys]
+
+    next_cursor = encode_cursor('next', key_of(items[-1])) if has_next and items else None
+    prev_cursor = encode_cursor('prev', key_of(items[0])) if has_prev and items else None
+
+    if total == 'approximate':
+        total = approximate_count(query.order_by(None))
+
+    return KeysetPagination(
+        items=items,
+        per_page=per_page,
+        has_next=has_next and next_cursor is not None,
+        has_prev=has_prev and prev_cursor is not None,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        total=total
+    )
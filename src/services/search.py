@@ -0,0 +1,280 @@
+import re
+import unicodedata
+
+from sqlalchemy import bindparam, event, inspect, select, text
+from sqlalchemy.orm import Session
+from src.models.user import db, User, Order, OrderObservation
+from src.services.serializers import order_serializer
+
+# Configuração de idioma do full-text search no PostgreSQL
+SEARCH_CONFIG = 'portuguese'
+
+# Limites da busca: termos considerados e profundidade da paginação
+MAX_TERMS = 8
+MAX_PER_PAGE = 50
+MAX_PAGE = 20
+
+# Pedidos reindexados por lote na reconstrução
+REBUILD_BATCH_SIZE = 500
+
+# Colunas de Order que fazem parte do documento de busca
+INDEXED_ATTRIBUTES = ('company_name', 'subtitle', 'description', 'client_id')
+
+
+def normalize_search_text(value):
+    """Remove acentos e caixa para indexar e buscar do mesmo jeito"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def parse_search_terms(query):
+    """
+    Extrai os termos de busca digitados.
+
+    Apenas letras e dígitos são mantidos, o que evita injetar operadores
+    nas sintaxes de consulta do PostgreSQL e do FTS5.
+
+    Returns:
+        list: Termos normalizados (no máximo MAX_TERMS)
+    """
+    return re.findall(r'\w+', normalize_search_text(query))[:MAX_TERMS]
+
+
+def _is_postgresql(connection):
+    return connection.dialect.name == 'postgresql'
+
+
+def ensure_search_index():
+    """
+    Cria a estrutura do índice de busca se ainda não existir.
+
+    PostgreSQL: tabela order_search com coluna tsvector e índice GIN.
+    SQLite: tabela virtual FTS5 order_search (rowid = id do pedido).
+
+    Returns:
+        bool: True se a estrutura foi criada agora (índice vazio)
+    """
+    with db.engine.begin() as connection:
+        if _is_postgresql(connection):
+            exists = connection.execute(text("SELECT to_regclass('order_search')")).scalar() is not None
+            if not exists:
+                connection.execute(text(
+                    'CREATE TABLE order_search ('
+                    'order_id INTEGER PRIMARY KEY, '
+                    'document TSVECTOR NOT NULL)'
+                ))
+                connection.execute(text(
+                    'CREATE INDEX ix_order_search_document ON order_search USING GIN (document)'
+                ))
+        else:
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'order_search'"
+            )).first() is not None
+            if not exists:
+                connection.execute(text(
+                    'CREATE VIRTUAL TABLE order_search USING fts5('
+                    'company_name, subtitle, cnpj, description, observations, '
+                    "tokenize = 'unicode61 remove_diacritics 2')"
+                ))
+    return not exists
+
+
+def _search_documents(connection, order_ids):
+    """
+    Monta o texto indexado de cada pedido.
+
+    Returns:
+        dict: {order_id: {campo: texto normalizado}}
+    """
+    documents = {}
+    rows = connection.execute(
+        select(Order.id, Order.company_name, Order.subtitle, Order.description, User.cnpj)
+        .outerjoin(User, User.id == Order.client_id)
+        .where(Order.id.in_(order_ids))
+    )
+    for order_id, company_name, subtitle, description, cnpj in rows:
+        # CNPJ indexado também só com dígitos (busca sem pontuação)
+        digits = re.sub(r'\D', '', cnpj or '')
+        documents[order_id] = {
+            'company_name': normalize_search_text(company_name),
+            'subtitle': normalize_search_text(subtitle),
+            'cnpj': f'{cnpj or ""} {digits}'.strip(),
+            'description': normalize_search_text(description),
+            'observations': [],
+        }
+
+    if documents:
+        observations = connection.execute(
+            select(OrderObservation.order_id, OrderObservation.content)
+            .where(OrderObservation.order_id.in_(list(documents)))
+            .order_by(OrderObservation.order_id, OrderObservation.id)
+        )
+        for order_id, content in observations:
+            documents[order_id]['observations'].append(normalize_search_text(content))
+
+    for document in documents.values():
+        document['observations'] = '\n'.join(document['observations'])
+    return documents
+
+
+def refresh_order_search(connection, order_ids):
+    """
+    Regrava o documento de busca dos pedidos na transação corrente.
+
+    Pedidos que não existem mais são removidos do índice.
+
+    Args:
+        connection: Conexão da sessão (ou engine) em uso
+        order_ids: IDs dos pedidos alterados
+    """
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return
+
+    key = 'order_id' if _is_postgresql(connection) else 'rowid'
+    connection.execute(
+        text(f'DELETE FROM order_search WHERE {key} IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': order_ids}
+    )
+
+    documents = _search_documents(connection, order_ids)
+    if not documents:
+        return
+
+    rows = [dict(document, order_id=order_id) for order_id, document in documents.items()]
+    if _is_postgresql(connection):
+        connection.execute(text(
+            'INSERT INTO order_search (order_id, document) VALUES (:order_id, '
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', :company_name), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', :subtitle || ' ' || :cnpj), 'B') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', :description), 'C') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', :observations), 'D'))"
+        ), rows)
+    else:
+        connection.execute(text(
+            'INSERT INTO order_search (rowid, company_name, subtitle, cnpj, description, observations) '
+            'VALUES (:order_id, :company_name, :subtitle, :cnpj, :description, :observations)'
+        ), rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_search_documents(session, flush_context):
+    """Reindexa os pedidos afetados pelo flush (pedido, observações ou CNPJ do cliente)"""
+    order_ids = set()
+    client_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            order_ids.add(obj.id)
+        elif isinstance(obj, OrderObservation):
+            order_ids.add(obj.order_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in INDEXED_ATTRIBUTES):
+                order_ids.add(obj.id)
+        elif isinstance(obj, OrderObservation):
+            history = inspect(obj).attrs.order_id.history
+            order_ids.update(value for value in history.deleted if value is not None)
+            order_ids.add(obj.order_id)
+        elif isinstance(obj, User) and inspect(obj).attrs.cnpj.history.has_changes():
+            client_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            order_ids.add(obj.id)
+        elif isinstance(obj, OrderObservation):
+            order_ids.add(obj.order_id)
+
+    connection = session.connection()
+    if client_ids:
+        order_ids.update(connection.execute(
+            select(Order.id).where(Order.client_id.in_(client_ids))
+        ).scalars())
+
+    order_ids.discard(None)
+    if order_ids:
+        refresh_order_search(connection, order_ids)
+
+
+def rebuild_search_index():
+    """
+    Reconstrói o índice de busca a partir das tabelas order e order_observation.
+
+    Returns:
+        int: Quantidade de pedidos indexados
+    """
+    ensure_search_index()
+    connection = db.session.connection()
+    connection.execute(text('DELETE FROM order_search'))
+
+    order_ids = [order_id for order_id, in db.session.query(Order.id).order_by(Order.id)]
+    for index in range(0, len(order_ids), REBUILD_BATCH_SIZE):
+        refresh_order_search(connection, order_ids[index:index + REBUILD_BATCH_SIZE])
+
+    db.session.commit()
+    return len(order_ids)
+
+
+def search_orders(query, page=1, per_page=20):
+    """
+    Busca pedidos por empresa, subtítulo, descrição, CNPJ do cliente e
+    observações, ordenados por relevância.
+
+    Cada termo é buscado por prefixo e todos precisam estar presentes.
+    Usa o índice GIN (PostgreSQL) ou FTS5 (SQLite), sem LIKE na tabela
+    de pedidos.
+
+    Args:
+        query: Texto digitado
+        page: Página (1 em diante, até MAX_PAGE)
+        per_page: Resultados por página (até MAX_PER_PAGE)
+
+    Returns:
+        dict: query, page, per_page, has_next e results (pedidos no formato
+        de Order.to_dict() com 'rank')
+    """
+    page = min(max(page, 1), MAX_PAGE)
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    result = {'query': query, 'page': page, 'per_page': per_page, 'has_next': False, 'results': []}
+
+    terms = parse_search_terms(query)
+    if not terms:
+        return result
+
+    connection = db.session.connection()
+    params = {'limit': per_page + 1, 'offset': (page - 1) * per_page}
+    if _is_postgresql(connection):
+        params['query'] = ' & '.join(f'{term}:*' for term in terms)
+        stmt = text(
+            'SELECT s.order_id, ts_rank(s.document, q.query) AS rank '
+            'FROM order_search s JOIN "order" o ON o.id = s.order_id '
+            f"CROSS JOIN to_tsquery('{SEARCH_CONFIG}', :query) AS q(query) "
+            'WHERE s.document @@ q.query '
+            'ORDER BY rank DESC, s.order_id DESC LIMIT :limit OFFSET :offset'
+        )
+    else:
+        params['query'] = ' '.join(f'"{term}"*' for term in terms)
+        # bm25 é negativo (menor = mais relevante); pesos por coluna
+        stmt = text(
+            'SELECT order_search.rowid, -bm25(order_search, 10.0, 5.0, 5.0, 2.0, 1.0) AS rank '
+            'FROM order_search JOIN "order" o ON o.id = order_search.rowid '
+            'WHERE order_search MATCH :query '
+            'ORDER BY rank DESC, order_search.rowid DESC LIMIT :limit OFFSET :offset'
+        )
+
+    ranked = connection.execute(stmt, params).all()
+    result['has_next'] = len(ranked) > per_page
+    ranked = ranked[:per_page]
+    if not ranked:
+        return result
+
+    ranks = {order_id: float(rank) for order_id, rank in ranked}
+    orders = {item['id']: item for item in order_serializer.all(Order.id.in_(list(ranks)))}
+    for order_id, rank in ranks.items():
+        if order_id in orders:
+            result['results'].append(dict(orders[order_id], rank=round(rank, 6)))
+    return result
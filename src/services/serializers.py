@@ -0,0 +1,193 @@
+import json
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from src.models.user import db, User, Order, ServiceOrder, service_order_employees
+
+# Linhas lidas do banco por lote ao transmitir respostas grandes
+STREAM_BATCH_SIZE = 500
+
+
+def _json_value(value):
+    """Converte valores de coluna para tipos aceitos pelo JSON"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_json_array(items):
+    """
+    Gera um array JSON em pedaços, um item por vez.
+
+    Args:
+        items: Iterável de dicionários
+
+    Yields:
+        str: Pedaços do documento JSON
+    """
+    yield '['
+    first = True
+    for item in items:
+        if not first:
+            yield ','
+        yield json.dumps(item, ensure_ascii=False, default=_json_value)
+        first = False
+    yield ']'
+
+
+def json_array_response(items):
+    """Resposta HTTP que transmite um array JSON sem montá-lo em memória"""
+    return Response(stream_with_context(iter_json_array(items)), mimetype='application/json')
+
+
+class RowSerializer:
+    """
+    Serializa linhas projetadas (Row) sem instanciar objetos ORM.
+
+    Cada campo é uma coluna (ou expressão) do SELECT; os relacionamentos
+    necessários são resolvidos com JOINs na própria consulta. Coleções
+    (muitos-para-muitos) são carregadas por lote com uma consulta IN.
+    """
+
+    def __init__(self, base, fields, joins=(), collections=None):
+        """
+        Args:
+            base: Entidade principal (FROM)
+            fields: Lista de (chave, coluna); a primeira deve ser o id
+            joins: Lista de (alvo, condição) para LEFT OUTER JOIN
+            collections: Dict chave -> função(ids) que retorna {id: lista}
+        """
+        self.base = base
+        self.fields = fields
+        self.joins = joins
+        self.collections = collections or {}
+        self.keys = [key for key, _ in fields]
+
+    def select(self, *criteria):
+        """Monta o SELECT projetado, com os JOINs e filtros informados"""
+        stmt = select(*[column.label(key) for key, column in self.fields]).select_from(self.base)
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+        return stmt.where(*criteria)
+
+    def to_dict(self, row):
+        """Converte uma linha projetada em dicionário"""
+        return {key: _json_value(value) for key, value in zip(self.keys, row)}
+
+    def iter_dicts(self, stmt, batch_size=STREAM_BATCH_SIZE):
+        """
+        Executa o SELECT e gera os dicionários lote a lote.
+
+        Args:
+            stmt: SELECT montado por select()
+            batch_size: Linhas buscadas por lote
+
+        Yields:
+            dict: Um registro serializado por linha
+        """
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            items = [self.to_dict(row) for row in rows]
+            if self.collections:
+                ids = [item['id'] for item in items]
+                for key, loader in self.collections.items():
+                    values = loader(ids)
+                    for item in items:
+                        item[key] = values.get(item['id'], [])
+            yield from items
+
+    def all(self, *criteria):
+        """Lista de dicionários (para respostas pequenas)"""
+        return list(self.iter_dicts(self.select(*criteria)))
+
+    def first(self, *criteria):
+        """Primeiro registro ou None"""
+        for item in self.iter_dicts(self.select(*criteria).limit(1)):
+            return item
+        return None
+
+    def response(self, *criteria, order_by=None):
+        """Resposta JSON transmitida com todos os registros do filtro"""
+        stmt = self.select(*criteria)
+        if order_by is not None:
+            stmt = stmt.order_by(order_by)
+        return json_array_response(self.iter_dicts(stmt))
+
+
+def _assigned_employee_names(service_order_ids):
+    """Usernames dos funcionários atribuídos, por ordem de serviço"""
+    names = {}
+    if not service_order_ids:
+        return names
+
+    rows = db.session.execute(
+        select(service_order_employees.c.service_order_id, User.username)
+        .join(User, User.id == service_order_employees.c.user_id)
+        .where(service_order_employees.c.service_order_id.in_(service_order_ids))
+        .order_by(service_order_employees.c.service_order_id, User.username)
+    )
+    for service_order_id, username in rows:
+        names.setdefault(service_order_id, []).append(username)
+    return names
+
+
+# Mesmos campos de User.to_dict()
+user_serializer = RowSerializer(User, [
+    ('id', User.id),
+    ('username', User.username),
+    ('user_type', User.user_type),
+    ('created_at', User.created_at),
+    ('is_active', User.is_active),
+    ('profile_picture', User.profile_picture),
+    ('cnpj', User.cnpj),
+    ('email', User.email),
+    ('phone', User.phone),
+    ('address', User.address),
+])
+
+_order_creator = aliased(User)
+_order_client = aliased(User)
+
+# Mesmos campos de Order.to_dict()
+order_serializer = RowSerializer(Order, [
+    ('id', Order.id),
+    ('company_name', Order.company_name),
+    ('subtitle', Order.subtitle),
+    ('description', Order.description),
+    ('company_logo', Order.company_logo),
+    ('order_date', Order.order_date),
+    ('delivery_date', Order.delivery_date),
+    ('created_by', _order_creator.username),
+    ('client', _order_client.username),
+    ('client_name', _order_client.cnpj),
+    ('created_at', Order.created_at),
+    ('status', Order.status),
+    ('approved', Order.approved),
+    ('delivered_at', Order.delivered_at),
+    ('is_urgent', Order.is_urgent),
+], joins=[
+    (_order_creator, _order_creator.id == Order.created_by_id),
+    (_order_client, _order_client.id == Order.client_id),
+])
+
+_service_order_creator = aliased(User)
+
+# Mesmos campos de ServiceOrder.to_dict()
+service_order_serializer = RowSerializer(ServiceOrder, [
+    ('id', ServiceOrder.id),
+    ('order_id', ServiceOrder.order_id),
+    ('title', ServiceOrder.title),
+    ('description', ServiceOrder.description),
+    ('file1_filename', ServiceOrder.file1_filename),
+    ('file2_filename', ServiceOrder.file2_filename),
+    ('file3_filename', ServiceOrder.file3_filename),
+    ('created_by', _service_order_creator.username),
+    ('created_at', ServiceOrder.created_at),
+    ('status', ServiceOrder.status),
+], joins=[
+    (_service_order_creator, _service_order_creator.id == ServiceOrder.created_by_id),
+], collections={
+    'assigned_employees': _assigned_employee_names,
+})
@@ -0,0 +1,391 @@
+from datetime import date, datetime, time, timedelta
+
+import pytz
+from sqlalchemy import Date, Integer, case, cast, event, func, inspect, update
+from sqlalchemy.orm import Session
+from src.models.user import db, Order, OrderDailyStats
+
+# Escopo dos totais globais na tabela order_daily_stats
+GLOBAL_SCOPE = 0
+
+# Métricas acumuladas por dia
+METRICS = ('orders_created', 'orders_approved', 'orders_delivered', 'delivered_on_time', 'lead_time_days')
+
+# Colunas de Order que determinam a contribuição do pedido nos totais diários
+TRACKED_ATTRIBUTES = ('created_at', 'approved', 'client_id', 'delivery_date', 'delivered_at')
+
+# Agrupamentos aceitos pela API
+BUCKETS = ('day', 'month', 'year')
+
+
+def _as_date(value):
+    """Converte datetime/date/texto ISO em date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _contributions(created_at, approved, client_id, delivery_date, delivered_at):
+    """
+    Calcula a contribuição de um pedido nos totais diários.
+
+    Returns:
+        dict: {(escopo, dia): {métrica: valor}}
+    """
+    created_day = _as_date(created_at) or datetime.now(pytz.timezone("America/Sao_Paulo")).date()
+    rows = {created_day: {'orders_created': 1, 'orders_approved': 1 if approved else 0}}
+
+    delivered_day = _as_date(delivered_at)
+    if delivered_day is not None:
+        delivered = rows.setdefault(delivered_day, {})
+        delivered['orders_delivered'] = 1
+        delivered['delivered_on_time'] = 1 if delivery_date and delivered_day <= _as_date(delivery_date) else 0
+        delivered['lead_time_days'] = max((delivered_day - created_day).days, 0)
+
+    scopes = [GLOBAL_SCOPE] + ([client_id] if client_id else [])
+    return {(scope, day): metrics for scope in scopes for day, metrics in rows.items()}
+
+
+def _order_contributions(order, old=False):
+    """
+    Contribuição do pedido nos totais diários.
+
+    Args:
+        order: Instância de Order
+        old: Usar os valores anteriores à alteração pendente
+    """
+    state = inspect(order)
+    values = {}
+    for attr in TRACKED_ATTRIBUTES:
+        history = state.attrs[attr].history
+        if history.has_changes():
+            source = history.deleted if old else history.added
+            values[attr] = source[0] if source else None
+        else:
+            values[attr] = getattr(order, attr)
+    return _contributions(**values)
+
+
+def _apply_stats_deltas(connection, deltas):
+    """Aplica as variações dos totais diários via UPSERT na transação corrente"""
+    table = OrderDailyStats.__table__
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    for (client_id, day), metrics in deltas.items():
+        if not any(metrics.values()):
+            continue
+        values = {metric: metrics.get(metric, 0) for metric in METRICS}
+
+        if insert is not None:
+            stmt = insert(table).values(client_id=client_id, day=day, **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['client_id', 'day'],
+                set_={metric: table.c[metric] + stmt.excluded[metric] for metric in METRICS}
+            )
+            connection.execute(stmt)
+            continue
+
+        # Outros bancos: UPDATE e, se não existir, INSERT
+        result = connection.execute(
+            update(table).where(
+                table.c.client_id == client_id,
+                table.c.day == day
+            ).values({metric: table.c[metric] + values[metric] for metric in METRICS})
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(client_id=client_id, day=day, **values))
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_daily_stats(session, flush_context, instances):
+    """Mantém order_daily_stats em sincronia com as alterações de Order"""
+    deltas = {}
+
+    def add(contributions, sign):
+        for key, metrics in contributions.items():
+            bucket = deltas.setdefault(key, {})
+            for metric, value in metrics.items():
+                bucket[metric] = bucket.get(metric, 0) + sign * value
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(_order_contributions(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order) and obj not in session.deleted:
+            old = _order_contributions(obj, old=True)
+            new = _order_contributions(obj)
+            if old != new:
+                add(old, -1)
+                add(new, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            add(_order_contributions(obj, old=True), -1)
+
+    if deltas:
+        _apply_stats_deltas(session.connection(), deltas)
+
+
+# Carrega o valor anterior ao alterar os atributos, mesmo após expirar a sessão
+for _attr in TRACKED_ATTRIBUTES:
+    event.listen(getattr(Order, _attr), 'set', lambda *args: None, active_history=True)
+
+
+def rebuild_daily_stats():
+    """
+    Reconstrói a tabela order_daily_stats a partir da tabela order.
+
+    Returns:
+        int: Quantidade de linhas diárias gravadas
+    """
+    totals = {}
+    rows = db.session.query(
+        Order.created_at, Order.approved, Order.client_id, Order.delivery_date, Order.delivered_at
+    ).yield_per(1000)
+    for created_at, approved, client_id, delivery_date, delivered_at in rows:
+        for key, metrics in _contributions(created_at, approved, client_id, delivery_date, delivered_at).items():
+            bucket = totals.setdefault(key, dict.fromkeys(METRICS, 0))
+            for metric, value in metrics.items():
+                bucket[metric] += value
+
+    stats = [
+        dict(client_id=client_id, day=day, **metrics)
+        for (client_id, day), metrics in totals.items()
+    ]
+
+    OrderDailyStats.query.delete()
+    if stats:
+        db.session.execute(OrderDailyStats.__table__.insert(), stats)
+    db.session.commit()
+    return len(stats)
+
+
+# ===== CONSULTAS =====
+
+def _bucket_key(day, bucket):
+    """Chave e rótulo do período (com ano) ao qual o dia pertence"""
+    if bucket == 'day':
+        return day.isoformat(), day.strftime('%d/%m/%Y')
+    if bucket == 'year':
+        return str(day.year), str(day.year)
+    return f'{day.year}-{day.month:02d}', f'{day.month:02d}/{day.year}'
+
+
+def get_statistics(start, end, bucket='month', client_id=None):
+    """
+    Totais de pedidos agrupados por período a partir dos totais diários.
+
+    O custo depende da quantidade de dias no intervalo, não da quantidade
+    de pedidos.
+
+    Args:
+        start: Primeiro dia incluído
+        end: Último dia incluído
+        bucket: 'day', 'month' ou 'year'
+        client_id: Totais de um cliente (padrão: global)
+
+    Returns:
+        list: Um dicionário por período com dados, em ordem cronológica
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Agrupamento inválido: {bucket}')
+
+    rows = db.session.query(
+        OrderDailyStats.day, *[getattr(OrderDailyStats, metric) for metric in METRICS]
+    ).filter(
+        OrderDailyStats.client_id == (client_id or GLOBAL_SCOPE),
+        OrderDailyStats.day >= start,
+        OrderDailyStats.day <= end
+    ).order_by(OrderDailyStats.day).all()
+
+    periods = {}
+    for day, *values in rows:
+        key, label = _bucket_key(_as_date(day), bucket)
+        period = periods.setdefault(key, dict({'period': key, 'label': label}, **dict.fromkeys(METRICS, 0)))
+        for metric, value in zip(METRICS, values):
+            period[metric] += value
+
+    result = []
+    for period in periods.values():
+        delivered = period['orders_delivered']
+        period['on_time_rate'] = round(period['delivered_on_time'] * 100.0 / delivered, 1) if delivered else None
+        period['avg_lead_time_days'] = round(period['lead_time_days'] / delivered, 1) if delivered else None
+        result.append(period)
+    return result
+
+
+def parse_statistics_args(args):
+    """
+    Lê o intervalo e o agrupamento da API de estatísticas.
+
+    Parâmetros: start e end (YYYY-MM-DD, inclusivos; padrão: últimos 12
+    meses) e bucket ('day', 'month' ou 'year'; padrão: 'month').
+
+    Args:
+        args: request.args
+
+    Returns:
+        tuple: (start, end, bucket)
+
+    Raises:
+        ValueError: Se algum parâmetro for inválido
+    """
+    today = datetime.now(pytz.timezone("America/Sao_Paulo")).date()
+    end = date.fromisoformat(args['end']) if args.get('end') else today
+    if args.get('start'):
+        start = date.fromisoformat(args['start'])
+    else:
+        month_index = end.year * 12 + end.month - 1 - 11
+        start = date(month_index // 12, month_index % 12 + 1, 1)
+
+    bucket = args.get('bucket', 'month')
+    if bucket not in BUCKETS or start > end:
+        raise ValueError('Parâmetros inválidos')
+    return start, end, bucket
+
+
+def get_monthly_approved_orders(months=12, client_id=None):
+    """
+    Pedidos aprovados por mês de criação nos últimos meses (com ano).
+
+    Args:
+        months: Quantidade de meses, incluindo o atual
+        client_id: Totais de um cliente (padrão: global)
+
+    Returns:
+        list: [{'month': 'MM/AAAA', 'count': n}] em ordem cronológica
+    """
+    today = datetime.now(pytz.timezone("America/Sao_Paulo")).date()
+    month_index = today.year * 12 + today.month - months
+    start = date(month_index // 12, month_index % 12 + 1, 1)
+
+    return [
+        {'month': period['label'], 'count': period['orders_approved']}
+        for period in get_statistics(start, today, bucket='month', client_id=client_id)
+        if period['orders_approved']
+    ]
+
+
+# ===== INDICADORES DE ENTREGA =====
+
+# Percentis de atraso calculados pelo indicador de entregas
+LATENESS_PERCENTILES = (50, 90, 95)
+
+
+def _lateness_days(dialect_name):
+    """Expressão SQL com os dias entre o prazo e a entrega (positivo = atrasado)"""
+    if dialect_name == 'sqlite':
+        return cast(
+            func.julianday(func.date(Order.delivered_at)) - func.julianday(Order.delivery_date),
+            Integer
+        )
+    return cast(Order.delivered_at, Date) - Order.delivery_date
+
+
+def _percentile(histogram, total, percentile):
+    """Percentil (nearest-rank) a partir de [(valor, quantidade)] ordenado"""
+    rank = max(1, -(-percentile * total // 100))
+    seen = 0
+    for value, count in histogram:
+        seen += count
+        if seen >= rank:
+            return value
+    return None
+
+
+def get_delivery_kpis(start=None, end=None, approved_only=False, now=None):
+    """
+    Indicadores de pontualidade sobre todos os pedidos entregues.
+
+    Uma única consulta agrupada pelos dias de atraso (usa o índice
+    status + delivered_at); entregas no prazo, atraso médio e percentis
+    são derivados desse histograma, sem carregar pedidos.
+
+    Args:
+        start: Primeiro dia de entrega incluído (padrão: sem limite)
+        end: Último dia de entrega incluído (padrão: sem limite)
+        approved_only: Apenas pedidos aprovados
+        now: Data/hora de referência para "este mês" e "esta semana"
+             (padrão: agora em America/Sao_Paulo, como as datas gravadas)
+
+    Returns:
+        dict: total, on_time, late, on_time_rate, avg_days_late,
+              lateness_percentiles, this_month e this_week
+    """
+    now = now or datetime.now(pytz.timezone("America/Sao_Paulo")).replace(tzinfo=None)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    lateness = _lateness_days(db.session.get_bind().dialect.name).label('lateness')
+    query = db.session.query(
+        lateness,
+        func.count(Order.id),
+        func.sum(case((Order.delivered_at >= month_start, 1), else_=0)),
+        func.sum(case((Order.delivered_at >= week_start, 1), else_=0))
+    ).filter(
+        Order.status == 'entregue',
+        Order.delivered_at.isnot(None)
+    )
+    if start is not None:
+        query = query.filter(Order.delivered_at >= datetime.combine(start, time.min))
+    if end is not None:
+        query = query.filter(Order.delivered_at < datetime.combine(end + timedelta(days=1), time.min))
+    if approved_only:
+        query = query.filter(Order.approved == True)
+
+    histogram = []
+    total = on_time = days_late = this_month = this_week = 0
+    for days, count, month_count, week_count in query.group_by(lateness).order_by(lateness):
+        days = int(days)
+        histogram.append((days, count))
+        total += count
+        this_month += month_count or 0
+        this_week += week_count or 0
+        if days <= 0:
+            on_time += count
+        else:
+            days_late += days * count
+
+    late = total - on_time
+    return {
+        'total': total,
+        'on_time': on_time,
+        'late': late,
+        'on_time_rate': round(on_time * 100.0 / total, 1) if total else None,
+        'avg_days_late': round(days_late / late, 1) if late else None,
+        'lateness_percentiles': {
+            f'p{percentile}': _percentile(histogram, total, percentile) if total else None
+            for percentile in LATENESS_PERCENTILES
+        },
+        'this_month': this_month,
+        'this_week': this_week
+    }
+
+
+def parse_date_range(args):
+    """
+    Lê start/end opcionais (YYYY-MM-DD, inclusivos) dos parâmetros.
+
+    Returns:
+        tuple: (start, end) como date ou None
+
+    Raises:
+        ValueError: Se alguma data for inválida ou start > end
+    """
+    start = date.fromisoformat(args['start']) if args.get('start') else None
+    end = date.fromisoformat(args['end']) if args.get('end') else None
+    if start and end and start > end:
+        raise ValueError('Intervalo inválido')
+    return start, end
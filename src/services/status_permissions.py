@@ -0,0 +1,104 @@
+import threading
+from src.models.user import db, StatusPermission
+from src.services.data_versions import get_data_versions
+
+# Status que podem ser liberados para funcionários, na ordem de exibição
+AVAILABLE_STATUSES = ['aprovado', 'em_producao', 'pronto', 'entregue']
+
+STATUS_DISPLAY_NAMES = {
+    'aprovado': 'Aprovado',
+    'em_producao': 'Em Produção',
+    'pronto': 'Pronto',
+    'entregue': 'Entregue'
+}
+
+# Cache em memória {user_id: frozenset(status liberados)}, válido enquanto a
+# versão 'status_permission' não mudar (alterações feitas por outros workers)
+_cache = {'version': None, 'permissions': {}}
+_cache_lock = threading.Lock()
+
+
+def get_status_permissions_map(user_ids):
+    """
+    Retorna os status que cada usuário pode alterar.
+
+    Usuários fora do cache são carregados juntos em uma única consulta.
+
+    Args:
+        user_ids: IDs dos usuários
+
+    Returns:
+        dict: {user_id: frozenset(status)}
+    """
+    user_ids = set(user_ids)
+    # A versão é lida antes das permissões: uma alteração concorrente
+    # deixa o cache com versão antiga e força nova leitura
+    version = get_data_versions('status_permission')['status_permission']
+
+    with _cache_lock:
+        if _cache['version'] != version:
+            _cache['version'] = version
+            _cache['permissions'] = {}
+        cached = _cache['permissions']
+        result = {user_id: cached[user_id] for user_id in user_ids if user_id in cached}
+
+    missing = user_ids - result.keys()
+    if missing:
+        loaded = {user_id: set() for user_id in missing}
+        rows = db.session.query(StatusPermission.user_id, StatusPermission.status).filter(
+            StatusPermission.user_id.in_(missing),
+            StatusPermission.can_change == True
+        ).all()
+        for user_id, status in rows:
+            loaded[user_id].add(status)
+        loaded = {user_id: frozenset(statuses) for user_id, statuses in loaded.items()}
+
+        with _cache_lock:
+            if _cache['version'] == version:
+                _cache['permissions'].update(loaded)
+        result.update(loaded)
+
+    return result
+
+
+def get_allowed_statuses(user_id):
+    """Status que o usuário pode alterar (frozenset)"""
+    return get_status_permissions_map([user_id])[user_id]
+
+
+def can_change_status(user_id, status):
+    """Verifica se o usuário pode alterar pedidos para o status informado"""
+    return status in get_allowed_statuses(user_id)
+
+
+def get_allowed_statuses_list(user_id):
+    """
+    Lista de status liberados no formato usado pelas APIs.
+
+    Returns:
+        list: [{'status': ..., 'display_name': ...}] na ordem de AVAILABLE_STATUSES
+    """
+    allowed = get_allowed_statuses(user_id)
+    ordered = [status for status in AVAILABLE_STATUSES if status in allowed]
+    ordered += sorted(allowed.difference(AVAILABLE_STATUSES))
+    return [
+        {
+            'status': status,
+            'display_name': STATUS_DISPLAY_NAMES.get(status, status.title())
+        }
+        for status in ordered
+    ]
+
+
+def invalidate_status_permissions(user_id=None):
+    """
+    Descarta as permissões em cache.
+
+    Args:
+        user_id: Usuário a descartar (padrão: todos)
+    """
+    with _cache_lock:
+        if user_id is None:
+            _cache['permissions'] = {}
+        else:
+            _cache['permissions'].pop(user_id, None)
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+# Banco SQLite temporário: precisa estar definido antes de importar o app
+_tmp_dir = tempfile.mkdtemp(prefix='sistema-pedidos-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp_dir, 'test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app as flask_app
+from src.models.user import db, User, Order
+
+PASSWORD = 'senha-teste'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App com pasta de uploads própria; todas as tabelas são esvaziadas ao final"""
+    upload_folder = tmp_path / 'uploads'
+    upload_folder.mkdir()
+    flask_app.config.update(TESTING=True, SESSION_COOKIE_SECURE=False, UPLOAD_FOLDER=str(upload_folder))
+
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    """Cria e retorna um usuário (senha PASSWORD)"""
+    def _make_user(username, user_type='funcionario', **fields):
+        user = User(username=username, user_type=user_type, **fields)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return _make_user
+
+
+@pytest.fixture
+def make_order(app):
+    """Cria e retorna um pedido aprovado com datas previsíveis"""
+    def _make_order(created_by, index=0, **fields):
+        values = {
+            'company_name': f'Empresa {index}',
+            'order_date': date(2025, 1, 1) + timedelta(days=index),
+            'delivery_date': date(2025, 2, 1) + timedelta(days=index),
+            'status': 'aprovado',
+            'approved': True,
+        }
+        values.update(fields)
+        order = Order(created_by_id=created_by.id, **values)
+        db.session.add(order)
+        db.session.commit()
+        return order
+    return _make_order
+
+
+@pytest.fixture
+def login(app):
+    """Retorna um test client autenticado como o usuário informado"""
+    def _login(user):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': user.username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return _login
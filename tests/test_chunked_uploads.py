@@ -0,0 +1,73 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from src.models.user import FileReference
+from src.services.chunked_uploads import (
+    MIN_CHUNK_SIZE, ChunkedUploadError, finalize_upload, start_upload, upload_status, write_chunk
+)
+from src.services.file_store import blob_key, file_path
+
+CONTENT = os.urandom(MIN_CHUNK_SIZE * 2 + 1000)
+CHUNKS = [CONTENT[offset:offset + MIN_CHUNK_SIZE] for offset in range(0, len(CONTENT), MIN_CHUNK_SIZE)]
+CHECKSUM = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def admin(make_user):
+    return make_user('admin-teste', 'admin')
+
+
+def send(upload, index, data=None, **kwargs):
+    data = CHUNKS[index] if data is None else data
+    write_chunk(upload, index, io.BytesIO(data), len(CHUNKS[index]), **kwargs)
+
+
+def test_interrupted_upload_resumes_and_finalizes(admin):
+    upload = start_upload(admin, 'projeto.pdf', len(CONTENT), chunk_size=MIN_CHUNK_SIZE, sha256=CHECKSUM)
+    assert upload_status(upload)['total_chunks'] == 3
+
+    send(upload, 2)
+    send(upload, 0)
+    # Conexão caiu no meio da parte 1
+    with pytest.raises(ChunkedUploadError):
+        send(upload, 1, data=CHUNKS[1][:1000])
+    assert upload_status(upload)['missing'] == [1]
+
+    with pytest.raises(ChunkedUploadError, match='Faltam 1 partes'):
+        finalize_upload(upload)
+
+    send(upload, 1, sha256=hashlib.sha256(CHUNKS[1]).hexdigest())
+    name = finalize_upload(upload, sha256=CHECKSUM)
+
+    assert upload_status(upload)['finalized']
+    assert os.path.basename(blob_key(name)) == CHECKSUM + '.pdf'
+    with open(file_path(name, 'service_order'), 'rb') as stream:
+        assert stream.read() == CONTENT
+    assert FileReference.query.filter_by(filename=blob_key(name)).one().reference_count == 1
+
+    # Nova tentativa do cliente (resposta perdida): mesmo nome, sem nova referência
+    assert finalize_upload(upload) == name
+    assert FileReference.query.filter_by(filename=blob_key(name)).one().reference_count == 1
+
+
+def test_chunk_checksum_mismatch_is_rejected(admin):
+    upload = start_upload(admin, 'projeto.pdf', len(CONTENT), chunk_size=MIN_CHUNK_SIZE)
+    with pytest.raises(ChunkedUploadError, match='Checksum da parte'):
+        send(upload, 0, sha256='0' * 64)
+    assert upload_status(upload)['missing'] == [0, 1, 2]
+
+
+def test_file_checksum_mismatch_keeps_the_upload_open(admin):
+    upload = start_upload(admin, 'projeto.pdf', len(CONTENT), chunk_size=MIN_CHUNK_SIZE)
+    for index in range(len(CHUNKS)):
+        send(upload, index)
+
+    with pytest.raises(ChunkedUploadError, match='Checksum do arquivo'):
+        finalize_upload(upload, sha256='0' * 64)
+    assert not upload_status(upload)['finalized']
+    assert FileReference.query.count() == 0
+
+    assert finalize_upload(upload, sha256=CHECKSUM)
@@ -0,0 +1,58 @@
+import io
+import zipfile
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from src.models.user import db, Order, OrderObservation, StatusHistory, User
+from src.services.data_dump import dump_database, dump_tables, restore_database
+from src.services.notifications import mark_broadcast_read, notify_user_type, notify_users
+
+
+def database_rows():
+    return {
+        table.name: db.session.execute(select(table).order_by(*table.primary_key.columns)).all()
+        for table in dump_tables()
+    }
+
+
+def dump_to_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for arcname, chunks in dump_database():
+            archive.writestr(arcname, b''.join(chunks))
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+def test_dump_and_restore_round_trip(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    employee = make_user('funcionário-ç', 'funcionario', address='Acentuação "aspas"\nnova linha')
+    order = make_order(admin, 0, delivered_at=datetime(2025, 2, 3, 14, 30, 15, 123456),
+                       delivery_date=date(2025, 2, 1), status='entregue', is_urgent=True)
+    make_order(admin, 1, description=None)
+    db.session.add(OrderObservation(order_id=order.id, author_id=admin.id, content='Observação'))
+    db.session.add(StatusHistory(order_id=order.id, user_id=admin.id, old_status=None, new_status='entregue'))
+    broadcast = notify_user_type('funcionario', 'Aviso', 'Mensagem')
+    notify_users([employee.id], 'Direta', 'Mensagem')
+    db.session.commit()
+    mark_broadcast_read(employee, broadcast.id)
+    db.session.commit()
+
+    before = database_rows()
+    archive = dump_to_zip()
+
+    # Alterações depois do backup são desfeitas pela restauração
+    db.session.delete(db.session.get(Order, order.id))
+    make_user('usuario-novo', 'cliente')
+    db.session.commit()
+
+    restored = restore_database(archive)
+    db.session.expire_all()
+
+    assert restored['order'] == 2
+    assert database_rows() == before
+
+    # As sequências continuam depois dos ids restaurados
+    new_user = make_user('depois-da-restauracao', 'cliente')
+    assert new_user.id > max(user.id for user in User.query.filter(User.id != new_user.id))
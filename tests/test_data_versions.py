@@ -0,0 +1,28 @@
+from src.models.user import db, Order
+from src.services.data_versions import get_data_versions
+
+
+def test_versions_are_bumped_after_commit(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    before = get_data_versions('order')['order']
+
+    order = make_order(admin)
+    assert get_data_versions('order')['order'] == before + 1
+
+    # O flush não toca a linha global; só o commit publica a versão
+    order.status = 'pronto'
+    db.session.flush()
+    assert db.session.info['pending_data_versions'] == {'order'}
+    db.session.commit()
+    assert get_data_versions('order')['order'] == before + 2
+
+
+def test_rollback_discards_pending_versions(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    order = make_order(admin)
+    before = get_data_versions('order')['order']
+
+    Order.query.filter_by(id=order.id).update({'status': 'pronto'})
+    db.session.rollback()
+    assert 'pending_data_versions' not in db.session.info
+    assert get_data_versions('order')['order'] == before
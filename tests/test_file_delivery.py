@@ -0,0 +1,34 @@
+import io
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from src.models.user import db
+from src.services.file_delivery import IMMUTABLE_MAX_AGE, signed_url
+from src.services.file_store import file_path, save_file
+
+
+@pytest.fixture(params=[None, '/protected-uploads/'], ids=['send_file', 'x-accel'])
+def delivery(app, request):
+    original = app.config['X_ACCEL_REDIRECT_PREFIX']
+    app.config['X_ACCEL_REDIRECT_PREFIX'] = request.param
+    yield
+    app.config['X_ACCEL_REDIRECT_PREFIX'] = original
+
+
+def test_signed_store_file_is_cached_privately_until_expiry(app, delivery):
+    name = save_file(FileStorage(io.BytesIO(b'conteudo'), filename='documento.pdf'), keep_name=True)
+    db.session.commit()
+
+    with app.test_request_context():
+        url = signed_url(file_path(name, 'service_order'), 'documento.pdf')
+    response = app.test_client().get(url)
+
+    assert response.status_code == 200
+    cache_control = response.cache_control
+    assert cache_control.private
+    assert not cache_control.public
+    assert 0 < cache_control.max_age < IMMUTABLE_MAX_AGE
+    expires = int(url.split('exp=')[1].split('&')[0])
+    assert cache_control.max_age <= expires - int(time.time()) + 1
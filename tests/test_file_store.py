@@ -0,0 +1,145 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import FileStorage
+
+from src.models.user import db, FileReference
+from src.services import file_store
+from src.services.file_store import blob_key, file_path, release_file, save_file
+
+
+def upload(content, filename='documento.pdf'):
+    return FileStorage(io.BytesIO(content), filename=filename)
+
+
+def reference_count(name):
+    reference = FileReference.query.filter_by(filename=blob_key(name)).first()
+    return reference.reference_count if reference else None
+
+
+def test_same_content_is_stored_once_and_counted(app):
+    first = save_file(upload(b'conteudo'), keep_name=True)
+    second = save_file(upload(b'conteudo', 'copia.pdf'), keep_name=True)
+    db.session.commit()
+
+    assert blob_key(first) == blob_key(second)
+    assert file_store.display_name(second) == 'copia.pdf'
+    assert reference_count(first) == 2
+
+    release_file(first, 'service_order')
+    db.session.commit()
+    assert reference_count(first) == 1
+    assert os.path.exists(file_path(first, 'service_order'))
+
+    release_file(second, 'service_order')
+    db.session.commit()
+    assert reference_count(first) is None
+    assert not os.path.exists(file_path(first, 'service_order'))
+
+
+def test_rollback_keeps_the_file(app):
+    name = save_file(upload(b'conteudo'))
+    db.session.commit()
+
+    release_file(name, 'service_order')
+    db.session.rollback()
+    assert reference_count(name) == 1
+    assert os.path.exists(file_path(name, 'service_order'))
+
+
+def test_reupload_before_removal_keeps_the_file(app):
+    name = save_file(upload(b'conteudo'))
+    db.session.commit()
+
+    # A remoção da transação que liberou o arquivo ainda não rodou...
+    release_file(name, 'service_order')
+    pending = db.session.info.pop(file_store._PENDING_REMOVALS)
+    db.session.commit()
+    assert reference_count(name) == 0
+
+    # ...quando outra transação envia o mesmo conteúdo
+    assert save_file(upload(b'conteudo')) == name
+    db.session.commit()
+
+    db.session.info[file_store._PENDING_REMOVALS] = pending
+    file_store._remove_released_files(db.session)
+    assert reference_count(name) == 1
+    assert os.path.exists(file_path(name, 'service_order'))
+
+
+def test_concurrent_reupload_is_not_removed(app):
+    name = save_file(upload(b'conteudo'))
+    db.session.commit()
+    saved = threading.Event()
+
+    def reupload():
+        # Outra requisição: encontra o arquivo, referencia e demora a confirmar
+        with app.app_context():
+            save_file(upload(b'conteudo'))
+            saved.set()
+            time.sleep(0.5)
+            db.session.commit()
+
+    thread = threading.Thread(target=reupload)
+
+    def before_removal(session):
+        if not thread.is_alive() and not saved.is_set():
+            thread.start()
+            saved.wait(5)
+
+    # Roda antes de _remove_released_files, entre o commit e a remoção
+    event.listen(Session, 'after_commit', before_removal, insert=True)
+    try:
+        release_file(name, 'service_order')
+        db.session.commit()
+    finally:
+        event.remove(Session, 'after_commit', before_removal)
+        thread.join()
+
+    assert reference_count(name) == 1
+    assert os.path.exists(file_path(name, 'service_order'))
+
+
+def test_reupload_after_removal_writes_the_file_again(app):
+    name = save_file(upload(b'conteudo'))
+    db.session.commit()
+    release_file(name, 'service_order')
+    db.session.commit()
+    assert not os.path.exists(file_path(name, 'service_order'))
+
+    assert save_file(upload(b'conteudo')) == name
+    db.session.commit()
+    assert reference_count(name) == 1
+    with open(file_path(name, 'service_order'), 'rb') as stream:
+        assert stream.read() == b'conteudo'
+
+
+@pytest.fixture
+def legacy_logo(app):
+    name = '20240101_120000_logo.png'
+    path = file_path(name, 'logo')
+    with open(path, 'wb') as stream:
+        stream.write(b'logo antigo')
+    return name, path
+
+
+def test_shared_legacy_upload_is_kept_while_referenced(make_user, make_order, legacy_logo):
+    name, path = legacy_logo
+    admin = make_user('admin-teste', 'admin')
+    first = make_order(admin, 0, company_logo=name)
+    second = make_order(admin, 1, company_logo=name)
+
+    release_file(first.company_logo, 'logo')
+    first.company_logo = None
+    db.session.commit()
+    assert os.path.exists(path)
+
+    release_file(second.company_logo, 'logo')
+    db.session.delete(second)
+    db.session.commit()
+    assert not os.path.exists(path)
@@ -0,0 +1,34 @@
+import pytest
+
+from src.services.notification_events import broker
+
+MULTITHREAD = {'wsgi.multithread': True}
+
+
+@pytest.fixture
+def employee_client(app, make_user, login):
+    app.config.update(NOTIFICATIONS_SSE=True, SSE_MAX_STREAMS=1)
+    yield login(make_user('funcionario-teste'))
+    app.config.update(SSE_MAX_STREAMS=4)
+
+
+def open_stream(client):
+    return client.get('/funcionario/api/notificacoes/stream', buffered=False, environ_overrides=MULTITHREAD)
+
+
+def test_streams_are_limited_per_worker(employee_client):
+    first = open_stream(employee_client)
+    assert first.status_code == 200
+    assert open_stream(employee_client).status_code == 503
+
+    # Fechar a resposta libera a vaga, mesmo sem ter lido nenhum evento
+    first.close()
+    assert broker._subscribers == set()
+    second = open_stream(employee_client)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_single_threaded_worker_gets_no_stream(employee_client):
+    response = employee_client.get('/funcionario/api/notificacoes/stream')
+    assert response.status_code == 503
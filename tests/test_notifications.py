@@ -0,0 +1,59 @@
+from src.models.user import db
+from src.services.notifications import (
+    get_unread_count, mark_all_read, mark_broadcast_read, notify_user_type, paginate_notifications
+)
+
+
+def feed(user):
+    return {(item.kind, item.id): item.read for item in paginate_notifications(user, per_page=50).items}
+
+
+def test_read_broadcasts_stay_in_the_feed(make_user):
+    employee = make_user('funcionario-teste')
+    first = notify_user_type('funcionario', 'Aviso 1', 'Mensagem 1')
+    second = notify_user_type('funcionario', 'Aviso 2', 'Mensagem 2')
+    db.session.commit()
+    assert get_unread_count(employee) == 2
+
+    assert mark_broadcast_read(employee, first.id)
+    db.session.commit()
+    assert feed(employee) == {('broadcast', first.id): True, ('broadcast', second.id): False}
+    assert get_unread_count(employee) == 1
+
+    mark_all_read(employee)
+    db.session.commit()
+    assert feed(employee) == {('broadcast', first.id): True, ('broadcast', second.id): True}
+    assert get_unread_count(employee) == 0
+    assert paginate_notifications(employee, unread_only=True).items == []
+
+
+def test_inactive_users_do_not_receive_broadcasts(make_user):
+    employee = make_user('funcionario-teste', is_active=False)
+    broadcast = notify_user_type('funcionario', 'Aviso', 'Mensagem')
+    db.session.commit()
+
+    employee.is_active = True
+    db.session.commit()
+    assert feed(employee) == {}
+    assert get_unread_count(employee) == 0
+    assert not mark_broadcast_read(employee, broadcast.id)
+
+    # Avisos enviados depois da reativação chegam normalmente
+    later = notify_user_type('funcionario', 'Aviso', 'Mensagem')
+    db.session.commit()
+    assert feed(employee) == {('broadcast', later.id): False}
+
+
+def test_read_cursor_is_kept_per_audience(make_user):
+    user = make_user('funcionario-teste')
+    admin_broadcast = notify_user_type('admin', 'Aviso', 'Mensagem')
+    notify_user_type('funcionario', 'Aviso', 'Mensagem')
+    db.session.commit()
+    mark_all_read(user)
+    db.session.commit()
+
+    # Promovido a admin: o cursor de funcionário não marca os avisos de admin
+    user.user_type = 'admin'
+    db.session.commit()
+    assert feed(user) == {('broadcast', admin_broadcast.id): False}
+    assert get_unread_count(user) == 1
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db, User, OrderObservation, ServiceOrder, StatusHistory
+
+
+def get_counted(client, url):
+    """GET com a sessão limpa; retorna os comandos SQL executados pela requisição"""
+    # O test client reaproveita o app context da fixture (e a sessão dela)
+    db.session.expire_all()
+    with count_statements() as statements:
+        assert client.get(url).status_code == 200
+    return statements
+
+
+@contextmanager
+def count_statements():
+    """Conta os comandos SQL executados dentro do bloco"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def users(make_user):
+    return {
+        'admin': make_user('admin-teste', 'admin'),
+        'funcionario': make_user('funcionario-teste', 'funcionario'),
+        'cliente': make_user('cliente-teste', 'cliente'),
+    }
+
+
+def add_orders(users, make_order, count, start=0, status='aprovado'):
+    """Pedidos com cliente, observação, histórico e ordem de serviço atribuída
+
+    Cada pedido tem um autor diferente: relacionamentos carregados sob demanda
+    gerariam um SELECT por linha.
+    """
+    for index in range(start, start + count):
+        author = User(username=f'autor-{index}', user_type='admin', password_hash='-')
+        db.session.add(author)
+        db.session.flush()
+        order = make_order(author, index, client_id=users['cliente'].id, status=status)
+        if status == 'entregue':
+            order.delivered_at = datetime(2025, 2, 1) + timedelta(days=index)
+        db.session.add(OrderObservation(order_id=order.id, author_id=author.id, content='Obs'))
+        db.session.add(StatusHistory(
+            order_id=order.id, user_id=author.id, old_status='pendente', new_status='aprovado'
+        ))
+        service_order = ServiceOrder(order_id=order.id, title=f'OS {index}', created_by_id=author.id)
+        service_order.assigned_employees.append(users['funcionario'])
+        db.session.add(service_order)
+    db.session.commit()
+
+
+@pytest.mark.parametrize('user_type, url, status', [
+    ('admin', '/admin/pedidos', 'aprovado'),
+    ('admin', '/admin/entregues', 'entregue'),
+    ('admin', '/admin/ordem-servico', 'aprovado'),
+    ('funcionario', '/funcionario/pedidos', 'aprovado'),
+    ('funcionario', '/funcionario/ordens-servico', 'aprovado'),
+    ('cliente', '/client/orders', 'aprovado'),
+])
+def test_list_pages_use_fixed_number_of_statements(app, users, make_order, login, user_type, url, status):
+    client = login(users[user_type])
+    per_page = 10
+    rows = 1
+
+    add_orders(users, make_order, rows, status=status)
+    few = get_counted(client, url)
+
+    # 10x mais linhas, todas na mesma página
+    add_orders(users, make_order, rows * per_page - rows, start=rows, status=status)
+    many = get_counted(client, url)
+
+    assert len(many) == len(few), many
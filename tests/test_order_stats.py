@@ -0,0 +1,48 @@
+from src.models.user import db, Order, OrderStatusCounter
+from src.services.order_stats import get_order_status_counts, rebuild_order_status_counters
+
+
+def counter_snapshot():
+    return {
+        (row.client_id, row.status, row.approved, row.is_urgent): row.count
+        for row in OrderStatusCounter.query.all()
+        if row.count
+    }
+
+
+def test_counters_match_rebuild_after_changes(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    clients = [make_user(f'cliente-{index}', 'cliente') for index in range(2)]
+
+    orders = [
+        make_order(admin, index, status='pendente', approved=False, client_id=clients[index % 2].id)
+        for index in range(6)
+    ]
+
+    # Aprovação, mudança de status, urgência, troca e remoção do cliente, exclusão
+    orders[0].approved = True
+    orders[0].status = 'aprovado'
+    orders[1].status = 'em_producao'
+    orders[1].is_urgent = True
+    orders[2].client_id = clients[1].id
+    orders[3].client_id = None
+    db.session.commit()
+
+    orders[1].status = 'entregue'
+    db.session.delete(orders[4])
+    db.session.commit()
+
+    # Alteração depois de expirar a sessão (valor anterior lido do banco)
+    db.session.expire_all()
+    order = db.session.get(Order, orders[5].id)
+    order.status = 'pronto'
+    db.session.commit()
+
+    incremental = counter_snapshot()
+    rebuild_order_status_counters()
+    assert incremental == counter_snapshot()
+
+    counts = get_order_status_counts()
+    assert counts.count() == 5
+    assert counts.count(statuses=['entregue'], is_urgent=True) == 1
+    assert get_order_status_counts(client_id=clients[1].id).count() == 3
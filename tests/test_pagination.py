@@ -0,0 +1,78 @@
+from datetime import date, datetime
+
+import pytest
+
+from src.models.user import Order
+from src.services.order_queries import ORDER_CREATED_KEYS, ORDER_DELIVERY_DATE_KEYS
+from src.services.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+
+def test_cursor_round_trip():
+    values = [datetime(2025, 1, 2, 3, 4, 5, 6), date(2025, 1, 2), 'broadcast', 42]
+    cursor = encode_cursor('prev', values)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, len(values)) == ('prev', values)
+
+
+@pytest.mark.parametrize('cursor', ['', 'não-é-base64', encode_cursor('next', [1])])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+@pytest.fixture
+def orders(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    # created_at repetido: o id desempata a ordenação
+    return [
+        make_order(admin, index, created_at=datetime(2025, 1, 1 + index // 3), delivery_date=date(2025, 2, 1))
+        for index in range(23)
+    ]
+
+
+def walk_forward(keys, per_page):
+    pages, cursor = [], None
+    while True:
+        page = keyset_paginate(Order.query, keys, cursor=cursor, per_page=per_page)
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize('keys', [ORDER_CREATED_KEYS, ORDER_DELIVERY_DATE_KEYS])
+def test_pages_cover_every_row_once_in_order(orders, keys):
+    pages = walk_forward(keys, per_page=10)
+
+    assert [len(page.items) for page in pages] == [10, 10, 3]
+    assert [page.has_prev for page in pages] == [False, True, True]
+    assert [page.has_next for page in pages] == [True, True, False]
+
+    expected = Order.query.order_by(*[
+        column.desc() if descending else column.asc() for column, descending in keys
+    ]).all()
+    assert [order.id for page in pages for order in page.items] == [order.id for order in expected]
+
+
+def test_previous_cursor_returns_the_same_page(orders):
+    first, second, last = walk_forward(ORDER_CREATED_KEYS, per_page=10)
+
+    back = keyset_paginate(Order.query, ORDER_CREATED_KEYS, cursor=last.prev_cursor, per_page=10)
+    assert [order.id for order in back.items] == [order.id for order in second.items]
+    assert back.has_prev and back.has_next
+
+    back = keyset_paginate(Order.query, ORDER_CREATED_KEYS, cursor=back.prev_cursor, per_page=10)
+    assert [order.id for order in back.items] == [order.id for order in first.items]
+    assert not back.has_prev and back.has_next
+
+
+def test_invalid_cursor_falls_back_to_first_page(orders):
+    first = keyset_paginate(Order.query, ORDER_CREATED_KEYS, per_page=10)
+    page = keyset_paginate(Order.query, ORDER_CREATED_KEYS, cursor='lixo', per_page=10)
+    assert [order.id for order in page.items] == [order.id for order in first.items]
+
+
+def test_approximate_total_is_skipped_outside_postgresql(orders):
+    page = keyset_paginate(Order.query, ORDER_CREATED_KEYS, per_page=10, total='approximate')
+    assert page.total is None
+    assert keyset_paginate(Order.query, ORDER_CREATED_KEYS, per_page=10, total=23).total == 23
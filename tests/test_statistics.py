@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+from src.models.user import db, Order, OrderDailyStats
+from src.services import data_versions
+from src.services.statistics import GLOBAL_SCOPE, get_statistics, rebuild_daily_stats
+
+
+def stats_snapshot():
+    return {
+        (row.client_id, row.day): tuple(
+            getattr(row, metric) for metric in
+            ('orders_created', 'orders_approved', 'orders_delivered', 'delivered_on_time', 'lead_time_days')
+        )
+        for row in OrderDailyStats.query.all()
+        if any((row.orders_created, row.orders_approved, row.orders_delivered,
+                row.delivered_on_time, row.lead_time_days))
+    }
+
+
+def test_daily_stats_match_rebuild_after_changes(make_user, make_order):
+    admin = make_user('admin-teste', 'admin')
+    client = make_user('cliente-teste', 'cliente')
+
+    orders = [
+        make_order(admin, index, approved=False, created_at=datetime(2025, 1, 1 + index),
+                   client_id=client.id if index % 2 else None)
+        for index in range(5)
+    ]
+
+    orders[0].approved = True
+    orders[1].status = 'entregue'
+    orders[1].delivered_at = datetime(2025, 1, 20)
+    orders[2].status = 'entregue'
+    orders[2].delivered_at = datetime(2025, 3, 1)  # depois do prazo
+    orders[3].client_id = None
+    db.session.commit()
+
+    # Entrega desfeita, nova data de entrega e exclusão
+    orders[1].delivered_at = None
+    orders[1].status = 'pronto'
+    orders[2].delivery_date = date(2025, 3, 10)
+    db.session.delete(orders[4])
+    db.session.commit()
+
+    db.session.expire_all()
+    db.session.get(Order, orders[0].id).delivered_at = datetime(2025, 1, 15)
+    db.session.commit()
+
+    incremental = stats_snapshot()
+    rebuild_daily_stats()
+    assert incremental == stats_snapshot()
+
+    totals = get_statistics(date(2025, 1, 1), date(2025, 3, 31), bucket='month', client_id=GLOBAL_SCOPE)
+    assert [period['orders_created'] for period in totals] == [4, 0]
+    assert [period['delivered_on_time'] for period in totals] == [1, 1]
+
+
+def test_statistics_etag_changes_with_the_date(app, make_user, login, monkeypatch):
+    client = login(make_user('admin-teste', 'admin'))
+    first = client.get('/admin/api/estatisticas')
+    assert first.status_code == 200
+    assert client.get('/admin/api/estatisticas', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Virada do dia: o período padrão termina hoje, a resposta em cache não vale mais
+    class Tomorrow(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2099, 1, 1, tzinfo=tz)
+
+    monkeypatch.setattr(data_versions, 'datetime', Tomorrow)
+    response = client.get('/admin/api/estatisticas', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+
+
+def test_delivery_kpis_etag_changes_with_the_date(app, make_user, login, monkeypatch):
+    client = login(make_user('funcionario-teste'))
+    first = client.get('/funcionario/api/entregas/indicadores')
+    assert first.status_code == 200
+
+    # "Esta semana" e "este mês" dependem da data atual
+    class NextWeek(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2099, 1, 8, tzinfo=tz)
+
+    monkeypatch.setattr(data_versions, 'datetime', NextWeek)
+    response = client.get('/funcionario/api/entregas/indicadores', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200